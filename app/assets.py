@@ -0,0 +1,198 @@
+import argparse
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+import sys
+from functools import lru_cache
+
+from fastapi.staticfiles import StaticFiles
+
+try:
+    import brotli
+except ImportError:  # sin brotli se generan sólo las variantes .gz
+    brotli = None
+
+# Assets estáticos con hash de contenido y precomprimidos.
+#
+#   python -m app.assets build [--limpiar]
+#
+# copia cada archivo de app/static a app/static/dist con el hash en el nombre
+# (style.css -> style.1a2b3c4d5e6f.css), reescribe las url(/static/...) de los CSS,
+# genera las variantes .gz (y .br si está instalado brotli) y el manifest.json.
+# En las plantillas:  {{ static_url('style.css') }}  -> /static/dist/style.1a2b3c4d5e6f.css
+# Sin build (desarrollo) static_url devuelve la ruta original: /static/style.css
+#
+# AssetFiles sirve /static: lo de dist/ con la variante comprimida que acepte el cliente y
+# Cache-Control immutable (el nombre cambia con el contenido); el resto se revalida siempre.
+
+STATIC_DIR = "app/static"
+DIST = "dist"
+MANIFEST = os.path.join(STATIC_DIR, DIST, "manifest.json")
+STATIC_URL = "/static/"
+
+HASH_LEN = 12
+COMPRIMIBLES = {".css", ".js", ".svg", ".ico", ".json", ".txt", ".html", ".map"}
+COMPRESION_MIN = 0.95  # una variante comprimida que no ahorra al menos 5% no se guarda
+CACHE_INMUTABLE = "public, max-age=31536000, immutable"
+CACHE_REVALIDAR = "no-cache"
+CODIFICACIONES = (("br", ".br"), ("gzip", ".gz"))  # en orden de preferencia
+
+_CSS_URL = re.compile(r"""url\((['"]?)(/static/[^)'"?#]+)([^)'"]*)\1\)""")
+
+
+#======================================= B U I L D ========================================
+def _fuentes():
+    # Rutas relativas a STATIC_DIR, sin dist/; los CSS al final para que al reescribir sus
+    # url() ya estén los hashes de imágenes y fuentes
+    rutas = []
+    for raiz, dirs, archivos in os.walk(STATIC_DIR):
+        if os.path.relpath(raiz, STATIC_DIR) == ".":
+            dirs[:] = [d for d in dirs if d != DIST]
+        for archivo in archivos:
+            rutas.append(os.path.relpath(os.path.join(raiz, archivo), STATIC_DIR).replace(os.sep, "/"))
+    return sorted(rutas, key=lambda r: (r.endswith(".css"), r))
+
+
+def _con_hash(ruta: str, contenido: bytes) -> str:
+    base, ext = os.path.splitext(ruta)
+    return f"{base}.{hashlib.sha256(contenido).hexdigest()[:HASH_LEN]}{ext}"
+
+
+def _reescribir_css(contenido: bytes, manifest: dict) -> bytes:
+    def reemplazo(m):
+        ruta = m.group(2)[len(STATIC_URL):]
+        if ruta not in manifest:
+            return m.group(0)
+        return f"url({m.group(1)}{STATIC_URL}{DIST}/{manifest[ruta]}{m.group(3)}{m.group(1)})"
+    return _CSS_URL.sub(reemplazo, contenido.decode()).encode()
+
+
+def _escribir(ruta: str, contenido: bytes):
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    with open(ruta, "wb") as f:
+        f.write(contenido)
+
+
+def build(limpiar: bool = False):
+    manifest, generados = {}, set()
+    for ruta in _fuentes():
+        with open(os.path.join(STATIC_DIR, ruta), "rb") as f:
+            contenido = f.read()
+        if ruta.endswith(".css"):
+            contenido = _reescribir_css(contenido, manifest)
+        destino = _con_hash(ruta, contenido)
+        manifest[ruta] = destino
+        salida = os.path.join(STATIC_DIR, DIST, destino)
+        _escribir(salida, contenido)
+        generados.add(destino)
+
+        if os.path.splitext(ruta)[1] not in COMPRIMIBLES:
+            continue
+        # mtime=0: el .gz es el mismo en cada build (builds reproducibles)
+        variantes = {".gz": gzip.compress(contenido, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            variantes[".br"] = brotli.compress(contenido, quality=11)
+        for ext, comprimido in variantes.items():
+            if len(comprimido) <= len(contenido) * COMPRESION_MIN:
+                _escribir(salida + ext, comprimido)
+                generados.add(destino + ext)
+
+    _escribir(MANIFEST, json.dumps(manifest, indent=2, sort_keys=True).encode())
+    borrados = 0
+    if limpiar:
+        # Por defecto los hashes viejos se conservan: páginas ya abiertas de la versión
+        # anterior siguen pidiéndolos durante un deploy
+        dist = os.path.join(STATIC_DIR, DIST)
+        for raiz, _, archivos in os.walk(dist):
+            for archivo in archivos:
+                relativa = os.path.relpath(os.path.join(raiz, archivo), dist).replace(os.sep, "/")
+                if relativa != "manifest.json" and relativa not in generados:
+                    os.remove(os.path.join(raiz, archivo))
+                    borrados += 1
+    static_url.cache_clear()
+    _manifest.cache_clear()
+    return manifest, borrados
+
+
+#===================================== P L A N T I L L A S ========================================
+@lru_cache(maxsize=1)
+def _manifest() -> dict:
+    try:
+        with open(MANIFEST) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+@lru_cache(maxsize=None)
+def static_url(ruta: str) -> str:
+    ruta = ruta.lstrip("/")
+    hasheado = _manifest().get(ruta)
+    return f"{STATIC_URL}{DIST}/{hasheado}" if hasheado else f"{STATIC_URL}{ruta}"
+
+
+def registrar(templates):
+    # Jinja2Templates o Environment: expone static_url() a las plantillas
+    env = getattr(templates, "env", templates)
+    env.globals["static_url"] = static_url
+
+
+#====================================== S E R V I D O R ========================================
+def _acepta(accept_encoding: str) -> set:
+    aceptadas = set()
+    for parte in accept_encoding.split(","):
+        nombre, _, params = parte.strip().partition(";")
+        if params.strip().replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            aceptadas.add(nombre.strip().lower())
+    return aceptadas
+
+
+class AssetFiles(StaticFiles):
+    async def get_response(self, path: str, scope):
+        if not path.startswith(DIST + "/") and not path.startswith(DIST + os.sep):
+            response = await super().get_response(path, scope)
+            response.headers.setdefault("cache-control", CACHE_REVALIDAR)
+            return response
+
+        headers = dict((k.decode().lower(), v.decode()) for k, v in scope["headers"])
+        aceptadas = _acepta(headers.get("accept-encoding", ""))
+        for codificacion, ext in CODIFICACIONES:
+            if codificacion not in aceptadas:
+                continue
+            full_path, stat_result = self.lookup_path(path + ext)
+            if stat_result is None:
+                continue
+            response = self.file_response(full_path, stat_result, scope)
+            if response.status_code == 200:
+                response.headers["content-type"] = mimetypes.guess_type(path)[0] or "application/octet-stream"
+                response.headers["content-encoding"] = codificacion
+            break
+        else:
+            response = await super().get_response(path, scope)
+        response.headers["cache-control"] = CACHE_INMUTABLE
+        response.headers["vary"] = "Accept-Encoding"
+        return response
+
+
+#==================================== C O N S O L A ========================================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Assets estáticos con hash y precomprimidos")
+    parser.add_argument("accion", choices=["build"])
+    parser.add_argument("--limpiar", action="store_true", help="borrar de dist/ los archivos que ya no están en el manifest")
+    args = parser.parse_args(argv)
+
+    manifest, borrados = build(limpiar=args.limpiar)
+    for ruta, destino in sorted(manifest.items()):
+        print(f"{ruta:40} -> {DIST}/{destino}")
+    if brotli is None:
+        print("brotli no está instalado: sólo se generaron variantes .gz")
+    if borrados:
+        print(f"{borrados} archivos viejos borrados")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
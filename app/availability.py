@@ -0,0 +1,269 @@
+import os
+import threading
+import time
+from bisect import bisect_left, insort
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import event, select, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app import models
+
+# Motor de disponibilidad de mesas: "la mesa libre más chica con capacidad >= N para el horario T".
+#
+# - Las mesas habilitadas se guardan ordenadas por (capacidad, numero_mesa): un bisect
+#   encuentra la primera con capacidad suficiente y desde ahí se recorren en orden
+#   (recorrido lineal sobre las mesas que alcanzan) hasta la primera libre.
+# - Por cada día y mesa se guarda la lista ordenada de intervalos ocupados: un bisect
+#   dice si el horario pedido se superpone con alguna reserva.
+# - El índice se actualiza al confirmar (commit) cualquier sesión que cree, modifique
+#   o cancele reservas, y se recarga desde la base pasado AVAILABILITY_TTL segundos
+#   (para ver lo escrito por otros workers).
+# - En memoria quedan sólo los días consultados: se descartan los días pasados, los que
+#   superaron el TTL y, por LRU, los que excedan AVAILABILITY_DIAS_MAX (con sus reservas).
+
+RESERVA_DURACION = timedelta(minutes=int(os.getenv("RESERVA_DURACION_MIN", "120")))
+# Duración máxima de una reserva: acota hacia atrás la búsqueda por índice (mesa_id, inicio)
+RESERVA_DURACION_MAX = timedelta(minutes=int(os.getenv("RESERVA_DURACION_MAX_MIN", "360")))
+AVAILABILITY_TTL = float(os.getenv("AVAILABILITY_TTL", "60"))
+AVAILABILITY_DIAS_MAX = int(os.getenv("AVAILABILITY_DIAS_MAX", "60"))  # días indexados a la vez
+ESTADOS_CANCELADOS = {"cancelada", "cancelado", "anulada"}
+
+
+def parse_hora(hora):
+    if not hora:
+        return None
+    for fmt in ("%H:%M", "%H:%M:%S", "%H.%M", "%H"):
+        try:
+            return datetime.strptime(hora.strip(), fmt).time()
+        except ValueError:
+            continue
+    return None
+
+
+def reserva_interval(fecha_reserva, hora_reserva):
+    # Para reservas sin inicio/fin: hora_reserva es texto ("21:30"); si falta se usa la hora de fecha_reserva
+    if fecha_reserva is None:
+        return None
+    hora = parse_hora(hora_reserva)
+    inicio = datetime.combine(fecha_reserva.date(), hora) if hora else fecha_reserva
+    return inicio, inicio + RESERVA_DURACION
+
+
+def days_touched(inicio: datetime, fin: datetime):
+    day = inicio.date()
+    while datetime.combine(day, datetime.min.time()) < fin:
+        yield day
+        day += timedelta(days=1)
+
+
+class DayIndex:
+    def __init__(self):
+        self.loaded_at = time.monotonic()
+        self.slots = {}  # mesa_id -> lista ordenada de (inicio, fin, reserva_id)
+        self.max_len = timedelta(0)
+
+    def add(self, mesa_id, inicio, fin, reserva_id):
+        insort(self.slots.setdefault(mesa_id, []), (inicio, fin, reserva_id))
+        self.max_len = max(self.max_len, fin - inicio)
+
+    def remove(self, mesa_id, inicio, fin, reserva_id):
+        slots = self.slots.get(mesa_id, [])
+        i = bisect_left(slots, (inicio, fin, reserva_id))
+        if i < len(slots) and slots[i] == (inicio, fin, reserva_id):
+            del slots[i]
+
+    def is_free(self, mesa_id, inicio, fin):
+        slots = self.slots.get(mesa_id)
+        if not slots:
+            return True
+        # Sólo pueden superponerse los intervalos que empiezan antes de `fin`
+        # y no más de max_len antes de `inicio`.
+        j = bisect_left(slots, (fin,)) - 1
+        while j >= 0 and slots[j][0] + self.max_len > inicio:
+            if slots[j][1] > inicio:
+                return False
+            j -= 1
+        return True
+
+
+class AvailabilityEngine:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._mesas = []         # (capacidad, numero_mesa, id, ubicacion), ordenada
+        self._capacidades = []   # capacidades en el mismo orden, para el bisect
+        self._mesas_loaded_at = None
+        self._days = OrderedDict()  # date -> DayIndex, del usado hace más tiempo al más reciente
+        self._reservas = {}         # reserva_id -> (mesa_id, inicio, fin), sólo de días indexados
+
+    #---------------------------- carga ----------------------------
+    def _stale(self, loaded_at):
+        return loaded_at is None or time.monotonic() - loaded_at > AVAILABILITY_TTL
+
+    def needs_mesas(self):
+        return self._stale(self._mesas_loaded_at)
+
+    def needs_day(self, day: date):
+        index = self._days.get(day)
+        return index is None or self._stale(index.loaded_at)
+
+    def load_mesas(self, mesas):
+        rows = sorted(
+            (m.capacidad or 0, m.numero_mesa or 0, m.id, m.ubicacion)
+            for m in mesas if m.disponible is not False
+        )
+        with self._lock:
+            self._mesas = rows
+            self._capacidades = [r[0] for r in rows]
+            self._mesas_loaded_at = time.monotonic()
+
+    def invalidate_mesas(self):
+        with self._lock:
+            self._mesas_loaded_at = None
+
+    def load_day(self, day: date, reservas):
+        index = DayIndex()
+        with self._lock:
+            self._drop_day(day)
+            for r in reservas:
+                if r.inicio is None or r.fin is None or r.mesa_id is None:
+                    continue
+                if day in days_touched(r.inicio, r.fin):
+                    index.add(r.mesa_id, r.inicio, r.fin, r.id)
+                    self._reservas[r.id] = (r.mesa_id, r.inicio, r.fin)
+            self._days[day] = index
+            self._purge()
+
+    def _drop_day(self, day: date):
+        # Saca el día y las reservas que no quedan en ningún otro día indexado
+        index = self._days.pop(day, None)
+        if index is None:
+            return
+        for slots in index.slots.values():
+            for inicio, fin, reserva_id in slots:
+                if not any(d in self._days for d in days_touched(inicio, fin)):
+                    self._reservas.pop(reserva_id, None)
+
+    def _purge(self):
+        # Ayer se conserva: una reserva de anoche puede seguir ocupando la mesa
+        ayer = date.today() - timedelta(days=1)
+        for day in [d for d, index in self._days.items() if d < ayer or self._stale(index.loaded_at)]:
+            self._drop_day(day)
+        while len(self._days) > AVAILABILITY_DIAS_MAX:
+            self._drop_day(next(iter(self._days)))
+
+    def stats(self) -> dict:
+        return {"dias": len(self._days), "reservas": len(self._reservas), "mesas": len(self._mesas)}
+
+    #---------------------- actualización incremental ----------------------
+    def _remove(self, reserva_id):
+        previa = self._reservas.pop(reserva_id, None)
+        if previa:
+            mesa_id, inicio, fin = previa
+            for day in days_touched(inicio, fin):
+                if day in self._days:
+                    self._days[day].remove(mesa_id, inicio, fin, reserva_id)
+
+    def upsert_reserva(self, reserva_id, mesa_id, inicio, fin, estado):
+        with self._lock:
+            self._remove(reserva_id)
+            if inicio is None or fin is None or mesa_id is None or (estado or "").lower() in ESTADOS_CANCELADOS:
+                return
+            # Días no indexados: se leen de la base cuando se consulten
+            dias = [day for day in days_touched(inicio, fin) if day in self._days]
+            if dias:
+                self._reservas[reserva_id] = (mesa_id, inicio, fin)
+            for day in dias:
+                self._days[day].add(mesa_id, inicio, fin, reserva_id)
+
+    def delete_reserva(self, reserva_id):
+        with self._lock:
+            self._remove(reserva_id)
+
+    #---------------------------- consulta ----------------------------
+    def find_table(self, personas: int, inicio: datetime, ubicacion: str = None, fin: datetime = None):
+        # Bisect hasta la primera mesa con capacidad suficiente; después recorrido lineal
+        # (de la más chica a la más grande) hasta la primera libre en el horario
+        fin = fin or inicio + RESERVA_DURACION
+        with self._lock:
+            dias = []
+            for day in days_touched(inicio, fin):
+                if day in self._days:
+                    self._days.move_to_end(day)
+                    dias.append(self._days[day])
+            for pos in range(bisect_left(self._capacidades, personas), len(self._mesas)):
+                capacidad, numero_mesa, mesa_id, ubic = self._mesas[pos]
+                if ubicacion and (ubic or "").lower() != ubicacion.lower():
+                    continue
+                if all(d.is_free(mesa_id, inicio, fin) for d in dias):
+                    return {"mesa_id": mesa_id, "numero_mesa": numero_mesa, "capacidad": capacidad, "ubicacion": ubic}
+        return None
+
+
+availability = AvailabilityEngine()
+
+
+async def ensure_loaded(db: AsyncSession, inicio: datetime, fin: datetime):
+    if availability.needs_mesas():
+        result = await db.execute(select(models.Mesa))
+        availability.load_mesas(result.scalars().all())
+    for day in days_touched(inicio, fin):
+        if availability.needs_day(day):
+            # Se incluyen las reservas que empiezan antes y cruzan la medianoche
+            desde = datetime.combine(day, datetime.min.time()) - RESERVA_DURACION_MAX
+            hasta = datetime.combine(day + timedelta(days=1), datetime.min.time())
+            result = await db.execute(
+                select(models.Reserva).where(
+                    models.Reserva.inicio > desde,
+                    models.Reserva.inicio < hasta,
+                    or_(models.Reserva.estado.is_(None), models.Reserva.estado.not_in(ESTADOS_CANCELADOS)),
+                )
+            )
+            availability.load_day(day, result.scalars().all())
+
+
+async def find_free_table(db: AsyncSession, personas: int, inicio: datetime, ubicacion: str = None, fin: datetime = None):
+    fin = fin or inicio + RESERVA_DURACION
+    await ensure_loaded(db, inicio, fin)
+    return availability.find_table(personas, inicio, ubicacion, fin)
+
+
+#========================= S I N C R O N I Z A C I O N ========================================
+# Los cambios de reservas/mesas se anotan en cada flush y se aplican al índice sólo
+# cuando la transacción se confirma (un rollback los descarta).
+
+_CHANGES_KEY = "availability_changes"
+
+
+@event.listens_for(Session, "after_flush")
+def _track_changes(session, flush_context):
+    changes = session.info.setdefault(_CHANGES_KEY, [])
+    for obj in list(session.new) + list(session.dirty):
+        if isinstance(obj, models.Reserva):
+            changes.append(("upsert", (obj.id, obj.mesa_id, obj.inicio, obj.fin, obj.estado)))
+        elif isinstance(obj, models.Mesa):
+            changes.append(("mesas", None))
+    for obj in session.deleted:
+        if isinstance(obj, models.Reserva):
+            changes.append(("delete", obj.id))
+        elif isinstance(obj, models.Mesa):
+            changes.append(("mesas", None))
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_changes(session):
+    for kind, data in session.info.pop(_CHANGES_KEY, []):
+        if kind == "upsert":
+            availability.upsert_reserva(*data)
+        elif kind == "delete":
+            availability.delete_reserva(data)
+        else:
+            availability.invalidate_mesas()
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_changes(session, previous_transaction):
+    if not previous_transaction.nested:
+        session.info.pop(_CHANGES_KEY, None)
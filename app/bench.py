@@ -0,0 +1,481 @@
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+
+# Benchmark de endpoints: latencia (p50 / p95 / p99) y throughput por endpoint.
+#
+# Desde la raíz del repo:
+#   python -m app.bench run [--db /tmp/bodegon_bench.db] [--concurrencia 16] [--requests 200] [--salida bench.json]
+#   python -m app.bench compare base.json nuevo.json [--umbral 10]
+#   python -m app.bench startup [--veces 5] [--max-import-ms 1500] [--max-listo-ms 500]
+#   python -m app.bench polling [--tablets 50] [--rondas 20] [--cambio-cada 5]
+#
+# `run` crea una base SQLite nueva, la carga con datos de prueba (semilla fija: dos corridas
+# ven los mismos datos) y levanta app.main:app en el mismo proceso (ASGI, con su lifespan).
+# Con --url se mide en cambio un server ya levantado (uvicorn, otra base), sin cargar datos.
+# El resultado es un JSON; `compare` lo compara contra otro y termina con código 1 si algún
+# endpoint empeoró más de --umbral % (p95 o throughput) o cambió su tasa de errores.
+# `startup` mide en procesos nuevos cuánto tarda `import app.main` y cuánto tarda un worker
+# en estar listo (lifespan + primer request) con la base ya migrada; termina con código 1 si
+# la mediana supera --max-import-ms / --max-listo-ms.
+# `polling` simula tablets que refrescan mesas y el menú (combos) cada tanto, con y sin GET
+# condicionales (If-None-Match), y compara bytes transferidos y CPU del proceso.
+
+SEMILLA = 1234
+NOMBRES = ["Juan", "María", "José", "Ana", "Lucía", "Martín", "Sofía", "Tomás", "Joaquín", "Inés", "Valentina", "Mateo"]
+APELLIDOS = ["Pérez", "Muñoz", "González", "Gómez", "Fernández", "López", "Díaz", "Martínez", "Romero", "Sosa"]
+PRODUCTOS = ["empanada", "milanesa", "provoleta", "flan", "vacio", "ensalada", "papas fritas", "agua", "vino", "cafe"]
+UBICACIONES = ["salon", "patio", "vereda"]
+DESCARTABLES = 500  # clientes / mesas reservados para los escenarios que borran
+
+
+#=================================== D A T O S ========================================
+def cargar_datos(clientes: int, mesas: int, pedidos: int, reservas: int):
+    from sqlalchemy import insert
+    from app import models, rollups, busqueda
+    from app.database import SessionLocal, AsyncSessionLocal
+
+    rng = random.Random(SEMILLA)
+    ahora = datetime.utcnow().replace(minute=0, second=0, microsecond=0)
+    with SessionLocal() as db:
+        db.execute(insert(models.Cliente), [{
+            "nombre": rng.choice(NOMBRES), "apellido": rng.choice(APELLIDOS),
+            "email": f"cliente{i}@bench.local", "telefono": str(1140000000 + i),
+        } for i in range(clientes + DESCARTABLES)])
+        db.execute(insert(models.Mesa), [{
+            "numero_mesa": i, "capacidad": rng.choice([2, 2, 4, 4, 6, 8]),
+            "ubicacion": rng.choice(UBICACIONES), "disponible": True,
+        } for i in range(1, mesas + DESCARTABLES + 1)])
+        db.execute(insert(models.Combo), [{
+            "nombre_combo": f"Combo {i}", "descripcion": "", "precio": rng.randint(20, 90) * 100,
+        } for i in range(1, 21)])
+        db.execute(insert(models.Proveedor), [{"nombre": "Proveedor", "email": "proveedor@bench.local"}])
+        db.execute(insert(models.Inventario), [{
+            "producto": p, "cantidad": 10 ** 9, "stock_minimo": 0, "proveedor_id": 1,
+        } for p in PRODUCTOS])
+        db.execute(insert(models.Pedido), [{
+            "cliente_id": rng.randint(1, clientes), "mesa_id": rng.randint(1, mesas), "combo_id": rng.randint(1, 20),
+            "producto": rng.choice(PRODUCTOS), "cantidad": rng.randint(1, 4), "total_pedido": rng.randint(10, 200) * 100,
+            "fecha_pedido": ahora - timedelta(minutes=rng.randint(0, 90 * 24 * 60)),
+        } for _ in range(pedidos)])
+        db.execute(insert(models.Pago), [{
+            "pedido_id": i, "metodo_pago_id": None, "monto": rng.randint(10, 200) * 100,
+            "fecha_pago": ahora - timedelta(minutes=rng.randint(0, 90 * 24 * 60)),
+        } for i in range(1, pedidos + 1, 2)])
+        filas = []
+        for _ in range(reservas):
+            inicio = ahora.replace(hour=rng.choice([12, 13, 20, 21, 22])) + timedelta(days=rng.randint(-180, 180))
+            filas.append({
+                "cliente_id": rng.randint(1, clientes), "mesa_id": rng.randint(1, mesas), "estado": "pendiente",
+                "fecha_reserva": inicio, "hora_reserva": inicio.strftime("%H:%M"),
+                "inicio": inicio, "fin": inicio + timedelta(hours=2),
+            })
+        db.execute(insert(models.Reserva), filas)
+        db.commit()
+
+    async def derivados():
+        async with AsyncSessionLocal() as db:
+            await rollups.rebuild(db)
+            await busqueda.reindexar(db)
+
+    asyncio.run(derivados())
+
+
+#================================ E S C E N A R I O S ========================================
+def escenarios(clientes: int, mesas: int, pedidos: int):
+    # nombre -> (método, función(i, rng) -> (url, kwargs), status esperados)
+    hoy = datetime.utcnow().date()
+
+    def get(url):
+        return lambda i, rng: (url(i, rng) if callable(url) else url, {})
+
+    def form(url, data):
+        return lambda i, rng: (url(i, rng) if callable(url) else url, {"data": data(i, rng)})
+
+    def json_(url, body):
+        return lambda i, rng: (url(i, rng) if callable(url) else url, {"json": body(i, rng)})
+
+    def reserva(i, rng):
+        return {
+            "fecha": (hoy + timedelta(days=rng.randint(1, 365))).isoformat(), "hora": f"{rng.randint(12, 23)}:00",
+            "cliente_id": rng.randint(1, clientes), "mesa_id": rng.randint(1, mesas),
+        }
+
+    descartable = lambda base: lambda i, rng: base + (i % DESCARTABLES) + 1
+    # Sin escenario: POST /clientes/{id}/actualizar, POST /mesas/, GET /mesas/{id} y
+    # PUT /mesas/{id} responden con clientes.html / mesa.html, que no existen (siempre
+    # TemplateNotFound): su latencia mediría el error, no el endpoint.
+    return {
+        # clientes
+        "GET /crear_cliente": ("GET", get("/crear_cliente"), {200}),
+        "POST /crear_cliente": ("POST", form("/crear_cliente", lambda i, rng: {
+            "nombre": rng.choice(NOMBRES), "apellido": rng.choice(APELLIDOS),
+            "email": f"nuevo{i}-{rng.random()}@bench.local"}), {200}),
+        "GET /read_clientes": ("GET", get(lambda i, rng: f"/read_clientes?limit=20&skip={rng.randint(0, clientes - 20)}"), {200}),
+        "GET /read_clientes (cursor)": ("GET", get("/read_clientes?limit=20"), {200}),
+        "GET /clientes/search": ("GET", get(lambda i, rng: f"/clientes/search?q={rng.choice(APELLIDOS)[:3]}"), {200}),
+        "GET /clientes/{id}": ("GET", get(lambda i, rng: f"/clientes/{rng.randint(1, clientes)}"), {200}),
+        "PATCH /clientes/{id}": ("PATCH", json_(lambda i, rng: f"/clientes/{rng.randint(1, clientes)}",
+            lambda i, rng: {"telefono": str(rng.randint(10 ** 9, 10 ** 10))}), {200}),
+        "POST /clientes/{id}/eliminar": ("POST", get(lambda i, rng: f"/clientes/{descartable(clientes)(i, rng)}/eliminar"), {200, 400}),
+        # mesas
+        "GET /mesas/": ("GET", get("/mesas/?limit=20"), {200}),
+        "GET /mesas/disponible": ("GET", get(lambda i, rng:
+            f"/mesas/disponible?personas={rng.randint(1, 6)}&fecha={hoy + timedelta(days=rng.randint(0, 60))}&hora={rng.randint(12, 23)}:00"),
+            {200, 404}),
+        "PATCH /mesas/{id}": ("PATCH", json_(lambda i, rng: f"/mesas/{rng.randint(1, mesas)}",
+            lambda i, rng: {"ubicacion": rng.choice(UBICACIONES)}), {200}),
+        "DELETE /mesas/{id}": ("DELETE", get(lambda i, rng: f"/mesas/{descartable(mesas)(i, rng)}"), {200, 404}),
+        # reservas
+        "POST /reservas/": ("POST", json_("/reservas/", reserva), {200, 409}),
+        "POST /reservas/validar": ("POST", json_("/reservas/validar", lambda i, rng: [reserva(i, rng) for _ in range(20)]), {200}),
+        # pedidos
+        "POST /create_pedido": ("POST", form("/create_pedido", lambda i, rng: {
+            "mesa": rng.randint(1, mesas), "producto": rng.choice(PRODUCTOS), "cantidad": rng.randint(1, 3)}), {200}),
+        "GET /pedido": ("GET", get("/pedido"), {200}),
+        "GET /cocina": ("GET", get("/cocina"), {200}),
+        "PATCH /pedidos/{id}": ("PATCH", json_(lambda i, rng: f"/pedidos/{rng.randint(1, pedidos)}",
+            lambda i, rng: {"total_pedido": rng.randint(10, 200) * 100}), {200}),
+        "POST /inventario/{id}/movimientos": ("POST", json_(lambda i, rng: f"/inventario/{rng.randint(1, len(PRODUCTOS))}/movimientos",
+            lambda i, rng: {"cantidad": rng.randint(1, 10), "motivo": "ingreso"}), {200}),
+        # reportes
+        "GET /reportes/ventas/dia": ("GET", get("/reportes/ventas/dia"), {200}),
+        "GET /reportes/ventas/mesa": ("GET", get(lambda i, rng: f"/reportes/ventas/mesa?desde={hoy - timedelta(days=30)}"), {200}),
+        # api v1 (JSON)
+        "GET /api/v1/clientes": ("GET", get("/api/v1/clientes?limit=100"), {200}),
+        "GET /api/v1/clientes/{id}?depth=2": ("GET", get(lambda i, rng: f"/api/v1/clientes/{rng.randint(1, clientes)}?depth=2"), {200}),
+        "GET /api/v1/mesas": ("GET", get("/api/v1/mesas?limit=100"), {200}),
+        "GET /api/v1/combos": ("GET", get("/api/v1/combos"), {200}),
+        "GET /api/v1/pedidos?fields": ("GET", get("/api/v1/pedidos?limit=200&fields=id,mesa_id,producto,cantidad"), {200}),
+    }
+
+
+#=================================== M E D I C I O N ========================================
+def percentil(ordenados, p: float):
+    # Nearest-rank sobre la lista ya ordenada
+    if not ordenados:
+        return None
+    k = max(0, min(len(ordenados) - 1, int(round(p / 100 * len(ordenados) + 0.5)) - 1))
+    return ordenados[k]
+
+
+async def medir(client, metodo, generador, esperados, requests: int, concurrencia: int, calentamiento: int):
+    rng = random.Random(SEMILLA)
+    pendientes = iter(range(calentamiento + requests))
+    latencias, errores, statuses = [], 0, {}
+
+    async def worker():
+        nonlocal errores
+        for i in pendientes:
+            url, kwargs = generador(i, rng)
+            inicio = time.perf_counter()
+            try:
+                response = await client.request(metodo, url, **kwargs)
+                status = response.status_code
+            except Exception:
+                status = "excepcion"
+            duracion = time.perf_counter() - inicio
+            if i < calentamiento:
+                continue
+            latencias.append(duracion)
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+            if status not in esperados:
+                errores += 1
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrencia)))
+    total = time.perf_counter() - inicio
+    latencias.sort()
+    ms = lambda s: round(s * 1000, 3) if s is not None else None
+    return {
+        "requests": len(latencias),
+        "rps": round(len(latencias) / total, 1) if total else None,
+        "p50_ms": ms(percentil(latencias, 50)),
+        "p95_ms": ms(percentil(latencias, 95)),
+        "p99_ms": ms(percentil(latencias, 99)),
+        "max_ms": ms(latencias[-1] if latencias else None),
+        "errores": errores,
+        "status": statuses,
+    }
+
+
+async def correr(args, tamanos):
+    import httpx
+
+    seleccion = escenarios(*tamanos)
+    if args.solo:
+        seleccion = {k: v for k, v in seleccion.items() if any(f in k for f in args.solo)}
+    resultados = {}
+
+    async def todos(client):
+        for nombre, (metodo, generador, esperados) in seleccion.items():
+            resultados[nombre] = await medir(client, metodo, generador, esperados, args.requests, args.concurrencia, args.calentamiento)
+            r = resultados[nombre]
+            print(f"{nombre:40} {r['rps']:>8} rps  p50 {r['p50_ms']:>8} ms  p95 {r['p95_ms']:>8} ms  "
+                  f"p99 {r['p99_ms']:>8} ms  errores {r['errores']}", file=sys.stderr)
+
+    if args.url:
+        async with httpx.AsyncClient(base_url=args.url, timeout=30) as client:
+            await todos(client)
+    else:
+        from app.main import app
+        async with app.router.lifespan_context(app):
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=30) as client:
+                await todos(client)
+    return resultados
+
+
+def metadatos(args):
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = None
+    import sqlalchemy
+    return {
+        "fecha": datetime.utcnow().isoformat(timespec="seconds"),
+        "commit": commit or None,
+        "python": platform.python_version(),
+        "sqlalchemy": sqlalchemy.__version__,
+        "plataforma": platform.platform(),
+        "destino": getattr(args, "url", None) or f"sqlite:///{args.db}",
+        "parametros": {k: v for k, v in vars(args).items() if k not in ("accion", "url", "db", "salida", "solo")},
+    }
+
+
+def run(args):
+    if not args.url:
+        # La base se elige antes de importar app.database
+        if os.path.exists(args.db):
+            os.remove(args.db)
+        os.environ["DATABASE_URL"] = f"sqlite:///{args.db}"
+        os.environ.pop("ASYNC_DATABASE_URL", None)
+        from app import migrations
+        migrations.upgrade()
+        print("Cargando datos...", file=sys.stderr)
+        cargar_datos(args.clientes, args.mesas, args.pedidos, args.reservas)
+    resultados = asyncio.run(correr(args, (args.clientes, args.mesas, args.pedidos)))
+    salida = {"meta": metadatos(args), "resultados": resultados}
+    with open(args.salida, "w") as f:
+        json.dump(salida, f, indent=2, ensure_ascii=False)
+    print(f"Resultados en {args.salida}", file=sys.stderr)
+    return 0
+
+
+#==================================== A R R A N Q U E ========================================
+# Corre en un proceso nuevo: los tiempos incluyen todos los imports, como en un worker real
+HIJO_STARTUP = """
+import asyncio, json, time
+t0 = time.perf_counter()
+from app.main import create_app
+t1 = time.perf_counter()
+import httpx  # noqa: E402  (fuera de lo medido)
+
+async def listo():
+    t1 = time.perf_counter()
+    app = create_app()
+    t2 = time.perf_counter()
+    async with app.router.lifespan_context(app):
+        t3 = time.perf_counter()
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            status = (await client.get("/test")).status_code
+        t4 = time.perf_counter()
+    return {"create_app_ms": (t2 - t1) * 1000, "lifespan_ms": (t3 - t2) * 1000, "listo_ms": (t4 - t1) * 1000, "status": status}
+
+muestra = asyncio.run(listo())
+print(json.dumps({"import_ms": (t1 - t0) * 1000, **muestra}))
+"""
+
+
+def startup(args):
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{args.db}")
+    env.pop("ASYNC_DATABASE_URL", None)
+    # La base se migra antes: se mide el arranque normal de un worker, no la primera migración
+    subprocess.run([sys.executable, "-m", "app.migrations", "upgrade"], env=env, check=True, capture_output=True)
+
+    muestras = []
+    for _ in range(args.veces):
+        inicio = time.perf_counter()
+        proc = subprocess.run([sys.executable, "-c", HIJO_STARTUP], env=env, capture_output=True, text=True)
+        if proc.returncode != 0:
+            print(proc.stderr, file=sys.stderr)
+            return 2
+        muestra = json.loads(proc.stdout.strip().splitlines()[-1])
+        muestra["proceso_ms"] = (time.perf_counter() - inicio) * 1000
+        muestras.append(muestra)
+
+    resumen = {}
+    for clave in ("import_ms", "create_app_ms", "lifespan_ms", "listo_ms", "proceso_ms"):
+        ordenados = sorted(m[clave] for m in muestras)
+        resumen[clave] = {"mediana": round(percentil(ordenados, 50), 1), "max": round(ordenados[-1], 1)}
+        print(f"{clave:14} mediana {resumen[clave]['mediana']:>8} ms  max {resumen[clave]['max']:>8} ms")
+    if args.salida:
+        with open(args.salida, "w") as f:
+            json.dump({"meta": metadatos(args), "startup": resumen, "muestras": muestras}, f, indent=2)
+
+    fallas = [
+        f"{clave} {resumen[clave]['mediana']} ms > {limite} ms"
+        for clave, limite in (("import_ms", args.max_import_ms), ("listo_ms", args.max_listo_ms))
+        if limite is not None and resumen[clave]["mediana"] > limite
+    ]
+    if any(m["status"] != 200 for m in muestras):
+        fallas.append("el primer request no devolvió 200")
+    for falla in fallas:
+        print(f"REGRESION: {falla}")
+    return 1 if fallas else 0
+
+
+#===================================== P O L L I N G ========================================
+URLS_POLLING = ("/mesas/?limit=100", "/api/v1/mesas?limit=100", "/api/v1/combos")
+
+
+async def sondear(app, tablets: int, rondas: int, cambio_cada: int, condicional: bool):
+    import httpx
+
+    totales = {"requests": 0, "200": 0, "304": 0, "bytes": 0, "errores": 0}
+
+    async def tablet(client, n):
+        etags = {}
+        for ronda in range(rondas):
+            if n == 0 and cambio_cada and ronda and ronda % cambio_cada == 0:
+                # Alguien cambia una mesa: todas las tablets tienen que volver a bajarla
+                await client.patch(f"/mesas/{ronda % 10 + 1}", json={"disponible": ronda % 2 == 0})
+            for url in URLS_POLLING:
+                headers = {"If-None-Match": etags[url]} if condicional and url in etags else {}
+                r = await client.get(url, headers=headers)
+                totales["requests"] += 1
+                totales["bytes"] += len(r.content) + sum(len(k) + len(v) + 4 for k, v in r.headers.items())
+                if r.status_code in (200, 304):
+                    totales[str(r.status_code)] += 1
+                else:
+                    totales["errores"] += 1
+                if "etag" in r.headers:
+                    etags[url] = r.headers["etag"]
+            await asyncio.sleep(0)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=30) as client:
+        cpu, inicio = time.process_time(), time.perf_counter()
+        await asyncio.gather(*(tablet(client, n) for n in range(tablets)))
+        totales["cpu_s"] = round(time.process_time() - cpu, 3)
+        totales["seg"] = round(time.perf_counter() - inicio, 3)
+    return totales
+
+
+def polling(args):
+    if os.path.exists(args.db):
+        os.remove(args.db)
+    os.environ["DATABASE_URL"] = f"sqlite:///{args.db}"
+    os.environ.pop("ASYNC_DATABASE_URL", None)
+    from app import migrations
+    migrations.upgrade()
+    cargar_datos(clientes=100, mesas=100, pedidos=100, reservas=100)
+
+    async def ambos():
+        from app.main import app
+        async with app.router.lifespan_context(app):
+            # El CPU se mide en el proceso: incluye al cliente httpx, igual en los dos modos
+            return {
+                modo: await sondear(app, args.tablets, args.rondas, args.cambio_cada, modo == "condicional")
+                for modo in ("completo", "condicional")
+            }
+
+    resultados = asyncio.run(ambos())
+    for modo, r in resultados.items():
+        print(f"{modo:12} requests {r['requests']:>6}  200 {r['200']:>6}  304 {r['304']:>6}  "
+              f"{r['bytes'] / 1024:>10.1f} KiB  cpu {r['cpu_s']:>7} s  {r['seg']:>7} s  errores {r['errores']}")
+    base, cond = resultados["completo"], resultados["condicional"]
+    print(f"ahorro: {100 - cond['bytes'] * 100 / base['bytes']:.1f}% bytes, "
+          f"{100 - cond['cpu_s'] * 100 / base['cpu_s']:.1f}% CPU")
+    if args.salida:
+        with open(args.salida, "w") as f:
+            json.dump({"meta": metadatos(args), "polling": resultados}, f, indent=2)
+    return 0
+
+
+#================================= C O M P A R A C I O N ========================================
+def compare(args):
+    with open(args.base) as f:
+        base = json.load(f)["resultados"]
+    with open(args.nuevo) as f:
+        nuevo = json.load(f)["resultados"]
+
+    regresiones = []
+    print(f"{'endpoint':40} {'p95 base':>10} {'p95 nuevo':>10} {'Δ%':>7} {'rps base':>9} {'rps nuevo':>9} {'Δ%':>7}")
+    for nombre in sorted(set(base) & set(nuevo)):
+        b, n = base[nombre], nuevo[nombre]
+        delta = lambda x, y: (y - x) / x * 100 if x and y is not None else 0.0
+        d_p95, d_rps = delta(b["p95_ms"], n["p95_ms"]), delta(b["rps"], n["rps"])
+        motivos = []
+        # Diferencias de menos de --minimo-ms en p95 se consideran ruido
+        if d_p95 > args.umbral and n["p95_ms"] - b["p95_ms"] > args.minimo_ms:
+            motivos.append(f"p95 +{d_p95:.1f}%")
+        if d_rps < -args.umbral:
+            motivos.append(f"rps {d_rps:.1f}%")
+        tasa = lambda r: r["errores"] / r["requests"] if r["requests"] else 0
+        if tasa(n) > tasa(b):
+            motivos.append(f"errores {b['errores']} -> {n['errores']}")
+        marca = "  REGRESION: " + ", ".join(motivos) if motivos else ""
+        print(f"{nombre:40} {b['p95_ms']:>10} {n['p95_ms']:>10} {d_p95:>+7.1f} {b['rps']:>9} {n['rps']:>9} {d_rps:>+7.1f}{marca}")
+        if motivos:
+            regresiones.append(nombre)
+    for nombre in sorted(set(base) ^ set(nuevo)):
+        print(f"{nombre:40} (sólo en {'base' if nombre in base else 'nuevo'})")
+    if regresiones:
+        print(f"\n{len(regresiones)} endpoint(s) con regresión (umbral {args.umbral}%)")
+        return 1
+    return 0
+
+
+#==================================== C O N S O L A ========================================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark de endpoints")
+    sub = parser.add_subparsers(dest="accion", required=True)
+
+    p_run = sub.add_parser("run", help="correr el benchmark")
+    p_run.add_argument("--db", default="/tmp/bodegon_bench.db", help="archivo SQLite (se recrea)")
+    p_run.add_argument("--url", help="medir un server ya levantado en vez de la app en proceso")
+    p_run.add_argument("--concurrencia", type=int, default=16)
+    p_run.add_argument("--requests", type=int, default=200, help="requests medidos por endpoint")
+    p_run.add_argument("--calentamiento", type=int, default=20, help="requests previos no medidos")
+    p_run.add_argument("--clientes", type=int, default=20000)
+    p_run.add_argument("--mesas", type=int, default=60)
+    p_run.add_argument("--pedidos", type=int, default=50000)
+    p_run.add_argument("--reservas", type=int, default=20000)
+    p_run.add_argument("--solo", nargs="*", help="sólo los endpoints que contengan alguno de estos textos")
+    p_run.add_argument("--salida", default="bench.json")
+
+    p_cmp = sub.add_parser("compare", help="comparar dos resultados")
+    p_cmp.add_argument("base")
+    p_cmp.add_argument("nuevo")
+    p_cmp.add_argument("--umbral", type=float, default=10.0, help="% de empeoramiento tolerado")
+    p_cmp.add_argument("--minimo-ms", type=float, default=1.0, help="diferencia mínima de p95 a considerar")
+
+    p_start = sub.add_parser("startup", help="medir el arranque de un worker")
+    p_start.add_argument("--db", default="/tmp/bodegon_startup.db", help="archivo SQLite (se migra si hace falta)")
+    p_start.add_argument("--veces", type=int, default=5)
+    p_start.add_argument("--max-import-ms", type=float, help="mediana máxima de import app.main")
+    p_start.add_argument("--max-listo-ms", type=float, help="mediana máxima de create_app + lifespan + primer request")
+    p_start.add_argument("--salida", help="guardar el resultado en JSON")
+
+    p_poll = sub.add_parser("polling", help="tablets refrescando mesas y menú, con y sin 304")
+    p_poll.add_argument("--db", default="/tmp/bodegon_polling.db", help="archivo SQLite (se recrea)")
+    p_poll.add_argument("--tablets", type=int, default=50)
+    p_poll.add_argument("--rondas", type=int, default=20, help="refrescos por tablet")
+    p_poll.add_argument("--cambio-cada", type=int, default=5, help="cada cuántas rondas cambia una mesa (0 = nunca)")
+    p_poll.add_argument("--salida", help="guardar el resultado en JSON")
+
+    args = parser.parse_args(argv)
+    return {"run": run, "compare": compare, "startup": startup, "polling": polling}[args.accion](args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,291 @@
+import argparse
+import csv
+import io
+import json
+import sys
+import asyncio
+from itertools import islice
+
+from pydantic import ValidationError
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy import insert
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import models, schemas, busqueda
+from app.database import AsyncSessionLocal
+from app.cache import touch
+from app.availability import availability
+
+# Carga masiva (alta de una sucursal nueva): se leen filas CSV / JSON en streaming,
+# se validan por bloques con los schemas *Create y cada bloque se inserta con un
+# único executemany dentro de su propia transacción. Los errores se informan por fila.
+# - Lectura, parseo y validación de cada bloque corren en un thread (no bloquean el loop);
+#   el INSERT va por la sesión async.
+# - Un archivo mal formado a mitad de camino no pierde lo ya cargado: los bloques anteriores
+#   quedan confirmados y el resultado informa hasta dónde se llegó y dónde está el error.
+#
+# Uso por consola:  python -m app.bulk clientes clientes.csv [--chunk 1000]
+
+# entidad -> (schema de validación, modelo, renombre de campos schema -> columna)
+BULK_ENTITIES = {
+    "clientes": (schemas.ClienteCreate, models.Cliente, {}),
+    "mesas": (schemas.MesaCreate, models.Mesa, {}),
+    "combos": (schemas.ComboCreate, models.Combo, {"nombre": "nombre_combo"}),
+    "inventario": (schemas.InventarioCreate, models.Inventario, {}),
+}
+
+DEFAULT_CHUNK_SIZE = 500
+JSON_LECTURA = 1 << 16       # caracteres por lectura del archivo JSON
+JSON_FILA_MAX = 1 << 20      # un objeto de la lista no puede ocupar más que esto
+SEPARADORES_JSON = frozenset(",]} \t\r\n")
+
+
+class FormatoInvalido(ValueError):
+    # El archivo no se puede seguir leyendo (no es un error de una fila sola)
+    def __init__(self, mensaje: str, posicion=None):
+        super().__init__(mensaje)
+        self.posicion = posicion  # carácter (JSON) o línea (CSV) donde se detectó
+
+
+#================================ L E C T U R A ========================================
+
+def iter_csv_rows(text_stream):
+    reader = csv.DictReader(text_stream)
+    try:
+        for row in reader:
+            # Celdas vacías = campo no informado (toma el default del schema)
+            yield {k.strip(): v for k, v in row.items() if k and v not in ("", None)}
+    except csv.Error as e:
+        raise FormatoInvalido(f"CSV inválido: {e}", posicion=f"línea {reader.line_num}")
+
+
+def iter_json_array(text_stream):
+    # Lista JSON leída de a JSON_LECTURA caracteres: se decodifica un objeto por vez y en
+    # memoria queda sólo lo que falta procesar del último bloque leído.
+    decoder = json.JSONDecoder()
+    buf, pos, offset, eof = "", 0, 0, False
+
+    def leer():
+        nonlocal buf, pos, offset, eof
+        data = text_stream.read(JSON_LECTURA)
+        if not data:
+            eof = True
+            return False
+        offset += pos
+        buf, pos = buf[pos:] + data, 0
+        return True
+
+    def siguiente():
+        # Próximo carácter que no sea espacio (None al final del archivo)
+        nonlocal pos
+        while True:
+            while pos < len(buf) and buf[pos].isspace():
+                pos += 1
+            if pos < len(buf):
+                return buf[pos]
+            if not leer():
+                return None
+
+    def decodificar():
+        # Un valor desde pos; si el bloque lo corta a la mitad se lee más
+        while True:
+            completo = eof or len(buf) - pos > JSON_FILA_MAX
+            try:
+                valor, fin = decoder.raw_decode(buf, pos)
+                # Un número cortado por el bloque ("3." de "3.25") decodifica igual: el valor
+                # vale sólo si lo sigue un separador
+                if completo or (fin < len(buf) and buf[fin] in SEPARADORES_JSON):
+                    return valor, fin
+            except json.JSONDecodeError as e:
+                if completo:
+                    raise FormatoInvalido(f"JSON inválido: {e.msg}", posicion=offset + e.pos)
+            leer()
+
+    c = siguiente()
+    if c is None:
+        return
+    if c == "{":
+        # Un solo objeto (no una lista)
+        valor, pos = decodificar()
+        yield valor
+        return
+    if c != "[":
+        raise FormatoInvalido("Se esperaba una lista JSON", posicion=offset + pos)
+    pos += 1
+    if siguiente() == "]":
+        return
+    while True:
+        if siguiente() is None:
+            raise FormatoInvalido("Lista JSON sin cerrar", posicion=offset + pos)
+        valor, pos = decodificar()
+        yield valor
+        c = siguiente()
+        if c == "]":
+            return
+        if c != ",":
+            raise FormatoInvalido("Se esperaba ',' o ']'", posicion=offset + pos)
+        pos += 1
+
+
+def iter_json_rows(text_stream, lines: bool):
+    if lines:
+        # JSON Lines: un objeto por línea, se procesa sin cargar el archivo entero
+        for line in text_stream:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                yield None  # se informa como fila inválida sin cortar la carga
+    else:
+        yield from iter_json_array(text_stream)
+
+
+def iter_rows(binary_stream, filename: str):
+    text_stream = io.TextIOWrapper(binary_stream, encoding="utf-8-sig", newline="")
+    name = (filename or "").lower()
+    if name.endswith(".csv"):
+        return iter_csv_rows(text_stream)
+    if name.endswith((".jsonl", ".ndjson")):
+        return iter_json_rows(text_stream, lines=True)
+    if name.endswith(".json"):
+        return iter_json_rows(text_stream, lines=False)
+    raise ValueError("Formato no soportado (usar .csv, .json o .jsonl)")
+
+
+def leer_bloque(rows, size: int):
+    # Hasta `size` filas del iterador; si el archivo se corta con un error de formato se
+    # devuelven las filas leídas hasta ahí junto con el error
+    chunk = []
+    try:
+        chunk.extend(islice(rows, size))
+    except (ValueError, UnicodeDecodeError) as e:
+        return chunk, e
+    return chunk, None
+
+
+#================================ V A L I D A C I O N ========================================
+
+def format_validation_error(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(p) for p in e['loc']) or 'fila'}: {e['msg']}" for e in error.errors()
+    )
+
+
+def validate_chunk(entity: str, rows, start: int):
+    schema, _, renames = BULK_ENTITIES[entity]
+    valid, errors = [], []
+    for numero, row in enumerate(rows, start=start):
+        try:
+            data = schema(**row).dict()
+        except ValidationError as e:
+            errors.append({"fila": numero, "error": format_validation_error(e)})
+            continue
+        except TypeError:
+            errors.append({"fila": numero, "error": "La fila no es un objeto"})
+            continue
+        valid.append((numero, {renames.get(k, k): v for k, v in data.items()}))
+    return valid, errors
+
+
+#================================ I N S E R C I O N ========================================
+
+# Escrituras derivadas que van en la misma transacción que el INSERT: (conn, filas)
+AFTER_INSERT = {
+    "clientes": busqueda.indexar_insertados,
+}
+
+
+async def insert_chunk(db: AsyncSession, model, valid, after_insert=None):
+    errors = []
+    try:
+        await db.execute(insert(model), [data for _, data in valid])
+        if after_insert is not None:
+            await db.run_sync(lambda s: after_insert(s.connection(), [data for _, data in valid]))
+        await db.commit()
+        return len(valid), errors
+    except SQLAlchemyError:
+        await db.rollback()
+
+    # El bloque falló (ej: email duplicado): se reintenta fila por fila con savepoints
+    # para insertar las válidas e informar sólo las que chocan.
+    inserted = 0
+    for numero, data in valid:
+        try:
+            async with db.begin_nested():
+                await db.execute(insert(model), [data])
+                if after_insert is not None:
+                    await db.run_sync(lambda s: after_insert(s.connection(), [data]))
+            inserted += 1
+        except SQLAlchemyError as e:
+            errors.append({"fila": numero, "error": str(getattr(e, "orig", e))})
+    await db.commit()
+    return inserted, errors
+
+
+def _leer_y_validar(entity: str, rows, size: int, start: int):
+    # Corre en un thread: lectura del archivo, parseo y validación del bloque
+    chunk, error = leer_bloque(rows, size)
+    valid, errors = validate_chunk(entity, chunk, start)
+    return len(chunk), valid, errors, error
+
+
+async def import_rows(db: AsyncSession, entity: str, rows, chunk_size: int = DEFAULT_CHUNK_SIZE):
+    # Si el archivo tiene un error de formato, result["error"] dice en qué fila (y posición)
+    # se cortó la lectura; lo anterior ya quedó insertado.
+    if entity not in BULK_ENTITIES:
+        raise KeyError(entity)
+    model = BULK_ENTITIES[entity][1]
+    result = {"entidad": entity, "filas": 0, "insertados": 0, "errores": []}
+    rows = iter(rows)
+    start = 1
+    while True:
+        leidas, valid, errors, error = await run_in_threadpool(_leer_y_validar, entity, rows, chunk_size, start)
+        result["errores"].extend(errors)
+        if valid:
+            inserted, db_errors = await insert_chunk(db, model, valid, AFTER_INSERT.get(entity))
+            result["insertados"] += inserted
+            result["errores"].extend(db_errors)
+        start += leidas
+        result["filas"] += leidas
+        if error is not None:
+            result["error"] = {"fila": start, "posicion": getattr(error, "posicion", None), "detalle": str(error)}
+            break
+        if leidas < chunk_size:
+            break
+    if result["insertados"]:
+        touch(entity)
+        if entity == "mesas":
+            availability.invalidate_mesas()
+    return result
+
+
+#================================ C O N S O L A ========================================
+
+async def import_file(entity: str, path: str, chunk_size: int = DEFAULT_CHUNK_SIZE):
+    with open(path, "rb") as f:
+        async with AsyncSessionLocal() as db:
+            return await import_rows(db, entity, iter_rows(f, path), chunk_size)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Carga masiva de datos")
+    parser.add_argument("entidad", choices=sorted(BULK_ENTITIES))
+    parser.add_argument("archivo", help="archivo .csv, .json o .jsonl")
+    parser.add_argument("--chunk", type=int, default=DEFAULT_CHUNK_SIZE, help="filas por transacción")
+    args = parser.parse_args(argv)
+
+    result = asyncio.run(import_file(args.entidad, args.archivo, args.chunk))
+    for error in result["errores"]:
+        print(f"Fila {error['fila']}: {error['error']}", file=sys.stderr)
+    if "error" in result:
+        e = result["error"]
+        print(f"Lectura cortada en la fila {e['fila']} (posición {e['posicion']}): {e['detalle']}", file=sys.stderr)
+    print(f"{result['insertados']} de {result['filas']} filas insertadas en {args.entidad}")
+    return 0 if not result["errores"] and "error" not in result else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
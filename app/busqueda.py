@@ -0,0 +1,169 @@
+import argparse
+import asyncio
+import re
+import sys
+import unicodedata
+
+from sqlalchemy import delete, event, insert, inspect, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, aliased
+
+from app import models
+from app.database import AsyncSessionLocal
+
+# Búsqueda de clientes mientras se escribe (typeahead).
+# clientes_busqueda guarda una fila (token, cliente_id) por palabra de nombre, apellido,
+# email y teléfono, en minúsculas y sin acentos ("Muñoz" -> "munoz"). Su clave primaria
+# es un índice ordenado por token: cada término buscado es un rango
+# token >= 'mu' AND token < 'mv' que se recorre en orden y corta en `limit`.
+# Con varios términos ("ana go") el cliente tiene que tener un token para cada uno.
+#
+# Se mantiene al confirmar altas / cambios / bajas del ORM y desde los UPDATE / INSERT
+# por Core (PATCH, carga masiva). Para indexar clientes existentes:
+#     python -m app.busqueda reindexar
+
+CAMPOS = ("nombre", "apellido", "email", "telefono")
+TOKEN_MAX = models.ClienteBusqueda.token.type.length
+BUSQUEDA_LIMIT_MAX = 50
+_PALABRAS = re.compile(r"[^\W_]+")
+_TELEFONO = re.compile(r"^[\d\s()+.-]+$")
+
+busqueda = models.ClienteBusqueda.__table__
+
+
+def normalizar(texto: str) -> str:
+    texto = unicodedata.normalize("NFKD", texto or "")
+    return "".join(c for c in texto if not unicodedata.combining(c)).lower().strip()
+
+
+def tokens_cliente(nombre=None, apellido=None, email=None, telefono=None):
+    tokens = set()
+    for texto in (nombre, apellido):
+        tokens.update(_PALABRAS.findall(normalizar(texto)))
+    email = normalizar(email)
+    if email:
+        # El email completo (para "juan.perez@") y sus partes (para "perez")
+        tokens.add(email)
+        tokens.update(_PALABRAS.findall(email))
+    telefono = re.sub(r"\D", "", telefono or "")
+    if telefono:
+        tokens.add(telefono)
+    return {t[:TOKEN_MAX] for t in tokens}
+
+
+def terminos(q: str):
+    q = normalizar(q)
+    if _TELEFONO.match(q) and any(c.isdigit() for c in q):
+        # "11 4567-89" se busca como un solo número
+        return [re.sub(r"\D", "", q)]
+    return [t[:TOKEN_MAX] for t in q.split() if t]
+
+
+def _siguiente(prefijo: str) -> str:
+    # Menor texto mayor que todos los que empiezan con `prefijo`
+    return prefijo[:-1] + chr(ord(prefijo[-1]) + 1)
+
+
+#=================================== C O N S U L T A ========================================
+async def buscar_clientes(db: AsyncSession, q: str, limit: int = 10):
+    terms = sorted(set(terminos(q)), key=len, reverse=True)
+    if not terms:
+        return []
+    # El término más largo (el más selectivo) recorre el índice; el resto filtra por join
+    tablas = [aliased(models.ClienteBusqueda) for _ in terms]
+    principal = tablas[0]
+    stmt = select(principal.cliente_id).select_from(principal)
+    for tabla in tablas[1:]:
+        stmt = stmt.join(tabla, tabla.cliente_id == principal.cliente_id)
+    for tabla, term in zip(tablas, terms):
+        stmt = stmt.where(tabla.token >= term, tabla.token < _siguiente(term))
+    # Un cliente puede aparecer con varios tokens del mismo prefijo: se piden de más
+    stmt = stmt.order_by(principal.token, principal.cliente_id).limit(limit * 4)
+
+    ids = list(dict.fromkeys((await db.execute(stmt)).scalars()))[:limit]
+    if not ids:
+        return []
+    result = await db.execute(select(*(getattr(models.Cliente, c) for c in ("id", *CAMPOS))).where(models.Cliente.id.in_(ids)))
+    clientes = {row["id"]: dict(row) for row in result.mappings()}
+    return [clientes[i] for i in ids if i in clientes]
+
+
+#================================= I N D E X A C I O N ========================================
+def indexar(conn, clientes):
+    # clientes: dicts con id y CAMPOS. Reemplaza los tokens de cada uno.
+    ids = [c["id"] for c in clientes]
+    if not ids:
+        return
+    conn.execute(delete(busqueda).where(busqueda.c.cliente_id.in_(ids)))
+    rows = [
+        {"token": token, "cliente_id": c["id"]}
+        for c in clientes for token in tokens_cliente(*(c.get(campo) for campo in CAMPOS))
+    ]
+    if rows:
+        conn.execute(insert(busqueda), rows)
+
+
+def reindexar_ids(conn, ids):
+    # Para escrituras por Core: se relee la fila ya modificada (misma transacción)
+    if ids:
+        result = conn.execute(select(*(models.Cliente.__table__.c[c] for c in ("id", *CAMPOS))).where(models.Cliente.id.in_(ids)))
+        indexar(conn, [dict(row) for row in result.mappings()])
+
+
+def indexar_insertados(conn, rows):
+    # Carga masiva (INSERT por Core sin RETURNING): se recuperan los ids por email (único)
+    emails = [row["email"] for row in rows if row.get("email")]
+    if emails:
+        ids = conn.execute(select(models.Cliente.id).where(models.Cliente.email.in_(emails))).scalars().all()
+        reindexar_ids(conn, ids)
+
+
+async def reindexar(db: AsyncSession, chunk: int = 5000):
+    await db.execute(delete(busqueda))
+    desde, total = 0, 0
+    while True:
+        ids = (await db.execute(
+            select(models.Cliente.id).where(models.Cliente.id > desde).order_by(models.Cliente.id).limit(chunk)
+        )).scalars().all()
+        if not ids:
+            break
+        await db.run_sync(lambda s: reindexar_ids(s.connection(), ids))
+        desde, total = ids[-1], total + len(ids)
+    await db.commit()
+    return total
+
+
+#========================= S I N C R O N I Z A C I O N ========================================
+# Altas / cambios / bajas de clientes con el ORM (crud.create_cliente, update_cliente,
+# delete_cliente y sus versiones async): se reindexan en el mismo flush.
+
+@event.listens_for(Session, "after_flush")
+def _indexar_clientes(session, flush_context):
+    cambiados = [obj for obj in session.new if isinstance(obj, models.Cliente)] + [
+        obj for obj in session.dirty
+        if isinstance(obj, models.Cliente) and any(inspect(obj).attrs[c].history.has_changes() for c in CAMPOS)
+    ]
+    borrados = [obj.id for obj in session.deleted if isinstance(obj, models.Cliente)]
+    conn = session.connection() if cambiados or borrados else None
+    if cambiados:
+        indexar(conn, [{"id": obj.id, **{c: getattr(obj, c) for c in CAMPOS}} for obj in cambiados])
+    if borrados:
+        conn.execute(delete(busqueda).where(busqueda.c.cliente_id.in_(borrados)))
+
+
+#==================================== C O N S O L A ========================================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Índice de búsqueda de clientes")
+    parser.add_argument("accion", choices=["reindexar"])
+    args = parser.parse_args(argv)
+
+    async def run():
+        async with AsyncSessionLocal() as db:
+            return await reindexar(db)
+
+    print(f"{asyncio.run(run())} clientes indexados")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
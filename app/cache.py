@@ -0,0 +1,149 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+from sqlalchemy import inspect
+
+# Caché en memoria (por proceso) para catálogos que se leen en cada interacción
+# del POS y cambian pocas veces al día: mesas y combos.
+# - TTL: acota cuánto puede quedar desactualizado un worker que no vio la escritura.
+# - LRU: acota la memoria (cantidad de entradas).
+# Las funciones de escritura de crud / models invalidan el espacio correspondiente.
+# - read_through no guarda lo que cargó si la tabla cambió (touch) mientras cargaba: ese
+#   valor puede ser anterior a la escritura y quedaría en la caché hasta el TTL.
+
+CACHE_TTL = float(os.getenv("CACHE_TTL", "300"))  # segundos
+CACHE_MAXSIZE = int(os.getenv("CACHE_MAXSIZE", "1024"))
+
+_MISSING = object()
+
+
+class TTLCache:
+    def __init__(self, name: str, maxsize: int = CACHE_MAXSIZE, ttl: float = CACHE_TTL, table: str = None):
+        self.name = name
+        self.table = table  # tabla cuya versión de datos respalda las entradas
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, key, default=_MISSING):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                expires, value = entry
+                if expires > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key, value, version: int = None):
+        # version: la de self.table antes de cargar `value`; si cambió, no se guarda.
+        # Se compara bajo el lock: touch() sube la versión antes de invalidar, así que
+        # o el set entra primero (y la invalidación lo borra) o ve la versión nueva.
+        with self._lock:
+            if version is not None and data_versions.get(self.table) != version:
+                return
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self):
+        with self._lock:
+            self._data.clear()
+            self.invalidations += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+                "invalidations": self.invalidations,
+            }
+
+
+mesas_cache = TTLCache("mesas", table="mesas")
+combos_cache = TTLCache("combos", table="combos")
+fragment_cache = TTLCache("fragmentos")
+
+# Tablas cuyas escrituras invalidan una caché de lectura
+TABLE_CACHES = {"mesas": mesas_cache, "combos": combos_cache}
+
+
+class DataVersions:
+    # Versión de datos por tabla: se incrementa en cada escritura hecha por crud / models
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._versions = {}
+        self._started = datetime.now(timezone.utc)
+
+    def bump(self, table: str):
+        with self._lock:
+            version, _ = self._versions.get(table, (0, None))
+            self._versions[table] = (version + 1, datetime.now(timezone.utc))
+
+    def get(self, table: str) -> int:
+        return self._versions.get(table, (0, None))[0]
+
+    def modified(self, table: str) -> datetime:
+        return self._versions.get(table, (0, self._started))[1]
+
+
+data_versions = DataVersions()
+
+
+def touch(table: str):
+    # Llamar después de confirmar una escritura sobre `table`
+    data_versions.bump(table)
+    cache = TABLE_CACHES.get(table)
+    if cache is not None:
+        cache.invalidate()
+
+
+def snapshot(obj):
+    # Copia desacoplada de la sesión (sólo columnas): se puede compartir entre
+    # requests sin que un commit/expire de otra sesión la invalide.
+    if obj is None:
+        return None
+    mapper = inspect(obj).mapper
+    return mapper.class_(**{attr.key: getattr(obj, attr.key) for attr in mapper.column_attrs})
+
+
+def _version(cache: TTLCache):
+    return data_versions.get(cache.table) if cache.table is not None else None
+
+
+def read_through(cache: TTLCache, key, loader):
+    value = cache.get(key)
+    if value is _MISSING:
+        version = _version(cache)
+        value = loader()
+        cache.set(key, value, version)
+    return value
+
+
+async def read_through_async(cache: TTLCache, key, loader):
+    value = cache.get(key)
+    if value is _MISSING:
+        version = _version(cache)
+        value = await loader()
+        cache.set(key, value, version)
+    return value
+
+
+def get_cache_stats() -> dict:
+    return {cache.name: cache.stats() for cache in (mesas_cache, combos_cache, fragment_cache)}
@@ -0,0 +1,141 @@
+import argparse
+import asyncio
+import os
+import sys
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import case, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import models
+from app.database import AsyncSessionLocal
+
+# Conciliación de pagos al cierre: pedidos cuyos pagos no suman total_pedido.
+# Todo se calcula en la base con consultas agrupadas (pedidos LEFT JOIN pagos GROUP BY
+# pedido), sin cargar Pedido.pagos objeto por objeto:
+# - saldos: una fila por pedido con total, pagado y saldo; se recorre con un cursor
+#   (yield_per), así un mes de pedidos no se materializa entero.
+# - resumen: cantidad de pedidos, facturado, pagado, pendiente y excedido del rango.
+# - metodos: total cobrado por método de pago (por fecha del pago, como la caja).
+#
+#   python -m app.conciliacion [--desde AAAA-MM-DD] [--hasta AAAA-MM-DD] [--todos]
+#
+# Por defecto el rango es el día de hoy (UTC, como fecha_pedido / fecha_pago).
+
+TOLERANCIA = float(os.getenv("CONCILIACION_TOLERANCIA", "0.005"))  # diferencias de redondeo
+YIELD_PER = 1000
+
+pedidos = models.Pedido.__table__
+pagos = models.Pago.__table__
+metodos_pago = models.MetodoPago.__table__
+
+
+def rango(columna, desde: date = None, hasta: date = None):
+    # [desde 00:00, hasta + 1 día 00:00): usa el índice por fecha sin funciones sobre la columna
+    condiciones = []
+    if desde is not None:
+        condiciones.append(columna >= datetime.combine(desde, datetime.min.time()))
+    if hasta is not None:
+        condiciones.append(columna < datetime.combine(hasta + timedelta(days=1), datetime.min.time()))
+    return condiciones
+
+
+def _por_pedido(desde: date, hasta: date):
+    total = func.coalesce(pedidos.c.total_pedido, 0)
+    pagado = func.coalesce(func.sum(pagos.c.monto), 0)
+    return (
+        select(
+            pedidos.c.id, pedidos.c.fecha_pedido, pedidos.c.mesa_id, pedidos.c.cliente_id,
+            total.label("total"), pagado.label("pagado"), func.count(pagos.c.id).label("pagos"),
+            (total - pagado).label("saldo"),
+        )
+        .select_from(pedidos.outerjoin(pagos, pagos.c.pedido_id == pedidos.c.id))
+        .where(*rango(pedidos.c.fecha_pedido, desde, hasta))
+        .group_by(pedidos.c.id, pedidos.c.fecha_pedido, pedidos.c.mesa_id, pedidos.c.cliente_id, pedidos.c.total_pedido)
+    )
+
+
+async def saldos(db: AsyncSession, desde: date, hasta: date, todos: bool = False, yield_per: int = YIELD_PER):
+    # Generador: por defecto sólo los pedidos con saldo (pendiente o excedido)
+    stmt = _por_pedido(desde, hasta)
+    if not todos:
+        stmt = stmt.having(func.abs(func.coalesce(pedidos.c.total_pedido, 0) - func.coalesce(func.sum(pagos.c.monto), 0)) > TOLERANCIA)
+    stmt = stmt.order_by(pedidos.c.fecha_pedido, pedidos.c.id).execution_options(yield_per=yield_per)
+    async for row in (await db.stream(stmt)).mappings():
+        yield {**row, "saldo": round(row["saldo"], 2)}
+
+
+async def resumen(db: AsyncSession, desde: date, hasta: date):
+    por_pedido = _por_pedido(desde, hasta).subquery()
+    pendiente = por_pedido.c.saldo > TOLERANCIA
+    excedido = por_pedido.c.saldo < -TOLERANCIA
+    stmt = select(
+        func.count().label("pedidos"),
+        func.coalesce(func.sum(por_pedido.c.total), 0).label("facturado"),
+        func.coalesce(func.sum(por_pedido.c.pagado), 0).label("pagado"),
+        func.count(case((pendiente, 1))).label("pedidos_pendientes"),
+        func.coalesce(func.sum(case((pendiente, por_pedido.c.saldo))), 0).label("pendiente"),
+        func.count(case((excedido, 1))).label("pedidos_excedidos"),
+        func.coalesce(-func.sum(case((excedido, por_pedido.c.saldo))), 0).label("excedido"),
+    )
+    row = (await db.execute(stmt)).mappings().one()
+    return {k: round(v, 2) if isinstance(v, float) else v for k, v in row.items()}
+
+
+async def metodos(db: AsyncSession, desde: date, hasta: date):
+    stmt = (
+        select(
+            pagos.c.metodo_pago_id, metodos_pago.c.tipo_metodo,
+            func.count(pagos.c.id).label("pagos"), func.coalesce(func.sum(pagos.c.monto), 0).label("total"),
+        )
+        .select_from(pagos.outerjoin(metodos_pago, metodos_pago.c.id == pagos.c.metodo_pago_id))
+        .where(*rango(pagos.c.fecha_pago, desde, hasta))
+        .group_by(pagos.c.metodo_pago_id, metodos_pago.c.tipo_metodo)
+        .order_by(pagos.c.metodo_pago_id)
+    )
+    return [{**row, "total": round(row["total"], 2)} for row in (await db.execute(stmt)).mappings()]
+
+
+async def conciliar(db: AsyncSession, desde: date = None, hasta: date = None, todos: bool = False):
+    hasta = hasta or datetime.utcnow().date()
+    desde = desde or hasta
+    return {
+        "desde": desde,
+        "hasta": hasta,
+        "resumen": await resumen(db, desde, hasta),
+        "metodos": await metodos(db, desde, hasta),
+        "pedidos": [row async for row in saldos(db, desde, hasta, todos)],
+    }
+
+
+#==================================== C O N S O L A ========================================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Conciliación de pagos contra pedidos")
+    parser.add_argument("--desde", type=date.fromisoformat, help="AAAA-MM-DD (por defecto, hoy)")
+    parser.add_argument("--hasta", type=date.fromisoformat, help="AAAA-MM-DD (inclusive, por defecto, hoy)")
+    parser.add_argument("--todos", action="store_true", help="listar también los pedidos saldados")
+    args = parser.parse_args(argv)
+    hasta = args.hasta or datetime.utcnow().date()
+    desde = args.desde or hasta
+
+    async def run():
+        async with AsyncSessionLocal() as db:
+            r = await resumen(db, desde, hasta)
+            print(f"Conciliación {desde} a {hasta}: {r['pedidos']} pedidos, facturado {r['facturado']:.2f}, pagado {r['pagado']:.2f}")
+            print(f"  pendiente {r['pendiente']:.2f} en {r['pedidos_pendientes']} pedidos, "
+                  f"excedido {r['excedido']:.2f} en {r['pedidos_excedidos']} pedidos")
+            print("\nPor método de pago:")
+            for m in await metodos(db, desde, hasta):
+                print(f"  {m['tipo_metodo'] or 'sin método':20} {m['pagos']:8} pagos {m['total']:14.2f}")
+            print("\npedido\tfecha\tmesa\ttotal\tpagado\tsaldo")
+            # Se imprime a medida que llegan las filas del cursor
+            async for s in saldos(db, desde, hasta, args.todos):
+                print(f"{s['id']}\t{s['fecha_pedido']:%Y-%m-%d %H:%M}\t{s['mesa_id'] or '-'}\t"
+                      f"{s['total']:.2f}\t{s['pagado']:.2f}\t{s['saldo']:.2f}")
+
+    asyncio.run(run())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,64 @@
+import time
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+
+from fastapi import Request, Response
+
+from app.cache import CACHE_TTL, data_versions
+
+# GET condicionales (ETag / Last-Modified) para lecturas de catálogos: mesas y combos.
+# Los validadores salen de la versión de datos por tabla que mantienen crud / models
+# (touch en cada escritura confirmada), no del body: si el cliente ya tiene la versión
+# actual se contesta 304 antes de tocar la base o renderizar una plantilla.
+#
+# La versión es por proceso: un worker que no vio una escritura de otro sigue dando la suya.
+# Como en la caché de catálogos, eso se acota con CACHE_TTL: los validadores nunca son
+# anteriores al comienzo de la ventana de TTL actual, así que a lo sumo cada CACHE_TTL
+# segundos el cliente vuelve a bajar el recurso completo.
+
+def ultima_modificacion(tablas) -> datetime:
+    modificado = max(data_versions.modified(t) for t in tablas)
+    if CACHE_TTL > 0:
+        ventana = datetime.fromtimestamp(time.time() // CACHE_TTL * CACHE_TTL, timezone.utc)
+        modificado = max(modificado, ventana)
+    return modificado
+
+
+def validadores(*tablas) -> dict:
+    # Calcular ANTES de leer los datos: una escritura concurrente deja un ETag viejo (el
+    # próximo request baja todo) y nunca uno nuevo con datos viejos.
+    modificado = ultima_modificacion(tablas)
+    version = ".".join(str(data_versions.get(t)) for t in tablas)
+    headers = {
+        "ETag": f'W/"{int(modificado.timestamp() * 1_000_000):x}-{version}"',
+        "Cache-Control": "no-cache",  # se puede guardar, pero hay que revalidar siempre
+    }
+    # Last-Modified tiene resolución de segundos: sólo se manda cuando el segundo de la
+    # última escritura ya terminó, así cualquier escritura posterior cae en un segundo mayor
+    if time.time() - modificado.timestamp() >= 1:
+        headers["Last-Modified"] = format_datetime(modificado, usegmt=True)
+    return headers
+
+
+def _etags(header: str):
+    return {e.strip().removeprefix("W/") for e in header.split(",")}
+
+
+def no_modificado(request: Request, headers: dict) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        # Comparación débil; If-None-Match tiene prioridad sobre If-Modified-Since
+        etags = _etags(if_none_match)
+        return "*" in etags or headers["ETag"].removeprefix("W/") in etags
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is None or "Last-Modified" not in headers:
+        return False
+    try:
+        desde = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    return parsedate_to_datetime(headers["Last-Modified"]) <= desde
+
+
+def respuesta_304(headers: dict) -> Response:
+    return Response(status_code=304, headers=headers)
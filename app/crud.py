@@ -1,7 +1,9 @@
 from sqlalchemy.orm import Session
-from .models import Cliente, Mesa
-from .schemas import ClienteCreate, ClienteUpdate, MesaCreate, MesaUpdate, PedidoCreate, Pedido, PedidoUpdate
+from .models import Cliente, Mesa, Pedido
+from .schemas import ClienteCreate, ClienteUpdate, MesaCreate, MesaUpdate, PedidoCreate, PedidoUpdate
 from app import models, schemas
+from app.loaders import load_options
+from app.cache import mesas_cache, touch, read_through, snapshot
 from sqlalchemy.exc import IntegrityError
 
 #==================================== C L I E N T E S ========================================
@@ -11,13 +13,17 @@ def create_cliente(db: Session, cliente: schemas.ClienteCreate):
     db.add(db_cliente)
     db.commit()
     db.refresh(db_cliente)
+    touch("clientes")
     return db_cliente
 
-def get_cliente(db: Session, cliente_id: int):
-    return db.query(models.Cliente).filter(models.Cliente.id == cliente_id).first()
+def get_cliente(db: Session, cliente_id: int, load: str = None):
+    return db.query(models.Cliente).options(*load_options(load)).filter(models.Cliente.id == cliente_id).first()
 
-def get_all_clientes(db: Session, skip: int = 0, limit: int = 10):
-    return db.query(Cliente).offset(skip).limit(limit).all()
+def get_all_clientes(db: Session, skip: int = 0, limit: int = 10, load: str = None):
+    return db.query(Cliente).options(*load_options(load)).offset(skip).limit(limit).all()
+
+def get_clientes_page(db: Session, cursor: str = None, limit: int = 10, load: str = None):
+    return models.Cliente.read_page(db, cursor=cursor, limit=limit, options=load_options(load))
 
 def update_cliente(db: Session, cliente_id: int, cliente_data: schemas.ClienteUpdate):
     db_cliente = db.query(models.Cliente).filter(models.Cliente.id == cliente_id).first()
@@ -27,6 +33,7 @@ def update_cliente(db: Session, cliente_id: int, cliente_data: schemas.ClienteUp
         db_cliente.email = cliente_data.email
         db.commit()
         db.refresh(db_cliente)
+        touch("clientes")
         return db_cliente
     return None
 
@@ -37,6 +44,7 @@ def delete_cliente(db: Session, cliente_id: int):
     
     db.delete(cliente)
     db.commit()
+    touch("clientes")
     
     return {"status": "success", "message": "Cliente eliminado correctamente"}
 
@@ -47,13 +55,32 @@ def create_mesa(db: Session, mesa_data: schemas.MesaCreate):
     db.add(db_mesa)
     db.commit()
     db.refresh(db_mesa)
+    touch("mesas")
     return db_mesa
 
-def get_mesa(db: Session, mesa_id: int):
-    return db.query(Mesa).filter(Mesa.id == mesa_id).first()
-
-def get_all_mesas(db: Session, skip: int = 0, limit: int = 10):
-    return db.query(Mesa).offset(skip).limit(limit).all()
+# Las lecturas sin relaciones pasan por la caché y devuelven copias de sólo lectura
+# (fuera de la sesión); para modificar una mesa usar update_mesa.
+def get_mesa(db: Session, mesa_id: int, load: str = None):
+    query = db.query(Mesa).options(*load_options(load)).filter(Mesa.id == mesa_id)
+    if load_options(load):
+        return query.first()
+    return read_through(mesas_cache, ("mesa", mesa_id), lambda: snapshot(query.first()))
+
+def get_all_mesas(db: Session, skip: int = 0, limit: int = 10, load: str = None):
+    query = db.query(Mesa).options(*load_options(load)).offset(skip).limit(limit)
+    if load_options(load):
+        return query.all()
+    return read_through(mesas_cache, ("all", skip, limit), lambda: [snapshot(m) for m in query.all()])
+
+def get_mesas_page(db: Session, cursor: str = None, limit: int = 10, load: str = None):
+    if load_options(load):
+        return models.Mesa.read_page(db, cursor=cursor, limit=limit, options=load_options(load))
+
+    def loader():
+        page = models.Mesa.read_page(db, cursor=cursor, limit=limit)
+        page.items = [snapshot(m) for m in page.items]
+        return page
+    return read_through(mesas_cache, ("page", cursor, limit), loader)
 
 def update_mesa(db: Session, mesa_id: int, mesa_data: dict):
     mesa = db.query(models.Mesa).filter(models.Mesa.id == mesa_id).first()
@@ -63,6 +90,7 @@ def update_mesa(db: Session, mesa_id: int, mesa_data: dict):
         setattr(mesa, key, value)
     db.commit()
     db.refresh(mesa)
+    touch("mesas")
     return mesa
 
 def delete_mesa(db: Session, mesa_id: int):
@@ -70,6 +98,7 @@ def delete_mesa(db: Session, mesa_id: int):
     if db_mesa:
         db.delete(db_mesa)
         db.commit()
+        touch("mesas")
         
         
 #================================== P E D I D O S ========================================       
@@ -81,11 +110,14 @@ def create_pedido(db: Session, pedido_data: PedidoCreate):
     db.refresh(db_pedido)
     return db_pedido
 
-def get_pedido(db: Session, pedido_id: int):
-    return db.query(Pedido).filter(Pedido.id == pedido_id).first()
+def get_pedido(db: Session, pedido_id: int, load: str = None):
+    return db.query(Pedido).options(*load_options(load)).filter(Pedido.id == pedido_id).first()
+
+def get_all_pedidos(db: Session, skip: int = 0, limit: int = 10, load: str = None):
+    return db.query(Pedido).options(*load_options(load)).offset(skip).limit(limit).all()
 
-def get_all_pedidos(db: Session, skip: int = 0, limit: int = 10):
-    return db.query(Pedido).offset(skip).limit(limit).all()
+def get_pedidos_page(db: Session, cursor: str = None, limit: int = 10, load: str = None):
+    return models.Pedido.read_page(db, cursor=cursor, limit=limit, options=load_options(load))
 
 def update_pedido(db: Session, pedido_id: int, pedido_data: PedidoUpdate):
     db_pedido = db.query(Pedido).filter(Pedido.id == pedido_id).first()
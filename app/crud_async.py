@@ -0,0 +1,279 @@
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from app import models, schemas, rollups, busqueda
+from app.pagination import keyset_select, build_page
+from app.loaders import load_options
+from app.cache import mesas_cache, touch, read_through_async, snapshot
+from app.availability import availability
+from app.feed import pedido_feed, pedido_event_data
+
+# Versiones async de las funciones de crud.py, usadas por los endpoints.
+# crud.py (sesión sync) se mantiene para scripts y la consola.
+
+async def read_page(db: AsyncSession, model, cursor: str = None, limit: int = 10, load: str = None):
+    columns = model.keyset_columns()
+    stmt = select(model).options(*load_options(load))
+    stmt, direction = keyset_select(model, columns, cursor, limit, stmt=stmt)
+    result = await db.execute(stmt)
+    return build_page(result.scalars().all(), columns, cursor, direction, limit)
+
+class VersionConflict(Exception):
+    def __init__(self, current_version):
+        self.current_version = current_version
+
+class IntegrityConflict(Exception):
+    # El UPDATE viola una restricción (email / número de mesa repetido, FK inexistente)
+    pass
+
+class TotalCalculado(Exception):
+    # total_pedido de un pedido con líneas: lo calcula el server (app/lineas.py)
+    pass
+
+
+async def patch_row(db: AsyncSession, model, obj_id: int, values: dict,
+                    expected_version: int = None, returning: bool = True, before_commit=None):
+    # Un único UPDATE con sólo los campos enviados (y version + 1), sin leer la fila antes.
+    # Con expected_version se agrega "AND version = :v" (control optimista).
+    # Devuelve la fila como dict (con RETURNING si la base lo soporta), {"id", "version"}
+    # si returning=False, o None si no existe. Lanza VersionConflict si cambió la versión
+    # e IntegrityConflict (después del rollback) si viola una restricción.
+    # before_commit(row): corrutina opcional que escribe en la misma transacción.
+    try:
+        return await _patch_row(db, model, obj_id, values, expected_version, returning, before_commit)
+    except IntegrityError as e:
+        await db.rollback()
+        raise IntegrityConflict(str(e.orig)) from e
+
+async def _patch_row(db: AsyncSession, model, obj_id: int, values: dict,
+                     expected_version: int, returning: bool, before_commit):
+    table = model.__table__
+    stmt = update(table).where(table.c.id == obj_id).values(**values, version=table.c.version + 1)
+    if expected_version is not None:
+        stmt = stmt.where(table.c.version == expected_version)
+
+    row = None
+    if db.bind.dialect.update_returning:
+        cols = list(table.c) if returning else [table.c.id, table.c.version]
+        row = (await db.execute(stmt.returning(*cols))).mappings().first()
+        row = dict(row) if row is not None else None
+    else:
+        result = await db.execute(stmt)
+        if result.rowcount:
+            if not returning:
+                row = {"id": obj_id, "version": None}
+            else:
+                row = dict((await db.execute(select(table).where(table.c.id == obj_id))).mappings().first())
+
+    if row is not None:
+        if before_commit is not None:
+            await before_commit(row)
+        await db.commit()
+        return row
+
+    # Sin filas afectadas: no existe o la versión no coincide
+    if expected_version is not None:
+        current = (await db.execute(select(table.c.version).where(table.c.id == obj_id))).scalar()
+        if current is not None:
+            raise VersionConflict(current)
+    return None
+
+#==================================== C L I E N T E S ========================================
+
+async def create_cliente(db: AsyncSession, cliente: schemas.ClienteCreate):
+    db_cliente = models.Cliente(nombre=cliente.nombre, apellido=cliente.apellido, email=cliente.email)
+    db.add(db_cliente)
+    await db.commit()
+    await db.refresh(db_cliente)
+    touch("clientes")
+    return db_cliente
+
+async def get_cliente(db: AsyncSession, cliente_id: int, load: str = None):
+    return await db.get(models.Cliente, cliente_id, options=load_options(load))
+
+async def get_all_clientes(db: AsyncSession, skip: int = 0, limit: int = 10, load: str = None):
+    result = await db.execute(select(models.Cliente).options(*load_options(load)).offset(skip).limit(limit))
+    return result.scalars().all()
+
+async def get_clientes_page(db: AsyncSession, cursor: str = None, limit: int = 10, load: str = None):
+    return await read_page(db, models.Cliente, cursor, limit, load)
+
+async def update_cliente(db: AsyncSession, cliente_id: int, cliente_data: schemas.ClienteUpdate):
+    db_cliente = await db.get(models.Cliente, cliente_id)
+    if db_cliente:
+        db_cliente.nombre = cliente_data.nombre
+        db_cliente.apellido = cliente_data.apellido
+        db_cliente.email = cliente_data.email
+        await db.commit()
+        await db.refresh(db_cliente)
+        touch("clientes")
+        return db_cliente
+    return None
+
+async def patch_cliente(db: AsyncSession, cliente_id: int, cliente_data: schemas.ClientePatch,
+                        expected_version: int = None, returning: bool = True):
+    values = cliente_data.dict(exclude_unset=True)
+
+    async def reindexar(row):
+        # UPDATE por Core: el índice de búsqueda no lo ve por los eventos del ORM
+        if any(c in values for c in busqueda.CAMPOS):
+            await db.run_sync(lambda s: busqueda.reindexar_ids(s.connection(), [cliente_id]))
+
+    row = await patch_row(db, models.Cliente, cliente_id, values, expected_version, returning, reindexar)
+    if row is not None:
+        touch("clientes")
+    return row
+
+async def delete_cliente(db: AsyncSession, cliente_id: int):
+    cliente = await db.get(models.Cliente, cliente_id)
+    if not cliente:
+        return {"status": "error", "message": "Cliente no encontrado"}
+
+    await db.delete(cliente)
+    await db.commit()
+    touch("clientes")
+
+    return {"status": "success", "message": "Cliente eliminado correctamente"}
+
+#===================================== M E S A S ========================================
+
+async def create_mesa(db: AsyncSession, mesa_data: schemas.MesaCreate):
+    db_mesa = models.Mesa(**mesa_data.dict())
+    db.add(db_mesa)
+    await db.commit()
+    await db.refresh(db_mesa)
+    touch("mesas")
+    return db_mesa
+
+# Las lecturas sin relaciones pasan por la caché y devuelven copias de sólo lectura
+# (fuera de la sesión); para modificar una mesa usar update_mesa.
+async def get_mesa(db: AsyncSession, mesa_id: int, load: str = None):
+    if load_options(load):
+        return await db.get(models.Mesa, mesa_id, options=load_options(load))
+
+    async def loader():
+        return snapshot(await db.get(models.Mesa, mesa_id))
+    return await read_through_async(mesas_cache, ("mesa", mesa_id), loader)
+
+async def get_all_mesas(db: AsyncSession, skip: int = 0, limit: int = 10, load: str = None):
+    stmt = select(models.Mesa).options(*load_options(load)).offset(skip).limit(limit)
+    if load_options(load):
+        return (await db.execute(stmt)).scalars().all()
+
+    async def loader():
+        return [snapshot(m) for m in (await db.execute(stmt)).scalars().all()]
+    return await read_through_async(mesas_cache, ("all", skip, limit), loader)
+
+async def get_mesas_page(db: AsyncSession, cursor: str = None, limit: int = 10, load: str = None):
+    if load_options(load):
+        return await read_page(db, models.Mesa, cursor, limit, load)
+
+    async def loader():
+        page = await read_page(db, models.Mesa, cursor, limit)
+        page.items = [snapshot(m) for m in page.items]
+        return page
+    return await read_through_async(mesas_cache, ("page", cursor, limit), loader)
+
+async def update_mesa(db: AsyncSession, mesa_id: int, mesa_data: schemas.MesaUpdate):
+    mesa = await db.get(models.Mesa, mesa_id)
+    if not mesa:
+        return None
+    for key, value in mesa_data.dict().items():
+        setattr(mesa, key, value)
+    await db.commit()
+    await db.refresh(mesa)
+    touch("mesas")
+    return mesa
+
+async def patch_mesa(db: AsyncSession, mesa_id: int, mesa_data: schemas.MesaPatch,
+                     expected_version: int = None, returning: bool = True):
+    row = await patch_row(db, models.Mesa, mesa_id, mesa_data.dict(exclude_unset=True),
+                          expected_version, returning)
+    if row is not None:
+        touch("mesas")
+        availability.invalidate_mesas()
+    return row
+
+async def delete_mesa(db: AsyncSession, mesa_id: int):
+    db_mesa = await db.get(models.Mesa, mesa_id)
+    if db_mesa:
+        await db.delete(db_mesa)
+        await db.commit()
+        touch("mesas")
+
+#================================== P E D I D O S ========================================
+
+async def create_pedido(db: AsyncSession, pedido_data: schemas.PedidoCreate):
+    db_pedido = models.Pedido(**pedido_data.dict())
+    db.add(db_pedido)
+    await db.commit()
+    await db.refresh(db_pedido)
+    return db_pedido
+
+async def get_pedido(db: AsyncSession, pedido_id: int, load: str = None):
+    return await db.get(models.Pedido, pedido_id, options=load_options(load))
+
+async def get_all_pedidos(db: AsyncSession, skip: int = 0, limit: int = 10, load: str = None):
+    result = await db.execute(select(models.Pedido).options(*load_options(load)).offset(skip).limit(limit))
+    return result.scalars().all()
+
+async def get_pedidos_page(db: AsyncSession, cursor: str = None, limit: int = 10, load: str = None):
+    return await read_page(db, models.Pedido, cursor, limit, load)
+
+async def get_ultimos_pedidos(db: AsyncSession, limit: int = 50, load: str = None):
+    stmt = (
+        select(models.Pedido)
+        .options(*load_options(load))
+        .order_by(models.Pedido.fecha_pedido.desc(), models.Pedido.id.desc())
+        .limit(limit)
+    )
+    result = await db.execute(stmt)
+    return result.scalars().all()
+
+async def update_pedido(db: AsyncSession, pedido_id: int, pedido_data: schemas.PedidoUpdate):
+    db_pedido = await db.get(models.Pedido, pedido_id)
+    if db_pedido:
+        for key, value in pedido_data.dict().items():
+            setattr(db_pedido, key, value)
+        await db.commit()
+        await db.refresh(db_pedido)
+        return db_pedido
+    return None
+
+async def patch_pedido(db: AsyncSession, pedido_id: int, pedido_data: schemas.PedidoPatch,
+                       expected_version: int = None, returning: bool = True):
+    values = pedido_data.dict(exclude_unset=True)
+    if "total_pedido" in values:
+        lineas = models.PedidoLinea.__table__
+        if (await db.execute(select(lineas.c.id).where(lineas.c.pedido_id == pedido_id).limit(1))).first() is not None:
+            raise TotalCalculado()
+    campos = [c for c in rollups.CAMPOS_PEDIDO if c in values]
+    actualizar_resumen = None
+    if campos:
+        # Cambia una clave o un total del resumen de ventas: se lee (y bloquea) la fila
+        # anterior para calcular el delta dentro de la misma transacción.
+        table = models.Pedido.__table__
+        antes = (await db.execute(
+            select(*(table.c[c] for c in rollups.CAMPOS_PEDIDO)).where(table.c.id == pedido_id).with_for_update()
+        )).mappings().first()
+
+        async def actualizar_resumen(row):
+            despues = {**antes, **{c: values[c] for c in campos}}
+            await db.run_sync(lambda s: rollups.apply_pedido_actualizado(s.connection(), pedido_id, dict(antes), despues))
+
+    row = await patch_row(db, models.Pedido, pedido_id, values, expected_version, returning, actualizar_resumen)
+    if row is not None:
+        # Update por Core: el feed de cocina no lo ve por los eventos del ORM.
+        # Sin RETURNING sólo se conocen los campos enviados; la pantalla los combina.
+        changed = {**values, **{k: v for k, v in row.items() if v is not None}}
+        data = pedido_event_data(changed)
+        pedido_feed.publish("actualizado", {k: v for k, v in data.items() if k in changed})
+    return row
+
+async def delete_pedido(db: AsyncSession, pedido_id: int):
+    db_pedido = await db.get(models.Pedido, pedido_id)
+    if db_pedido:
+        await db.delete(db_pedido)
+        await db.commit()
+        return {"message": "Pedido eliminado"}
+    return {"message": "Pedido no encontrado"}
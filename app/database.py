@@ -1,4 +1,10 @@
-from sqlalchemy import create_engine
+import os
+import time
+import threading
+from sqlalchemy import create_engine, exc
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.orm import sessionmaker, declarative_base
 from contextlib import contextmanager
 
@@ -9,12 +15,115 @@ MYSQL_HOST = "127.0.0.1"  # o la IP de tu servidor MySQL
 MYSQL_PORT = "3306" 
 MYSQL_DATABASE = "bodegon3"
 
-SQLALCHEMY_DATABASE_URL = f"mysql+mysqlconnector://{MYSQL_USER}:{MYSQL_PASSWORD}@{MYSQL_HOST}:{MYSQL_PORT}/{MYSQL_DATABASE}"
+# DATABASE_URL permite apuntar a otra base (ej: sqlite:///./bodegon.db para pruebas locales)
+SQLALCHEMY_DATABASE_URL = os.getenv(
+    "DATABASE_URL",
+    f"mysql+mysqlconnector://{MYSQL_USER}:{MYSQL_PASSWORD}@{MYSQL_HOST}:{MYSQL_PORT}/{MYSQL_DATABASE}",
+)
 
-# Crear una instancia de motor para la base de datos
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
+# Driver async equivalente a cada driver sync (requiere aiomysql / aiosqlite instalados)
+ASYNC_DRIVERS = {
+    "mysql": "mysql+aiomysql",
+    "mysql+mysqlconnector": "mysql+aiomysql",
+    "mysql+pymysql": "mysql+aiomysql",
+    "sqlite": "sqlite+aiosqlite",
+    "sqlite+pysqlite": "sqlite+aiosqlite",
+}
+
+def get_async_url(url: str) -> str:
+    sync_url = make_url(url)
+    drivername = ASYNC_DRIVERS.get(sync_url.drivername, sync_url.drivername)
+    return sync_url.set(drivername=drivername).render_as_string(hide_password=False)
+
+ASYNC_SQLALCHEMY_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL", get_async_url(SQLALCHEMY_DATABASE_URL))
+
+# Configuración del pool de conexiones (variables de entorno, con valores por defecto razonables)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))  # segundos esperando una conexión libre
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))  # menor que el wait_timeout de MySQL
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "1").lower() in ("1", "true", "yes")
+
+
+class PoolStats:
+    # Acumula el tiempo de espera para obtener una conexión del pool
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.listeners = []  # funciones(segundos) avisadas en cada checkout (ej: métricas por request)
+
+    def record_wait(self, seconds: float, timed_out: bool = False):
+        with self._lock:
+            self.checkouts += 1
+            self.wait_total += seconds
+            self.wait_max = max(self.wait_max, seconds)
+            if timed_out:
+                self.timeouts += 1
+        for listener in self.listeners:
+            listener(seconds)
+
+    def as_dict(self):
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "wait_total_ms": round(self.wait_total * 1000, 3),
+                "wait_avg_ms": round(self.wait_total * 1000 / self.checkouts, 3) if self.checkouts else 0.0,
+                "wait_max_ms": round(self.wait_max * 1000, 3),
+            }
+
+
+class TimedPoolMixin:
+    # Mide cuánto tarda cada checkout (incluye esperar a que se libere una conexión)
+    stats: PoolStats
+
+    def _do_get(self):
+        inicio = time.perf_counter()
+        try:
+            conn = super()._do_get()
+        except exc.TimeoutError:
+            self.stats.record_wait(time.perf_counter() - inicio, timed_out=True)
+            raise
+        self.stats.record_wait(time.perf_counter() - inicio)
+        return conn
+
+
+class TimedQueuePool(TimedPoolMixin, QueuePool):
+    stats = PoolStats()
+
+
+class TimedAsyncQueuePool(TimedPoolMixin, AsyncAdaptedQueuePool):
+    stats = PoolStats()
+
+
+def get_engine_options(url: str, pool_class) -> dict:
+    options = {"pool_pre_ping": DB_POOL_PRE_PING}
+    # SQLite (pruebas locales) usa su propio pool; las opciones de tamaño no aplican
+    if make_url(url).get_backend_name() != "sqlite":
+        options.update(
+            poolclass=pool_class,
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+            pool_recycle=DB_POOL_RECYCLE,
+        )
+    return options
+
+# Crear una instancia de motor para la base de datos (camino sync, para scripts)
+engine = create_engine(SQLALCHEMY_DATABASE_URL, **get_engine_options(SQLALCHEMY_DATABASE_URL, TimedQueuePool))
 # Crear una clase de sesión para interactuar con la base de datos
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+# Motor y sesión async usados por los endpoints para no bloquear el event loop.
+# expire_on_commit=False evita recargas perezosas (imposibles en async) al leer el objeto tras el commit.
+async_engine = create_async_engine(
+    ASYNC_SQLALCHEMY_DATABASE_URL, **get_engine_options(ASYNC_SQLALCHEMY_DATABASE_URL, TimedAsyncQueuePool)
+)
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
 # Base para la creación de modelos de datos
 Base = declarative_base()
 
@@ -22,6 +131,88 @@ Base = declarative_base()
 #Base.metadata.create_all(bind=engine)
 
 
+def describe_pool(pool) -> dict:
+    data = {"pool": type(pool).__name__, "status": pool.status()}
+    if isinstance(pool, QueuePool):
+        data.update(
+            size=pool.size(),
+            checked_in=pool.checkedin(),
+            checked_out=pool.checkedout(),
+            overflow=pool.overflow(),
+        )
+    if isinstance(pool, TimedPoolMixin):
+        data["wait"] = pool.stats.as_dict()
+    return data
+
+
+def get_pool_stats() -> dict:
+    return {
+        "config": {
+            "pool_size": DB_POOL_SIZE,
+            "max_overflow": DB_MAX_OVERFLOW,
+            "pool_timeout": DB_POOL_TIMEOUT,
+            "pool_recycle": DB_POOL_RECYCLE,
+            "pool_pre_ping": DB_POOL_PRE_PING,
+        },
+        "sync": describe_pool(engine.pool),
+        "async": describe_pool(async_engine.sync_engine.pool),
+    }
+
+
+#========================= U N I D A D   D E   T R A B A J O ========================================
+# Agrupa varias altas / cambios / bajas en una sola transacción:
+#
+#     with unit_of_work(db):
+#         mesa.update(db, disponible=False)
+#         pedido = Pedido.create(db, mesa=mesa, combo_id=3)
+#         Pago.create(db, pedido=pedido, monto=1500, metodo_pago_id=1)
+#
+# Los métodos CRUD de los modelos no hacen flush/commit dentro del bloque; al salir se
+# hace un único flush + commit. Las claves generadas llegan con el INSERT y el commit
+# no expira los objetos, así que no hace falta un refresh (SELECT) posterior.
+# Los bloques anidados se suman a la transacción del bloque exterior.
+
+_UOW_DEPTH = "uow_depth"
+_UOW_CALLBACKS = "uow_callbacks"
+
+
+@contextmanager
+def unit_of_work(session):
+    depth = session.info.get(_UOW_DEPTH, 0)
+    session.info[_UOW_DEPTH] = depth + 1
+    try:
+        yield session
+        if depth == 0:
+            expire_on_commit = session.expire_on_commit
+            session.expire_on_commit = False
+            try:
+                session.commit()
+            finally:
+                session.expire_on_commit = expire_on_commit
+            for callback in session.info.pop(_UOW_CALLBACKS, []):
+                callback()
+    except BaseException:
+        if depth == 0:
+            session.rollback()
+            session.info.pop(_UOW_CALLBACKS, None)
+        raise
+    finally:
+        session.info[_UOW_DEPTH] = depth
+
+
+def on_commit(session, callback):
+    # Ejecuta `callback` cuando la unidad de trabajo en curso se confirma
+    callbacks = session.info.setdefault(_UOW_CALLBACKS, [])
+    if callback not in callbacks:
+        callbacks.append(callback)
+
+
+# Dependencia async para obtener la sesión de base de datos
+async def get_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
 # Test de conexión
 if __name__ == "__main__":
     try:
@@ -30,4 +221,4 @@ if __name__ == "__main__":
         print("Conexión exitosa a la base de datos!")
         db.close()
     except Exception as e:
-        print(f"Error al conectar a la base de datos: {e}")
\ No newline at end of file
+        print(f"Error al conectar a la base de datos: {e}")
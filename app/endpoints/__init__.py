@@ -1 +1,2 @@
 from .endpoints import router
+from .api import api_router
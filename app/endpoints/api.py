@@ -0,0 +1,168 @@
+from typing import Generic, List, Optional, TypeVar
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import get_db
+from app.loaders import load_options
+from app import crud_async, models, schemas, serializers, conditional
+
+# API JSON versionada para las tablets del salón y el display de cocina (las vistas HTML
+# siguen en endpoints.py). Los schemas de app/schemas.py son el contrato de cada respuesta
+# (y lo que muestra /docs); la serialización va por app/serializers.py, sin validar cada
+# objeto con Pydantic, y el JSON lo arma orjson.
+#   ?fields=id,nombre,reservas.fecha   sólo esos campos (los anidados con punto)
+#   ?depth=1                           expande relaciones hasta ese nivel (0 = sólo columnas)
+# Mesas (depth=0) y combos aceptan GET condicionales: 304 sin ir a la base (app/conditional.py).
+
+api_router = APIRouter(prefix="/api/v1", tags=["API v1"])
+
+T = TypeVar("T")
+
+
+class Pagina(BaseModel, Generic[T]):
+    items: List[T]
+    next_cursor: Optional[str] = None
+    prev_cursor: Optional[str] = None
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content) -> bytes:
+        return serializers.dumps(content)
+
+
+def fieldset(schema):
+    # Dependencia: valida ?fields= contra el schema y ?depth= contra DEPTH_MAX
+    def dependencia(
+        fields: Optional[str] = Query(None, description="campos separados por coma; anidados con punto"),
+        depth: int = Query(0, ge=0, le=serializers.DEPTH_MAX),
+    ):
+        try:
+            return serializers.parse_fields(fields, schema, depth), depth
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    return dependencia
+
+
+def politica(entidad: str, depth: int):
+    # Con depth > 0 se cargan las relaciones del detalle en la misma consulta
+    return f"{entidad}.detalle" if depth > 0 else None
+
+
+def validadores(tabla: str, depth: int):
+    # Sólo las respuestas que dependen únicamente de `tabla` (sin relaciones expandidas)
+    return conditional.validadores(tabla) if depth == 0 else None
+
+
+def respuesta_pagina(page, schema, fields, depth, headers=None):
+    return FastJSONResponse({
+        "items": serializers.serializar_lista(page.items, schema, depth, fields),
+        "next_cursor": page.next_cursor,
+        "prev_cursor": page.prev_cursor,
+    }, headers=headers)
+
+
+def respuesta(obj, schema, fields, depth, detail: str, headers=None):
+    if obj is None:
+        raise HTTPException(status_code=404, detail=detail)
+    return FastJSONResponse(serializers.serializar(obj, schema, depth, fields), headers=headers)
+
+#=============================== CLIENTES ================================================
+
+@api_router.get("/clientes", response_model=Pagina[schemas.Cliente])
+async def api_clientes(
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=500),
+    fs=Depends(fieldset(schemas.Cliente)),
+    db: AsyncSession = Depends(get_db)
+):
+    fields, depth = fs
+    try:
+        page = await crud_async.get_clientes_page(db, cursor=cursor, limit=limit, load=politica("clientes", depth))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+    return respuesta_pagina(page, schemas.Cliente, fields, depth)
+
+@api_router.get("/clientes/{cliente_id}", response_model=schemas.Cliente)
+async def api_cliente(cliente_id: int, fs=Depends(fieldset(schemas.Cliente)), db: AsyncSession = Depends(get_db)):
+    fields, depth = fs
+    cliente = await crud_async.get_cliente(db, cliente_id, load=politica("clientes", depth))
+    return respuesta(cliente, schemas.Cliente, fields, depth, "Cliente no encontrado")
+
+#=============================== MESAS ================================================
+
+# Sin relaciones, mesas sale de la caché (copias fuera de la sesión)
+@api_router.get("/mesas", response_model=Pagina[schemas.Mesa])
+async def api_mesas(
+    request: Request,
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=500),
+    fs=Depends(fieldset(schemas.Mesa)),
+    db: AsyncSession = Depends(get_db)
+):
+    fields, depth = fs
+    headers = validadores("mesas", depth)
+    if headers and conditional.no_modificado(request, headers):
+        return conditional.respuesta_304(headers)
+    try:
+        page = await crud_async.get_mesas_page(db, cursor=cursor, limit=limit, load=politica("mesas", depth))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+    return respuesta_pagina(page, schemas.Mesa, fields, depth, headers)
+
+@api_router.get("/mesas/{mesa_id}", response_model=schemas.Mesa)
+async def api_mesa(request: Request, mesa_id: int, fs=Depends(fieldset(schemas.Mesa)), db: AsyncSession = Depends(get_db)):
+    fields, depth = fs
+    headers = validadores("mesas", depth)
+    if headers and conditional.no_modificado(request, headers):
+        return conditional.respuesta_304(headers)
+    mesa = await crud_async.get_mesa(db, mesa_id, load=politica("mesas", depth))
+    return respuesta(mesa, schemas.Mesa, fields, depth, "Mesa no encontrada", headers)
+
+#=============================== RESERVAS ================================================
+
+@api_router.get("/reservas/{reserva_id}", response_model=schemas.Reserva)
+async def api_reserva(reserva_id: int, fs=Depends(fieldset(schemas.Reserva)), db: AsyncSession = Depends(get_db)):
+    fields, depth = fs
+    reserva = await db.get(models.Reserva, reserva_id, options=load_options(politica("reservas", depth)))
+    return respuesta(reserva, schemas.Reserva, fields, depth, "Reserva no encontrada")
+
+#=============================== COMBOS ================================================
+
+# El menú sale de la caché de combos (models.Combo.read_all, sesión sync)
+@api_router.get("/combos", response_model=List[schemas.Combo])
+async def api_combos(
+    request: Request,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=500),
+    fs=Depends(fieldset(schemas.Combo)),
+    db: AsyncSession = Depends(get_db)
+):
+    fields, depth = fs
+    headers = conditional.validadores("combos")
+    if conditional.no_modificado(request, headers):
+        return conditional.respuesta_304(headers)
+    combos = await db.run_sync(lambda s: models.Combo.read_all(s, skip=skip, limit=limit))
+    return FastJSONResponse(serializers.serializar_lista(combos, schemas.Combo, depth, fields), headers=headers)
+
+#=============================== PEDIDOS ================================================
+
+@api_router.get("/pedidos", response_model=Pagina[schemas.Pedido])
+async def api_pedidos(
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=500),
+    fs=Depends(fieldset(schemas.Pedido)),
+    db: AsyncSession = Depends(get_db)
+):
+    fields, depth = fs
+    try:
+        page = await crud_async.get_pedidos_page(db, cursor=cursor, limit=limit, load=politica("pedidos", depth))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+    return respuesta_pagina(page, schemas.Pedido, fields, depth)
+
+@api_router.get("/pedidos/{pedido_id}", response_model=schemas.Pedido)
+async def api_pedido(pedido_id: int, fs=Depends(fieldset(schemas.Pedido)), db: AsyncSession = Depends(get_db)):
+    fields, depth = fs
+    pedido = await crud_async.get_pedido(db, pedido_id, load=politica("pedidos", depth))
+    return respuesta(pedido, schemas.Pedido, fields, depth, "Pedido no encontrado")
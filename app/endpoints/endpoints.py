@@ -1,8 +1,20 @@
-from fastapi import APIRouter, Request, Form, Depends, HTTPException
-from fastapi.responses import HTMLResponse
-from sqlalchemy.orm import Session
-from app.database import SessionLocal
-from app import crud, schemas
+from typing import List, Optional
+from functools import partial
+from datetime import date, datetime
+from fastapi import APIRouter, Request, Form, Depends, HTTPException, Query, UploadFile, File, Header
+from fastapi.responses import HTMLResponse, StreamingResponse, JSONResponse, Response
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import get_db, get_pool_stats
+from app import crud_async, models, schemas, bulk, rollups, inventario, reservas, lineas, conciliacion, exportar, busqueda, metrics, conditional, assets
+from app.availability import availability, find_free_table, parse_hora
+from app.ingest import pedido_ingestor, IngestQueueFull, IngestStopped, MesaInexistente, ERRORES_PERMANENTES
+from app.feed import pedido_feed, stream_events, lineas_event_data
+from app.rendering import stream_template_response
+from app.pagination import Page
+from app.cache import get_cache_stats
 
 from fastapi.templating import Jinja2Templates
 
@@ -11,58 +23,105 @@ router = APIRouter()
 
 # Crear un objeto Jinja2Templates
 templates = Jinja2Templates(directory="app/templates")
+metrics.instrument_templates(templates)
+assets.registrar(templates)
 
-# Dependencia para obtener la sesión de base de datos
-def get_db():
-    db = SessionLocal()
+
+# PATCH: la versión esperada llega en If-Match ("3" o W/"3") y la nueva se devuelve en ETag
+def parse_if_match(if_match: Optional[str]) -> Optional[int]:
+    if if_match is None:
+        return None
     try:
-        yield db
-    finally:
-        db.close()
+        return int(if_match.strip().removeprefix("W/").strip('"'))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="If-Match inválido")
 
-#=============================== CLIENTES ================================================
 
-@router.get("/crear_cliente", response_class=HTMLResponse)
-async def show_create_cliente_form(request: Request):
-    return templates.TemplateResponse("crear_cliente.html", {"request": request})
+async def run_patch(patch, obj_id: int, data, if_match: Optional[str], prefer: Optional[str], detail: str):
+    if not data.dict(exclude_unset=True):
+        raise HTTPException(status_code=400, detail="No se enviaron campos para actualizar")
+    # Prefer: return=minimal -> 204 sin volver a leer la fila
+    minimal = prefer is not None and "return=minimal" in prefer
+    try:
+        row = await patch(obj_id, data, expected_version=parse_if_match(if_match), returning=not minimal)
+    except crud_async.VersionConflict as e:
+        raise HTTPException(status_code=409, detail="El registro fue modificado por otro usuario",
+                            headers={"ETag": f'"{e.current_version}"'})
+    except crud_async.IntegrityConflict:
+        raise HTTPException(status_code=409, detail="Los datos chocan con otro registro (valor repetido o referencia inexistente)")
+    except crud_async.TotalCalculado:
+        raise HTTPException(status_code=409, detail="El total de un pedido con líneas se calcula de sus líneas")
+    if row is None:
+        raise HTTPException(status_code=404, detail=detail)
+    headers = {"ETag": f'"{row["version"]}"'} if row.get("version") is not None else {}
+    if minimal:
+        return Response(status_code=204, headers=headers)
+    return JSONResponse(jsonable_encoder(row), headers=headers)
 
-<<<<<<< HEAD
-=======
+#=============================== CLIENTES ================================================
 
-# Endpoint GET para mostrar el formulario
 @router.get("/crear_cliente", response_class=HTMLResponse)
 async def show_create_cliente_form(request: Request):
     return templates.TemplateResponse("crear_cliente.html", {"request": request})
 
->>>>>>> 064548502e1714fe104b9fcdf5c5b034cea2e549
 @router.post("/crear_cliente", response_class=HTMLResponse)
 async def create_cliente(
     request: Request,
     nombre: str = Form(...),
     apellido: str = Form(...),
     email: str = Form(...),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     cliente_data = schemas.ClienteCreate(nombre=nombre, apellido=apellido, email=email)
-    cliente = crud.create_cliente(db, cliente_data)
+    cliente = await crud_async.create_cliente(db, cliente_data)
     return templates.TemplateResponse("crear_cliente.html", {
         "request": request, 
         "message": f"Cliente {nombre} {apellido} creado exitosamente"
     })
-<<<<<<< HEAD
     
+# Listado paginado por cursor; si se manda `skip` se usa el modo offset anterior.
+# Con stream=true se envía el listado completo a medida que se lee de la base.
 @router.get("/read_clientes", response_class=HTMLResponse)
-async def read_clientes(request: Request, db: Session = Depends(get_db)):
-    clientes = crud.get_all_clientes(db)
-    return templates.TemplateResponse("read_clientes.html", {"request": request, "clientes": clientes})
-=======
+async def read_clientes(
+    request: Request,
+    cursor: Optional[str] = None,
+    skip: Optional[int] = Query(None, ge=0),
+    limit: int = Query(10, ge=1, le=100),
+    stream: bool = False,
+    db: AsyncSession = Depends(get_db)
+):
+    if stream:
+        stmt = select(models.Cliente).order_by(models.Cliente.id)
+        return stream_template_response("read_clientes.html", "clientes", "cliente", stmt)
+    if skip is not None:
+        page = Page(items=await crud_async.get_all_clientes(db, skip=skip, limit=limit, load="clientes.lista"))
+    else:
+        try:
+            page = await crud_async.get_clientes_page(db, cursor=cursor, limit=limit, load="clientes.lista")
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Cursor inválido")
+    return templates.TemplateResponse("read_clientes.html", {
+        "request": request,
+        "clientes": page.items,
+        "next_cursor": page.next_cursor,
+        "prev_cursor": page.prev_cursor,
+        "limit": limit,
+    })
 
->>>>>>> 064548502e1714fe104b9fcdf5c5b034cea2e549
+# Typeahead: top-k por prefijo (nombre, apellido, email o teléfono, sin importar acentos).
+# Registrado antes de /clientes/{cliente_id}.
+@router.get("/clientes/search", tags=["Clientes"])
+async def search_clientes(
+    q: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(10, ge=1, le=busqueda.BUSQUEDA_LIMIT_MAX),
+    db: AsyncSession = Depends(get_db)
+):
+    return await busqueda.buscar_clientes(db, q, limit)
 
 # Obtener un cliente por ID (GET)
 @router.get("/clientes/{cliente_id}", response_class=HTMLResponse)
-async def get_cliente_by_id(request: Request, cliente_id: int, db: Session = Depends(get_db)):
-    cliente = crud.get_cliente(db, cliente_id)
+async def get_cliente_by_id(request: Request, cliente_id: int, db: AsyncSession = Depends(get_db)):
+    cliente = await crud_async.get_cliente(db, cliente_id, load="clientes.detalle")
     if cliente is None:
         raise HTTPException(status_code=404, detail="Cliente no encontrado")
     # Asumiendo que `cliente` es un objeto HTML que se puede renderizar
@@ -76,18 +135,29 @@ async def update_cliente(
     nombre: str = Form(...),
     apellido: str = Form(...),
     email: str = Form(...),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     cliente_data = schemas.ClienteUpdate(nombre=nombre, apellido=apellido, email=email)
-    cliente = crud.update_cliente(db, cliente_id, cliente_data)
+    cliente = await crud_async.update_cliente(db, cliente_id, cliente_data)
     if cliente is None:
         raise HTTPException(status_code=404, detail="Cliente no encontrado")
     return templates.TemplateResponse("clientes.html", {"request": request, "message": f"Cliente {nombre} {apellido} actualizado correctamente"})
 
+# Actualización parcial de un cliente (PATCH, JSON)
+@router.patch("/clientes/{cliente_id}", tags=["Clientes"])
+async def patch_cliente(
+    cliente_id: int,
+    cliente_data: schemas.ClientePatch,
+    if_match: Optional[str] = Header(None),
+    prefer: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_db)
+):
+    return await run_patch(partial(crud_async.patch_cliente, db), cliente_id, cliente_data, if_match, prefer, "Cliente no encontrado")
+
 # Eliminar un cliente (POST)
 @router.post("/clientes/{cliente_id}/eliminar", response_class=HTMLResponse)
-async def delete_cliente(cliente_id: int, db: Session = Depends(get_db)):
-    result = crud.delete_cliente(db, cliente_id)
+async def delete_cliente(cliente_id: int, db: AsyncSession = Depends(get_db)):
+    result = await crud_async.delete_cliente(db, cliente_id)
 
     if result.get("status") == "success":
         return HTMLResponse(content="Cliente eliminado", status_code=200)
@@ -96,47 +166,321 @@ async def delete_cliente(cliente_id: int, db: Session = Depends(get_db)):
 
 #======================================= MESAS ========================================
 @router.post("/mesas/", response_class=HTMLResponse, tags=["Mesas"])
-def create_mesa(request: Request, mesa_data: schemas.MesaCreate, db: Session = Depends(get_db)):
-    mesa = crud.create_mesa(db, mesa_data)
+async def create_mesa(request: Request, mesa_data: schemas.MesaCreate, db: AsyncSession = Depends(get_db)):
+    mesa = await crud_async.create_mesa(db, mesa_data)
     return templates.TemplateResponse("mesa.html", {"request": request, "mesa": mesa})
 
+# Mesa libre más chica para N personas en fecha/hora (va antes de /mesas/{mesa_id})
+@router.get("/mesas/disponible", tags=["Mesas"])
+async def find_mesa_disponible(
+    personas: int = Query(..., ge=1),
+    fecha: date = Query(...),
+    hora: str = Query(..., description="HH:MM"),
+    ubicacion: Optional[str] = None,
+    db: AsyncSession = Depends(get_db)
+):
+    hora_parsed = parse_hora(hora)
+    if hora_parsed is None:
+        raise HTTPException(status_code=400, detail="Hora inválida")
+    mesa = await find_free_table(db, personas, datetime.combine(fecha, hora_parsed), ubicacion)
+    if mesa is None:
+        raise HTTPException(status_code=404, detail="No hay mesas disponibles")
+    return mesa
+
 @router.get("/mesas/{mesa_id}", response_class=HTMLResponse, tags=["Mesas"])
-def read_mesa(request: Request, mesa_id: int, db: Session = Depends(get_db)):
-    mesa = crud.get_mesa(db, mesa_id)
+async def read_mesa(request: Request, mesa_id: int, db: AsyncSession = Depends(get_db)):
+    mesa = await crud_async.get_mesa(db, mesa_id, load="mesas.detalle")
     if mesa is None:
         raise HTTPException(status_code=404, detail="Mesa no encontrada")
     return templates.TemplateResponse("mesa.html", {"request": request, "mesa": mesa})
 
+# Con If-None-Match / If-Modified-Since vigentes se contesta 304 sin ir a la base (ver app/conditional.py)
 @router.get("/mesas/", response_class=HTMLResponse, tags=["Mesas"])
-def read_all_mesas(request: Request, skip: int = 0, limit: int = 10, db: Session = Depends(get_db)):
-    mesas = crud.get_all_mesas(db, skip=skip, limit=limit)
-    return templates.TemplateResponse("mesas.html", {"request": request, "mesas": mesas})
+async def read_all_mesas(
+    request: Request,
+    cursor: Optional[str] = None,
+    skip: Optional[int] = Query(None, ge=0),
+    limit: int = Query(10, ge=1, le=100),
+    stream: bool = False,
+    db: AsyncSession = Depends(get_db)
+):
+    validadores = conditional.validadores("mesas")
+    if conditional.no_modificado(request, validadores):
+        return conditional.respuesta_304(validadores)
+    if stream:
+        stmt = select(models.Mesa).order_by(models.Mesa.numero_mesa)
+        response = stream_template_response("mesas.html", "mesas", "mesa", stmt)
+        response.headers.update(validadores)
+        return response
+    if skip is not None:
+        page = Page(items=await crud_async.get_all_mesas(db, skip=skip, limit=limit, load="mesas.lista"))
+    else:
+        try:
+            page = await crud_async.get_mesas_page(db, cursor=cursor, limit=limit, load="mesas.lista")
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Cursor inválido")
+    return templates.TemplateResponse("mesas.html", {
+        "request": request,
+        "mesas": page.items,
+        "next_cursor": page.next_cursor,
+        "prev_cursor": page.prev_cursor,
+        "limit": limit,
+    }, headers=validadores)
 
 @router.put("/mesas/{mesa_id}", response_class=HTMLResponse, tags=["Mesas"])
-def update_mesa(request: Request, mesa_id: int, mesa_data: schemas.MesaUpdate, db: Session = Depends(get_db)):
-    mesa = crud.update_mesa(db, mesa_id, mesa_data)
+async def update_mesa(request: Request, mesa_id: int, mesa_data: schemas.MesaUpdate, db: AsyncSession = Depends(get_db)):
+    mesa = await crud_async.update_mesa(db, mesa_id, mesa_data)
     if mesa is None:
         raise HTTPException(status_code=404, detail="Mesa no encontrada")
     return templates.TemplateResponse("mesa.html", {"request": request, "mesa": mesa})
 
+@router.patch("/mesas/{mesa_id}", tags=["Mesas"])
+async def patch_mesa(
+    mesa_id: int,
+    mesa_data: schemas.MesaPatch,
+    if_match: Optional[str] = Header(None),
+    prefer: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_db)
+):
+    return await run_patch(partial(crud_async.patch_mesa, db), mesa_id, mesa_data, if_match, prefer, "Mesa no encontrada")
+
 @router.delete("/mesas/{mesa_id}", response_class=HTMLResponse, tags=["Mesas"])
-def delete_mesa(request: Request, mesa_id: int, db: Session = Depends(get_db)):
-    crud.delete_mesa(db, mesa_id)
+async def delete_mesa(request: Request, mesa_id: int, db: AsyncSession = Depends(get_db)):
+    await crud_async.delete_mesa(db, mesa_id)
     return templates.TemplateResponse("mesas.html", {"request": request, "message": "Mesa eliminada"})
 
 
 
 
 
+#======================================= RESERVAS ========================================
+@router.post("/reservas/", tags=["Reservas"])
+async def create_reserva(reserva: schemas.ReservaCreate, db: AsyncSession = Depends(get_db)):
+    try:
+        db_reserva = await reservas.crear_reserva(db, reserva)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except reservas.ReservaSuperpuesta as e:
+        raise HTTPException(status_code=409, detail={"mensaje": str(e), "conflictos": e.reserva_ids})
+    if db_reserva is None:
+        raise HTTPException(status_code=404, detail="Mesa no encontrada")
+    return {"id": db_reserva.id, "mesa_id": db_reserva.mesa_id, "inicio": db_reserva.inicio, "fin": db_reserva.fin}
+
+# Valida N reservas (contra lo guardado y entre sí) sin guardarlas
+@router.post("/reservas/validar", tags=["Reservas"])
+async def validate_reservas(lote: List[schemas.ReservaCreate], db: AsyncSession = Depends(get_db)):
+    return await reservas.validar_lote(db, lote)
+
+
+#===================================== CARGA MASIVA =====================================
+# Alta masiva desde CSV / JSON / JSON Lines (clientes, mesas, combos, inventario)
+@router.post("/bulk/{entidad}", tags=["Carga masiva"])
+async def bulk_import(
+    entidad: str,
+    archivo: UploadFile = File(...),
+    chunk_size: int = Query(bulk.DEFAULT_CHUNK_SIZE, ge=1, le=5000),
+    db: AsyncSession = Depends(get_db)
+):
+    if entidad not in bulk.BULK_ENTITIES:
+        raise HTTPException(status_code=404, detail="Entidad no soportada")
+    try:
+        rows = bulk.iter_rows(archivo.file, archivo.filename)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Archivo inválido: {e}")
+    result = await bulk.import_rows(db, entidad, rows, chunk_size)
+    if "error" in result:
+        # Archivo cortado a mitad de camino: 400 con lo que sí se insertó y dónde está el error
+        return JSONResponse(status_code=400, content=jsonable_encoder(result))
+    return result
+
+
+#====================================== INVENTARIO =======================================
+# Ingreso (cantidad > 0) o salida (cantidad < 0) de stock: un UPDATE atómico + movimiento
+@router.post("/inventario/{inventario_id}/movimientos", tags=["Inventario"])
+async def create_movimiento(inventario_id: int, movimiento: schemas.MovimientoCreate, db: AsyncSession = Depends(get_db)):
+    if movimiento.cantidad == 0:
+        raise HTTPException(status_code=400, detail="La cantidad no puede ser 0")
+    try:
+        cantidad = await db.run_sync(lambda s: inventario.aplicar_movimiento(
+            s.connection(), inventario_id, movimiento.cantidad, movimiento.motivo))
+    except inventario.StockInsuficiente as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if cantidad is None:
+        raise HTTPException(status_code=404, detail="Producto no encontrado")
+    await db.commit()
+    return {"id": inventario_id, "cantidad": cantidad}
+
+
+#======================================= INTERNO ========================================
+# Estado del pool de conexiones, para dimensionar workers contra la base de datos
+@router.get("/internal/pool", tags=["Interno"], include_in_schema=False)
+async def read_pool_stats():
+    return get_pool_stats()
+
+# Aciertos / fallos de la caché de catálogos (mesas, combos)
+@router.get("/internal/cache", tags=["Interno"], include_in_schema=False)
+async def read_cache_stats():
+    return get_cache_stats()
+
+# Días y reservas en el índice de disponibilidad de mesas
+@router.get("/internal/availability", tags=["Interno"], include_in_schema=False)
+async def read_availability_stats():
+    return availability.stats()
+
+# Estado de la cola de ingreso de pedidos
+@router.get("/internal/pedidos", tags=["Interno"], include_in_schema=False)
+async def read_ingest_stats():
+    return pedido_ingestor.stats()
+
+
 #======================================= PEDIDOS ========================================
-# Lista global para almacenar los pedidos
-pedidos = []
+# Los pedidos se guardan en la base a través de la cola de ingreso (se insertan por lotes)
+PEDIDOS_RECIENTES = 50
 
 @router.post("/create_pedido", response_class=HTMLResponse, tags=["Pedidos"])
-async def create_pedido(request: Request, mesa: int = Form(...), producto: str = Form(...)):
-    pedidos.append({"mesa": mesa, "producto": producto})
-    return templates.TemplateResponse("pedido.html", {"request": request, "pedidos": pedidos, "message": "Pedido creado exitosamente!"})
+async def create_pedido(
+    request: Request,
+    mesa: int = Form(...),
+    producto: str = Form(..., max_length=250),
+    cantidad: int = Form(1, ge=1),
+    db: AsyncSession = Depends(get_db)
+):
+    try:
+        await pedido_ingestor.submit({"numero_mesa": mesa, "producto": producto, "cantidad": cantidad}, wait=True)
+    except IngestQueueFull:
+        raise HTTPException(status_code=503, detail="Demasiados pedidos en curso, reintentar en unos segundos")
+    except IngestStopped as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except inventario.StockInsuficiente as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except MesaInexistente as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ERRORES_PERMANENTES:
+        raise HTTPException(status_code=400, detail="Pedido inválido")
+    pedidos = await crud_async.get_ultimos_pedidos(db, limit=PEDIDOS_RECIENTES, load="pedidos.lista")
+    return templates.TemplateResponse("crear_pedido.html", {"request": request, "pedidos": pedidos, "message": "Pedido creado exitosamente!"})
+
+@router.patch("/pedidos/{pedido_id}", tags=["Pedidos"])
+async def patch_pedido(
+    pedido_id: int,
+    pedido_data: schemas.PedidoPatch,
+    if_match: Optional[str] = Header(None),
+    prefer: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_db)
+):
+    return await run_patch(partial(crud_async.patch_pedido, db), pedido_id, pedido_data, if_match, prefer, "Pedido no encontrado")
+
+# Pedido de varias líneas (JSON): precios del menú, total calculado por el server
+async def guardar_lineas(operacion):
+    try:
+        return await operacion
+    except (lineas.CombosInexistentes, lineas.ReferenciaInexistente) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except inventario.StockInsuficiente as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except IntegrityError:
+        # Mesa / cliente borrados entre la verificación y el INSERT
+        raise HTTPException(status_code=409, detail="Los datos chocan con otro registro (referencia inexistente)")
+
+@router.post("/pedidos/", tags=["Pedidos"])
+async def create_pedido_lineas(datos: schemas.PedidoLineasCreate, db: AsyncSession = Depends(get_db)):
+    return await guardar_lineas(lineas.crear_pedido(db, datos))
+
+@router.post("/pedidos/{pedido_id}/lineas", tags=["Pedidos"])
+async def add_pedido_lineas(pedido_id: int, datos: schemas.PedidoLineasAgregar, db: AsyncSession = Depends(get_db)):
+    cuenta = await guardar_lineas(lineas.agregar_lineas(db, pedido_id, datos))
+    if cuenta is None:
+        raise HTTPException(status_code=404, detail="Pedido no encontrado")
+    return cuenta
+
+# Cuenta de la mesa: pedidos con saldo pendiente, sus líneas y lo pagado (una consulta)
+@router.get("/mesas/{mesa_id}/cuenta", tags=["Mesas"])
+async def read_cuenta_mesa(mesa_id: int, db: AsyncSession = Depends(get_db)):
+    return await lineas.cuenta_mesa(db, mesa_id)
 
 @router.get("/pedido", response_class=HTMLResponse, tags=["Pedidos"])
-async def read_pedido(request: Request):
-    return templates.TemplateResponse("pedido.html", {"request": request, "pedidos": pedidos})
+async def read_pedido(request: Request, db: AsyncSession = Depends(get_db)):
+    pedidos = await crud_async.get_ultimos_pedidos(db, limit=PEDIDOS_RECIENTES, load="pedidos.lista")
+    return templates.TemplateResponse("crear_pedido.html", {"request": request, "pedidos": pedidos})
+
+# Pantalla de cocina: se renderiza una vez y luego recibe sólo los cambios por SSE
+@router.get("/cocina", response_class=HTMLResponse, tags=["Pedidos"])
+async def read_cocina(request: Request, mesa: Optional[int] = None, db: AsyncSession = Depends(get_db)):
+    last_event_id = pedido_feed.last_id
+    pedidos = await crud_async.get_ultimos_pedidos(db, limit=PEDIDOS_RECIENTES, load="pedidos.cocina")
+    if mesa is not None:
+        pedidos = [p for p in pedidos if p.mesa_id == mesa]
+    return templates.TemplateResponse("cocina.html", {
+        "request": request,
+        "pedidos": pedidos,
+        "lineas": {p.id: lineas_event_data(p.lineas) for p in pedidos},
+        "mesa": mesa,
+        "last_event_id": last_event_id,
+    })
+
+# Stream de eventos de pedidos (nuevo / actualizado / eliminado / reset).
+# Al reconectar, el navegador manda Last-Event-ID y se reenvía sólo lo perdido.
+@router.get("/pedidos/stream", tags=["Pedidos"])
+async def stream_pedidos(
+    request: Request,
+    mesa: Optional[int] = None,
+    last_event_id: Optional[str] = None,
+    last_event_id_header: Optional[str] = Header(None, alias="Last-Event-ID"),
+):
+    desde = last_event_id_header if last_event_id_header is not None else last_event_id
+    return StreamingResponse(
+        stream_events(request, mesa_id=mesa, last_event_id=desde),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+#======================================= REPORTES ========================================
+# Ventas agrupadas por dia / hora / mesa / combo. Se leen sólo de ventas_resumen.
+@router.get("/reportes/ventas/{agrupar}", tags=["Reportes"])
+async def reporte_ventas(
+    agrupar: str,
+    desde: Optional[date] = None,
+    hasta: Optional[date] = None,
+    db: AsyncSession = Depends(get_db)
+):
+    if agrupar not in rollups.AGRUPACIONES:
+        raise HTTPException(status_code=404, detail="Agrupación no soportada (dia, hora, mesa, combo)")
+    if desde and hasta and desde > hasta:
+        raise HTTPException(status_code=400, detail="'desde' debe ser anterior a 'hasta'")
+    return await rollups.reporte_ventas(db, agrupar, desde, hasta)
+
+# Conciliación de pagos: pedidos cuyos pagos no suman el total y cobrado por método de pago.
+# Por defecto el día de hoy; ?todos=true lista también los pedidos saldados.
+@router.get("/reportes/conciliacion", tags=["Reportes"])
+async def reporte_conciliacion(
+    desde: Optional[date] = None,
+    hasta: Optional[date] = None,
+    todos: bool = False,
+    db: AsyncSession = Depends(get_db)
+):
+    if desde and hasta and desde > hasta:
+        raise HTTPException(status_code=400, detail="'desde' debe ser anterior a 'hasta'")
+    return await conciliacion.conciliar(db, desde, hasta, todos)
+
+
+#======================================= EXPORTAR ========================================
+# CSV para contabilidad (pedidos, pagos, clientes) en streaming: memoria constante
+# sin importar la cantidad de filas. ?gzip=true devuelve un .csv.gz
+@router.get("/exportar/{entidad}.csv", tags=["Reportes"])
+async def exportar_csv(
+    entidad: str,
+    desde: Optional[date] = None,
+    hasta: Optional[date] = None,
+    gzip: bool = False,
+):
+    if entidad not in exportar.EXPORTACIONES:
+        raise HTTPException(status_code=404, detail="Exportación no soportada (pedidos, pagos, clientes)")
+    if desde and hasta and desde > hasta:
+        raise HTTPException(status_code=400, detail="'desde' debe ser anterior a 'hasta'")
+    archivo = exportar.nombre_archivo(entidad, desde, hasta, gzip)
+    return StreamingResponse(
+        exportar.generar(entidad, desde, hasta, gzip),
+        media_type="application/gzip" if gzip else "text/csv; charset=utf-8",
+        headers={"Content-Disposition": f'attachment; filename="{archivo}"', "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,128 @@
+import argparse
+import asyncio
+import csv
+import io
+import os
+import sys
+import zlib
+from datetime import date
+
+from sqlalchemy import select
+
+from app import models
+from app.conciliacion import rango
+from app.database import AsyncSessionLocal
+
+# Exportaciones CSV para contabilidad (pedidos, pagos, clientes), en memoria constante:
+# - Filas crudas (Core, sin objetos ORM) leídas con un cursor del lado del servidor
+#   (yield_per): en memoria sólo hay un lote de filas a la vez.
+# - Cada lote se escribe como CSV en un buffer reutilizado y se envía (o se comprime con
+#   gzip de a poco y se envía) antes de leer el siguiente.
+#
+#   python -m app.exportar pedidos [--desde AAAA-MM-DD] [--hasta AAAA-MM-DD] [--gzip] [-o archivo]
+#
+# Sin -o se escribe a stdout. Por HTTP:  GET /exportar/pedidos.csv?desde=...&hasta=...&gzip=true
+
+EXPORT_YIELD_PER = int(os.getenv("EXPORT_YIELD_PER", "2000"))  # filas por fetch del cursor
+GZIP_NIVEL = 6
+
+pedidos = models.Pedido.__table__
+pagos = models.Pago.__table__
+metodos_pago = models.MetodoPago.__table__
+clientes = models.Cliente.__table__
+
+# entidad -> (columnas, FROM, columna de fecha para desde / hasta)
+EXPORTACIONES = {
+    "pedidos": (
+        (pedidos.c.id, pedidos.c.fecha_pedido, pedidos.c.cliente_id, pedidos.c.mesa_id, pedidos.c.combo_id,
+         pedidos.c.producto, pedidos.c.cantidad, pedidos.c.total_pedido),
+        pedidos,
+        pedidos.c.fecha_pedido,
+    ),
+    "pagos": (
+        (pagos.c.id, pagos.c.fecha_pago, pagos.c.pedido_id, pagos.c.metodo_pago_id,
+         metodos_pago.c.tipo_metodo, pagos.c.monto),
+        pagos.outerjoin(metodos_pago, metodos_pago.c.id == pagos.c.metodo_pago_id),
+        pagos.c.fecha_pago,
+    ),
+    "clientes": (
+        (clientes.c.id, clientes.c.nombre, clientes.c.apellido, clientes.c.email, clientes.c.telefono),
+        clientes,
+        None,
+    ),
+}
+
+
+def consulta(entidad: str, desde: date = None, hasta: date = None):
+    columnas, origen, fecha = EXPORTACIONES[entidad]
+    stmt = select(*columnas).select_from(origen).order_by(columnas[0])
+    if fecha is not None:
+        stmt = stmt.where(*rango(fecha, desde, hasta))
+    return stmt
+
+
+def nombre_archivo(entidad: str, desde: date = None, hasta: date = None, comprimir: bool = False) -> str:
+    partes = [entidad] + [str(d) for d in (desde, hasta) if d is not None and EXPORTACIONES[entidad][2] is not None]
+    return "_".join(partes) + (".csv.gz" if comprimir else ".csv")
+
+
+class EscritorCSV:
+    # Convierte lotes de filas en bytes CSV (y gzip, si se pide) reutilizando el buffer
+    def __init__(self, comprimir: bool = False):
+        self.buffer = io.StringIO()
+        self.writer = csv.writer(self.buffer)
+        # wbits=31: formato gzip (cabecera y CRC), no zlib crudo
+        self.gzip = zlib.compressobj(GZIP_NIVEL, zlib.DEFLATED, 31) if comprimir else None
+
+    def lote(self, filas) -> bytes:
+        self.writer.writerows(filas)
+        datos = self.buffer.getvalue().encode()
+        self.buffer.seek(0)
+        self.buffer.truncate()
+        return self.gzip.compress(datos) if self.gzip is not None else datos
+
+    def fin(self) -> bytes:
+        return self.gzip.flush() if self.gzip is not None else b""
+
+
+async def generar(entidad: str, desde: date = None, hasta: date = None, comprimir: bool = False,
+                  yield_per: int = EXPORT_YIELD_PER):
+    # Generador de chunks para StreamingResponse o un archivo
+    stmt = consulta(entidad, desde, hasta)
+    escritor = EscritorCSV(comprimir)
+    yield escritor.lote([[c.name for c in stmt.selected_columns]])
+    # Sesión propia: tiene que seguir abierta mientras se envía la respuesta
+    async with AsyncSessionLocal() as db:
+        result = await db.stream(stmt.execution_options(yield_per=yield_per))
+        async for filas in result.partitions():
+            chunk = escritor.lote(filas)
+            if chunk:
+                yield chunk
+    yield escritor.fin()
+
+
+#==================================== C O N S O L A ========================================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Exportación CSV en streaming")
+    parser.add_argument("entidad", choices=sorted(EXPORTACIONES))
+    parser.add_argument("--desde", type=date.fromisoformat, help="AAAA-MM-DD (pedidos y pagos)")
+    parser.add_argument("--hasta", type=date.fromisoformat, help="AAAA-MM-DD (inclusive)")
+    parser.add_argument("--gzip", action="store_true", help="comprimir la salida")
+    parser.add_argument("-o", "--salida", help="archivo de salida (por defecto, stdout)")
+    parser.add_argument("--yield-per", type=int, default=EXPORT_YIELD_PER, help="filas por lote")
+    args = parser.parse_args(argv)
+
+    async def run(destino):
+        async for chunk in generar(args.entidad, args.desde, args.hasta, args.gzip, args.yield_per):
+            destino.write(chunk)
+
+    if args.salida:
+        with open(args.salida, "wb") as destino:
+            asyncio.run(run(destino))
+    else:
+        asyncio.run(run(sys.stdout.buffer))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,184 @@
+import asyncio
+import json
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app import models
+
+# Feed de pedidos para las pantallas de cocina (Server-Sent Events).
+# Cada alta / cambio / baja de un pedido genera un evento con id "<época>-<n>": n es
+# correlativo y la época cambia en cada arranque del proceso.
+# Los últimos FEED_BUFFER eventos quedan en memoria para que una pantalla que se
+# reconecta (header Last-Event-ID) reciba sólo lo que se perdió; si lo perdido ya
+# salió del buffer, o el id es de otra época (el server se reinició y el contador volvió
+# a empezar), recibe un evento "reset" y recarga la lista completa.
+# El feed es por proceso: ve los pedidos escritos por este worker.
+
+FEED_BUFFER = int(os.getenv("FEED_BUFFER", "1000"))
+FEED_SUBSCRIBER_QUEUE = int(os.getenv("FEED_SUBSCRIBER_QUEUE", "256"))
+FEED_HEARTBEAT_S = float(os.getenv("FEED_HEARTBEAT_S", "15"))
+
+
+def _getter(obj):
+    return obj.get if isinstance(obj, dict) else lambda key: getattr(obj, key, None)
+
+
+def lineas_event_data(lineas) -> list:
+    # Ítems de un pedido de varias líneas (dicts o models.PedidoLinea)
+    return [{key: _getter(linea)(key) for key in ("combo_id", "producto", "cantidad")} for linea in lineas]
+
+
+def pedido_event_data(pedido, lineas=None) -> dict:
+    # Acepta un models.Pedido o el dict de columnas que inserta la cola de ingreso.
+    # lineas: todas las líneas del pedido, si las tiene (app/lineas.py)
+    get = _getter(pedido)
+    data = {key: get(key) for key in ("id", "mesa_id", "combo_id", "producto", "cantidad", "total_pedido")}
+    fecha = get("fecha_pedido")
+    data["fecha_pedido"] = fecha.isoformat() if isinstance(fecha, datetime) else fecha
+    if lineas is not None:
+        data["lineas"] = lineas_event_data(lineas)
+    return data
+
+
+class Subscriber:
+    def __init__(self, loop, mesa_id=None):
+        self.loop = loop
+        self.mesa_id = mesa_id
+        self.queue = asyncio.Queue(maxsize=FEED_SUBSCRIBER_QUEUE)
+        self.overflow = False
+
+    def wants(self, ev) -> bool:
+        return self.mesa_id is None or ev["data"].get("mesa_id") == self.mesa_id
+
+    def push(self, ev):
+        # Se ejecuta en el loop del suscriptor; una pantalla lenta no frena al resto
+        if self.overflow:
+            return
+        try:
+            self.queue.put_nowait(ev)
+        except asyncio.QueueFull:
+            self.overflow = True
+            self.queue.get_nowait()
+            self.queue.put_nowait({"id": ev["id"], "tipo": "reset", "data": {}})
+
+
+class PedidoFeed:
+    def __init__(self, size: int = FEED_BUFFER, epoch: str = None):
+        self._lock = threading.Lock()
+        self._buffer = deque(maxlen=size)
+        self._subscribers = set()
+        self._last_id = 0
+        self.epoch = epoch or f"{time.time_ns():x}"
+
+    @property
+    def last_id(self) -> str:
+        return f"{self.epoch}-{self._last_id}"
+
+    def _numero(self, event_id):
+        # n de un id de esta época; None si es de otra o no tiene formato de id
+        epoch, _, n = str(event_id).rpartition("-")
+        return int(n) if epoch == self.epoch and n.isdigit() else None
+
+    def publish(self, tipo: str, data: dict):
+        # Puede llamarse desde cualquier hilo (sesiones sync en el threadpool)
+        with self._lock:
+            self._last_id += 1
+            ev = {"id": self.last_id, "n": self._last_id, "tipo": tipo, "data": data}
+            self._buffer.append(ev)
+            subscribers = list(self._subscribers)
+        for sub in subscribers:
+            if sub.wants(ev):
+                try:
+                    sub.loop.call_soon_threadsafe(sub.push, ev)
+                except RuntimeError:  # loop cerrado: la conexión ya no existe
+                    self.unsubscribe(sub)
+        return ev
+
+    def subscribe(self, mesa_id=None, last_event_id=None):
+        # Devuelve (suscriptor, eventos a reenviar) tomados atómicamente
+        sub = Subscriber(asyncio.get_running_loop(), mesa_id)
+        with self._lock:
+            self._subscribers.add(sub)
+            desde = self._numero(last_event_id)
+            if last_event_id is None:
+                backlog = []
+            elif desde is None or desde > self._last_id or (self._buffer and desde < self._buffer[0]["n"] - 1):
+                # El id es de antes de un reinicio (otra época) o ya salió del buffer
+                backlog = [{"id": self.last_id, "tipo": "reset", "data": {}}]
+            else:
+                backlog = [ev for ev in self._buffer if ev["n"] > desde and sub.wants(ev)]
+        return sub, backlog
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            self._subscribers.discard(sub)
+
+
+pedido_feed = PedidoFeed()
+
+
+def format_sse(ev) -> str:
+    return f"id: {ev['id']}\nevent: {ev['tipo']}\ndata: {json.dumps(ev['data'], default=str)}\n\n"
+
+
+async def stream_events(request, mesa_id=None, last_event_id=None):
+    sub, backlog = pedido_feed.subscribe(mesa_id, last_event_id)
+    try:
+        # Indica al navegador cada cuánto reintentar si se corta la conexión
+        yield "retry: 3000\n\n"
+        for ev in backlog:
+            yield format_sse(ev)
+        if backlog and backlog[-1]["tipo"] == "reset":
+            return  # la pantalla recarga y abre otra conexión
+        while True:
+            try:
+                ev = await asyncio.wait_for(sub.queue.get(), FEED_HEARTBEAT_S)
+            except asyncio.TimeoutError:
+                if await request.is_disconnected():
+                    break
+                yield ": ping\n\n"
+                continue
+            yield format_sse(ev)
+            if ev["tipo"] == "reset":
+                break
+    finally:
+        pedido_feed.unsubscribe(sub)
+
+
+#========================= S I N C R O N I Z A C I O N ========================================
+# Altas/cambios/bajas hechos con el ORM se publican al confirmar la transacción.
+# La cola de ingreso (inserciones por lote) publica directamente tras su commit.
+
+_CHANGES_KEY = "feed_changes"
+
+
+@event.listens_for(Session, "after_flush")
+def _track_changes(session, flush_context):
+    changes = session.info.setdefault(_CHANGES_KEY, [])
+    for obj in session.new:
+        if isinstance(obj, models.Pedido):
+            changes.append(("nuevo", pedido_event_data(obj)))
+    for obj in session.dirty:
+        if isinstance(obj, models.Pedido) and session.is_modified(obj, include_collections=False):
+            changes.append(("actualizado", pedido_event_data(obj)))
+    for obj in session.deleted:
+        if isinstance(obj, models.Pedido):
+            changes.append(("eliminado", {"id": obj.id, "mesa_id": obj.mesa_id}))
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_changes(session):
+    for tipo, data in session.info.pop(_CHANGES_KEY, []):
+        pedido_feed.publish(tipo, data)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_changes(session, previous_transaction):
+    if not previous_transaction.nested:
+        session.info.pop(_CHANGES_KEY, None)
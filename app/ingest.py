@@ -0,0 +1,243 @@
+import asyncio
+import logging
+import os
+from datetime import datetime
+
+from sqlalchemy import insert, select
+from sqlalchemy.exc import DataError, IntegrityError
+
+from app import models, rollups, inventario
+from app.database import AsyncSessionLocal
+from app.feed import pedido_feed, pedido_event_data
+
+# Ingreso de pedidos con escritura diferida (write-behind):
+# los pedidos se encolan y un worker los agrupa en un único INSERT (executemany)
+# cada PEDIDOS_FLUSH_MS milisegundos o cada PEDIDOS_BATCH_SIZE pedidos, lo que ocurra primero.
+# - Back-pressure: si la cola está llena, submit espera hasta PEDIDOS_SUBMIT_TIMEOUT y luego falla.
+# - Al apagar el server se vacía la cola antes de salir (hasta PEDIDOS_STOP_TIMEOUT; lo que
+#   quede se descarta y se registra en el log).
+# - Los pedidos sin stock (app/inventario.py) no se insertan: con wait=True submit lanza StockInsuficiente.
+# - Los pedidos con un número de mesa inexistente no se insertan: submit lanza MesaInexistente.
+# - Errores transitorios (base caída, lock): se reintenta el lote hasta PEDIDOS_REINTENTOS veces.
+#   Errores de datos (ERRORES_PERMANENTES): el lote se parte en mitades hasta aislar los
+#   pedidos inválidos; sólo esos fallan (submit lanza el error) y el resto se guarda.
+# - Feed de cocina y contadores van después del commit, fuera de los reintentos: si fallan
+#   no se vuelve a insertar un lote ya guardado.
+
+logger = logging.getLogger(__name__)
+
+PEDIDOS_BATCH_SIZE = int(os.getenv("PEDIDOS_BATCH_SIZE", "100"))
+PEDIDOS_FLUSH_MS = float(os.getenv("PEDIDOS_FLUSH_MS", "20"))
+PEDIDOS_QUEUE_MAX = int(os.getenv("PEDIDOS_QUEUE_MAX", "5000"))
+PEDIDOS_SUBMIT_TIMEOUT = float(os.getenv("PEDIDOS_SUBMIT_TIMEOUT", "2"))
+PEDIDOS_RETRY_MAX_S = 5.0
+PEDIDOS_REINTENTOS = int(os.getenv("PEDIDOS_REINTENTOS", "5"))
+PEDIDOS_STOP_TIMEOUT = float(os.getenv("PEDIDOS_STOP_TIMEOUT", "10"))  # segundos vaciando la cola al apagar
+
+# Reintentar no los arregla: el problema está en los datos del pedido
+ERRORES_PERMANENTES = (IntegrityError, DataError, OverflowError, TypeError, ValueError)
+
+
+class IngestQueueFull(Exception):
+    pass
+
+
+class IngestStopped(Exception):
+    pass
+
+
+class MesaInexistente(ValueError):
+    def __init__(self, numero_mesa):
+        super().__init__(f"Mesa inexistente: {numero_mesa}")
+        self.numero_mesa = numero_mesa
+
+
+class PedidoIngestor:
+    def __init__(self, batch_size: int = PEDIDOS_BATCH_SIZE, flush_ms: float = PEDIDOS_FLUSH_MS,
+                 maxsize: int = PEDIDOS_QUEUE_MAX, session_factory=AsyncSessionLocal):
+        self.batch_size = batch_size
+        self.flush_interval = flush_ms / 1000
+        self.maxsize = maxsize
+        self.session_factory = session_factory
+        self._queue = None
+        self._task = None
+        self._en_curso = []
+        self.batches = 0
+        self.written = 0
+
+    @property
+    def running(self):
+        return self._task is not None and not self._task.done()
+
+    async def start(self):
+        if not self.running:
+            self._queue = asyncio.Queue(maxsize=self.maxsize)
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self, timeout: float = PEDIDOS_STOP_TIMEOUT):
+        # Flush-on-shutdown: se procesan los pedidos encolados antes de terminar, con un límite
+        # (un lote que no para de reintentar no puede colgar el apagado)
+        if not self.running:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        descartados = self._en_curso
+        while not self._queue.empty():
+            descartados.append(self._queue.get_nowait())
+            self._queue.task_done()
+        self._en_curso = []
+        if descartados:
+            logger.error("Apagado: %d pedidos sin confirmar se descartan: %r", len(descartados), [d for d, _ in descartados])
+            for _, future in descartados:
+                if future is not None and not future.done():
+                    future.set_exception(IngestStopped("El servidor se está apagando"))
+
+    async def submit(self, data: dict, wait: bool = False, timeout: float = PEDIDOS_SUBMIT_TIMEOUT):
+        # wait=True: vuelve recién cuando el lote que contiene el pedido se confirmó en la base
+        if not self.running:
+            await self.start()
+        future = asyncio.get_running_loop().create_future() if wait else None
+        data.setdefault("fecha_pedido", datetime.utcnow())
+        try:
+            await asyncio.wait_for(self._queue.put((data, future)), timeout)
+        except asyncio.TimeoutError:
+            raise IngestQueueFull("La cola de pedidos está llena")
+        if future is not None:
+            await future
+
+    def stats(self) -> dict:
+        return {
+            "pendientes": self._queue.qsize() if self._queue else 0,
+            "max": self.maxsize,
+            "lotes": self.batches,
+            "escritos": self.written,
+        }
+
+    async def _collect(self):
+        batch = [await self._queue.get()]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = self._en_curso = await self._collect()
+            resultados = await self._guardar(batch)
+            self._en_curso = []
+            for (data, future), error in resultados:
+                if error is None:
+                    if future is not None and not future.done():
+                        future.set_result(None)
+                elif future is None:
+                    logger.warning("Pedido descartado: %r", error)
+                elif not future.done():
+                    future.set_exception(error)
+                self._queue.task_done()
+
+    async def _guardar(self, batch):
+        # Devuelve [((data, future), error o None)] en el orden del lote
+        try:
+            rechazados, aceptados = await self._write_reintentando([data for data, _ in batch])
+        except ERRORES_PERMANENTES as e:
+            if len(batch) == 1:
+                logger.error("Pedido inválido %r: %r", batch[0][0], e)
+                return [(batch[0], e)]
+            mitad = len(batch) // 2
+            return await self._guardar(batch[:mitad]) + await self._guardar(batch[mitad:])
+        except Exception as e:
+            return [(item, e) for item in batch]
+        self._confirmados(aceptados)
+        return [(item, rechazados.get(i)) for i, item in enumerate(batch)]
+
+    def _confirmados(self, aceptados):
+        # Después del commit: un error acá no puede hacer reintentar (ni duplicar) el lote
+        self.batches += 1
+        self.written += len(aceptados)
+        try:
+            for row in aceptados:
+                pedido_feed.publish("nuevo", pedido_event_data(row))
+        except Exception:
+            logger.exception("Error publicando %d pedidos en el feed de cocina", len(aceptados))
+
+    async def _write_reintentando(self, rows):
+        delay = 0.1
+        for intento in range(PEDIDOS_REINTENTOS + 1):
+            try:
+                return await self._write(rows)
+            except ERRORES_PERMANENTES:
+                raise
+            except Exception:
+                if intento == PEDIDOS_REINTENTOS:
+                    logger.exception("Error guardando %d pedidos, se descartan tras %d reintentos", len(rows), intento)
+                    raise
+                # Mientras tanto la cola se llena y submit aplica back-pressure a los clientes
+                logger.exception("Error guardando %d pedidos, reintentando", len(rows))
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, PEDIDOS_RETRY_MAX_S)
+
+    async def _write(self, rows):
+        # Devuelve ({índice: error} de los pedidos rechazados, filas insertadas)
+        async with self.session_factory() as db:
+            # El formulario manda el número de mesa: se resuelve a mesa_id con una sola consulta por lote
+            numeros = {r["numero_mesa"] for r in rows if r.get("numero_mesa") is not None}
+            ids = {}
+            if numeros:
+                result = await db.execute(
+                    select(models.Mesa.numero_mesa, models.Mesa.id).where(models.Mesa.numero_mesa.in_(numeros))
+                )
+                ids = dict(result.all())
+            rechazados, indices, values = {}, [], []
+            for i, row in enumerate(rows):
+                row = dict(row)
+                numero = row.pop("numero_mesa", None)
+                if numero is not None and row.get("mesa_id") is None:
+                    if numero not in ids:
+                        rechazados[i] = MesaInexistente(numero)
+                        continue
+                    row["mesa_id"] = ids[numero]
+                indices.append(i)
+                values.append(row)
+            # Descuento de stock: un UPDATE atómico por producto del lote; los pedidos sin
+            # stock se rechazan y no se insertan.
+            sin_stock, items = await db.run_sync(lambda s: inventario.descontar_pedidos(s.connection(), values))
+            for j in sin_stock:
+                rechazados[indices[j]] = inventario.StockInsuficiente(values[j].get("producto"))
+            aceptados = [row for j, row in enumerate(values) if j not in sin_stock]
+            if aceptados:
+                stmt = insert(models.Pedido)
+                if db.bind.dialect.insert_executemany_returning:
+                    # Con RETURNING el mismo executemany devuelve los ids para el feed de cocina
+                    result = await db.execute(stmt.returning(models.Pedido.id, sort_by_parameter_order=True), aceptados)
+                    for row, pedido_id in zip(aceptados, result.scalars().all()):
+                        row["id"] = pedido_id
+                else:
+                    await db.execute(stmt, aceptados)
+
+                def registrar(session):
+                    conn = session.connection()
+                    inventario.registrar_pedidos(conn, values, items)
+                    # Resumen de ventas en la misma transacción que el lote
+                    rollups.apply_pedidos_insertados(conn, aceptados)
+
+                await db.run_sync(registrar)
+            await db.commit()
+        return rechazados, aceptados
+
+
+pedido_ingestor = PedidoIngestor()
@@ -0,0 +1,217 @@
+import argparse
+import asyncio
+import logging
+import os
+import sys
+from datetime import datetime
+
+from sqlalchemy import delete, event, func, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app import models
+from app.database import AsyncSessionLocal
+
+# Stock de inventario con descuentos atómicos.
+# - Cada movimiento es un único UPDATE "cantidad = cantidad + :n" (sin leer antes ni
+#   bloquear la fila con SELECT ... FOR UPDATE); las salidas llevan la guarda
+#   "AND cantidad + :n >= stock_minimo" y si no alcanza no se modifica nada.
+# - Los pedidos descuentan stock del producto del mismo nombre (si no está en el
+#   inventario no se controla). La cola de ingreso hace un UPDATE por producto y por
+#   lote, así un producto muy pedido no serializa cada pedido.
+# - Cada movimiento queda en movimientos_inventario. Los productos con muchos
+#   movimientos se compactan periódicamente: los más viejos se suman en una sola fila.
+#
+# Uso por consola:  python -m app.inventario compactar [--conservar 500]
+
+logger = logging.getLogger(__name__)
+
+INVENTARIO_CONSERVAR = int(os.getenv("INVENTARIO_CONSERVAR", "500"))     # movimientos recientes por producto
+INVENTARIO_COMPACTAR_S = float(os.getenv("INVENTARIO_COMPACTAR_S", "600"))
+
+inventario = models.Inventario.__table__
+movimientos = models.MovimientoInventario.__table__
+
+
+class StockInsuficiente(Exception):
+    def __init__(self, producto):
+        super().__init__(f"Stock insuficiente de {producto}")
+        self.producto = producto
+
+
+class CantidadInvalida(ValueError):
+    def __init__(self, cantidad):
+        super().__init__(f"Cantidad inválida: {cantidad}")
+        self.cantidad = cantidad
+
+
+def _cantidad(pedido: dict) -> int:
+    # Sin cantidad es 1; 0 o negativa no (sumaría stock en vez de descontarlo)
+    cantidad = pedido.get("cantidad")
+    return 1 if cantidad is None else cantidad
+
+
+def _mover(conn, inventario_id: int, cantidad: int) -> bool:
+    stmt = update(inventario).where(inventario.c.id == inventario_id).values(cantidad=inventario.c.cantidad + cantidad)
+    if cantidad < 0:
+        stmt = stmt.where(inventario.c.cantidad + cantidad >= inventario.c.stock_minimo)
+    return conn.execute(stmt).rowcount > 0
+
+
+def registrar(conn, rows):
+    # rows: (inventario_id, cantidad, motivo, pedido_id)
+    if rows:
+        ahora = datetime.utcnow()
+        conn.execute(insert(movimientos), [
+            {"inventario_id": item, "cantidad": cantidad, "motivo": motivo, "pedido_id": pedido_id, "fecha": ahora}
+            for item, cantidad, motivo, pedido_id in rows
+        ])
+
+
+def aplicar_movimiento(conn, inventario_id: int, cantidad: int, motivo: str = "ajuste"):
+    # Ingreso / ajuste manual. Devuelve el saldo, None si el producto no existe
+    # o lanza StockInsuficiente si la salida lo deja por debajo del mínimo.
+    if not _mover(conn, inventario_id, cantidad):
+        producto = conn.execute(select(inventario.c.producto).where(inventario.c.id == inventario_id)).scalar()
+        if producto is None:
+            return None
+        raise StockInsuficiente(producto)
+    registrar(conn, [(inventario_id, cantidad, motivo, None)])
+    return conn.execute(select(inventario.c.cantidad).where(inventario.c.id == inventario_id)).scalar()
+
+
+def descontar_pedidos(conn, pedidos):
+    # pedidos: dicts con producto / cantidad. Devuelve (índices rechazados, {índice: inventario_id})
+    # Lanza CantidadInvalida si algún pedido tiene cantidad <= 0
+    for p in pedidos:
+        if _cantidad(p) <= 0:
+            raise CantidadInvalida(_cantidad(p))
+    productos = {p.get("producto") for p in pedidos if p.get("producto")}
+    if not productos:
+        return set(), {}
+    ids = dict(conn.execute(select(inventario.c.producto, inventario.c.id).where(inventario.c.producto.in_(productos))).all())
+    items = {i: ids[p.get("producto")] for i, p in enumerate(pedidos) if p.get("producto") in ids}
+    por_item = {}
+    for i, item in items.items():
+        por_item.setdefault(item, []).append(i)
+
+    rechazados = set()
+    # Orden fijo de productos: dos lotes concurrentes bloquean las filas en el mismo orden
+    for item in sorted(por_item):
+        indices = por_item[item]
+        if _mover(conn, item, -sum(_cantidad(pedidos[i]) for i in indices)):
+            continue
+        # No alcanza para todo el lote: se aceptan en orden de llegada mientras haya stock
+        for i in indices:
+            if not _mover(conn, item, -_cantidad(pedidos[i])):
+                rechazados.add(i)
+    for i in rechazados:
+        del items[i]
+    return rechazados, items
+
+
+def registrar_pedidos(conn, pedidos, items):
+    # Después del INSERT de los pedidos (para tener su id)
+    registrar(conn, [
+        (item, -_cantidad(pedidos[i]), "pedido", pedidos[i].get("id")) for i, item in sorted(items.items())
+    ])
+
+
+#=================================== C O M P A C T A C I O N ========================================
+async def compactar(db: AsyncSession, conservar: int = INVENTARIO_CONSERVAR):
+    # Por cada producto con más de `conservar` movimientos, los más viejos se reemplazan por
+    # una fila "compactado" con la suma (y el id del último fusionado, para mantener el orden).
+    # Una transacción corta por producto. Devuelve la cantidad de filas eliminadas.
+    calientes = (
+        select(movimientos.c.inventario_id)
+        .group_by(movimientos.c.inventario_id)
+        .having(func.count() > conservar + 1)
+    )
+    eliminadas = 0
+    for item in (await db.execute(calientes)).scalars().all():
+        corte = (await db.execute(
+            select(movimientos.c.id).where(movimientos.c.inventario_id == item)
+            .order_by(movimientos.c.id.desc()).offset(conservar).limit(1)
+        )).scalar()
+        viejos = (movimientos.c.inventario_id == item, movimientos.c.id <= corte)
+        suma, fecha, cantidad = (await db.execute(
+            select(func.sum(movimientos.c.cantidad), func.max(movimientos.c.fecha), func.count()).where(*viejos)
+        )).one()
+        await db.execute(delete(movimientos).where(*viejos))
+        await db.execute(insert(movimientos).values(
+            id=corte, inventario_id=item, cantidad=suma, motivo="compactado", fecha=fecha
+        ))
+        await db.commit()
+        eliminadas += cantidad - 1
+    return eliminadas
+
+
+class Compactador:
+    # Compactación periódica en segundo plano (arranca y se detiene con el server)
+    def __init__(self, intervalo: float = INVENTARIO_COMPACTAR_S, session_factory=AsyncSessionLocal):
+        self.intervalo = intervalo
+        self.session_factory = session_factory
+        self._task = None
+
+    async def start(self):
+        if self._task is None and self.intervalo > 0:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.intervalo)
+            try:
+                async with self.session_factory() as db:
+                    eliminadas = await compactar(db)
+                if eliminadas:
+                    logger.info("Movimientos de inventario compactados: %d", eliminadas)
+            except Exception:
+                logger.exception("Error compactando movimientos de inventario")
+
+
+compactador = Compactador()
+
+
+#========================= S I N C R O N I Z A C I O N ========================================
+# Pedidos creados con el ORM: se descuenta el stock en el mismo flush. Si no alcanza,
+# StockInsuficiente hace fallar el flush y la transacción se deshace entera.
+
+@event.listens_for(Session, "after_flush")
+def _descontar_stock(session, flush_context):
+    nuevos = [obj for obj in session.new if isinstance(obj, models.Pedido)]
+    if not nuevos:
+        return
+    pedidos = [{"id": p.id, "producto": p.producto, "cantidad": p.cantidad} for p in nuevos]
+    conn = session.connection()
+    rechazados, items = descontar_pedidos(conn, pedidos)
+    if rechazados:
+        raise StockInsuficiente(pedidos[min(rechazados)]["producto"])
+    registrar_pedidos(conn, pedidos, items)
+
+
+#==================================== C O N S O L A ========================================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Movimientos de inventario")
+    parser.add_argument("accion", choices=["compactar"])
+    parser.add_argument("--conservar", type=int, default=INVENTARIO_CONSERVAR, help="movimientos recientes por producto")
+    args = parser.parse_args(argv)
+
+    async def run():
+        async with AsyncSessionLocal() as db:
+            return await compactar(db, args.conservar)
+
+    print(f"{asyncio.run(run())} movimientos compactados")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
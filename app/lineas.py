@@ -0,0 +1,202 @@
+import os
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import inventario, models, rollups, schemas
+from app.feed import pedido_event_data, pedido_feed
+
+# Pedidos con varias líneas (una mesa pide diez cosas = un pedido, no diez).
+# - Precios: una consulta por todos los combos del pedido; cada línea guarda una copia
+#   de Combo.precio (precio_unitario). El total lo calcula el server, nunca el cliente.
+# - Escritura: el pedido y todas sus líneas en dos INSERT (las líneas en un solo INSERT
+#   multi-fila) y un commit, con el descuento de stock y el resumen de ventas en la
+#   misma transacción (como la cola de ingreso).
+# - Cuenta de una mesa: una sola consulta trae los pedidos abiertos con sus líneas y lo
+#   pagado; subtotales y totales se calculan en una pasada, sin importar cuántas líneas haya.
+
+CUENTA_HORAS = float(os.getenv("CUENTA_HORAS", "12"))  # pedidos que cuentan como la mesa abierta
+
+pedidos = models.Pedido.__table__
+lineas = models.PedidoLinea.__table__
+
+
+class CombosInexistentes(Exception):
+    def __init__(self, combo_ids):
+        super().__init__(f"Combos inexistentes: {', '.join(map(str, sorted(combo_ids)))}")
+        self.combo_ids = combo_ids
+
+
+class ReferenciaInexistente(Exception):
+    def __init__(self, campo, valor):
+        super().__init__(f"{campo} inexistente: {valor}")
+        self.campo = campo
+        self.valor = valor
+
+
+def preparar(conn, items):
+    # items: PedidoLineaCreate. Devuelve las filas a insertar con el precio del menú
+    combo_ids = {item.combo_id for item in items}
+    combos = {
+        row.id: row for row in conn.execute(
+            select(models.Combo.id, models.Combo.precio, models.Combo.nombre_combo).where(models.Combo.id.in_(combo_ids))
+        )
+    }
+    faltantes = combo_ids - combos.keys()
+    if faltantes:
+        raise CombosInexistentes(faltantes)
+    return [{
+        "combo_id": item.combo_id,
+        "producto": item.producto or combos[item.combo_id].nombre_combo,
+        "cantidad": item.cantidad,
+        "precio_unitario": combos[item.combo_id].precio or 0.0,
+    } for item in items]
+
+
+def verificar_referencias(conn, datos: schemas.PedidoLineasCreate):
+    # Mesa y cliente tienen que existir (el INSERT fallaría por FK o, sin FK, quedaría colgado)
+    for campo, modelo in (("mesa_id", models.Mesa), ("cliente_id", models.Cliente)):
+        valor = getattr(datos, campo)
+        if valor is not None and conn.execute(select(modelo.id).where(modelo.id == valor)).first() is None:
+            raise ReferenciaInexistente(campo, valor)
+
+
+def total(filas) -> float:
+    return round(sum(f["cantidad"] * f["precio_unitario"] for f in filas), 2)
+
+
+def _descontar_stock(conn, filas, pedido_id):
+    rechazados, items = inventario.descontar_pedidos(conn, filas)
+    if rechazados:
+        raise inventario.StockInsuficiente(filas[min(rechazados)]["producto"])
+    inventario.registrar_pedidos(conn, [{**f, "id": pedido_id} for f in filas], items)
+
+
+def _insertar_lineas(conn, pedido_id, filas):
+    conn.execute(insert(lineas).values([{**f, "pedido_id": pedido_id} for f in filas]))
+
+
+def crear(conn, datos: schemas.PedidoLineasCreate):
+    verificar_referencias(conn, datos)
+    filas = preparar(conn, datos.lineas)
+    combos = {f["combo_id"] for f in filas}
+    pedido = {
+        "cliente_id": datos.cliente_id,
+        "mesa_id": datos.mesa_id,
+        # Combo del pedido sólo si es uno solo (el resumen de ventas va por línea igual)
+        "combo_id": next(iter(combos)) if len(combos) == 1 else None,
+        "cantidad": sum(f["cantidad"] for f in filas),
+        "fecha_pedido": datetime.utcnow(),
+        "total_pedido": total(filas),
+    }
+    pedido["id"] = conn.execute(insert(pedidos).values(pedido)).inserted_primary_key[0]
+    _insertar_lineas(conn, pedido["id"], filas)
+    _descontar_stock(conn, filas, pedido["id"])
+    rollups.apply_lineas_insertadas(conn, pedido, filas, pedido_nuevo=True)
+    return pedido, filas
+
+
+def agregar(conn, pedido_id: int, items):
+    # Devuelve (pedido antes, pedido después) o None si no existe
+    antes = conn.execute(
+        select(*(pedidos.c[c] for c in rollups.CAMPOS_PEDIDO)).where(pedidos.c.id == pedido_id).with_for_update()
+    ).mappings().first()
+    if antes is None:
+        return None
+    filas = preparar(conn, items)
+    _insertar_lineas(conn, pedido_id, filas)
+    _descontar_stock(conn, filas, pedido_id)
+    # Suma atómica sobre el total guardado (sirve también para pedidos viejos sin líneas)
+    agregado = total(filas)
+    conn.execute(update(pedidos).where(pedidos.c.id == pedido_id).values(
+        total_pedido=func.coalesce(pedidos.c.total_pedido, 0) + agregado,
+        cantidad=func.coalesce(pedidos.c.cantidad, 0) + sum(f["cantidad"] for f in filas),
+        version=pedidos.c.version + 1,
+    ))
+    antes = dict(antes)
+    despues = {**antes, "total_pedido": round((antes["total_pedido"] or 0) + agregado, 2)}
+    # El total sube lo mismo que suman las líneas nuevas: sólo se agregan sus importes
+    rollups.apply_lineas_insertadas(conn, antes, filas)
+    return antes, despues
+
+
+async def crear_pedido(db: AsyncSession, datos: schemas.PedidoLineasCreate):
+    pedido, filas = await db.run_sync(lambda s: crear(s.connection(), datos))
+    await db.commit()
+    # Escritura por Core: el feed de cocina no la ve por los eventos del ORM.
+    # El pedido no tiene producto propio: la cocina lee las líneas.
+    pedido_feed.publish("nuevo", pedido_event_data(pedido, lineas=filas))
+    return await cuenta_pedidos(db, [pedido["id"]])
+
+
+async def agregar_lineas(db: AsyncSession, pedido_id: int, datos: schemas.PedidoLineasAgregar):
+    resultado = await db.run_sync(lambda s: agregar(s.connection(), pedido_id, datos.lineas))
+    if resultado is None:
+        return None
+    await db.commit()
+    cuenta = await cuenta_pedidos(db, [pedido_id])
+    # Con todas las líneas del pedido (las anteriores y las nuevas)
+    pedido_feed.publish("actualizado", pedido_event_data(
+        {**resultado[1], "id": pedido_id}, lineas=cuenta["pedidos"][0]["lineas"] if cuenta["pedidos"] else []
+    ))
+    return cuenta
+
+
+#====================================== C U E N T A ========================================
+def _pagado():
+    return func.coalesce(
+        select(func.sum(models.Pago.monto)).where(models.Pago.pedido_id == pedidos.c.id).scalar_subquery(), 0
+    )
+
+
+def _cuenta_stmt(*condiciones):
+    # Una fila por línea (o una por pedido sin líneas) con los datos del pedido y lo pagado
+    return (
+        select(
+            pedidos.c.id, pedidos.c.mesa_id, pedidos.c.cliente_id, pedidos.c.fecha_pedido,
+            pedidos.c.total_pedido, pedidos.c.version, _pagado().label("pagado"),
+            lineas.c.id.label("linea_id"), lineas.c.combo_id, lineas.c.producto,
+            lineas.c.cantidad, lineas.c.precio_unitario,
+        )
+        .select_from(pedidos.outerjoin(lineas, lineas.c.pedido_id == pedidos.c.id))
+        .where(*condiciones)
+        .order_by(pedidos.c.fecha_pedido, pedidos.c.id, lineas.c.id)
+    )
+
+
+def _armar(rows):
+    cuenta, por_id = [], {}
+    for row in rows:
+        pedido = por_id.get(row.id)
+        if pedido is None:
+            pedido = por_id[row.id] = {
+                "id": row.id, "mesa_id": row.mesa_id, "cliente_id": row.cliente_id,
+                "fecha_pedido": row.fecha_pedido, "total_pedido": row.total_pedido or 0.0,
+                "pagado": row.pagado, "version": row.version, "lineas": [],
+            }
+            cuenta.append(pedido)
+        if row.linea_id is not None:
+            pedido["lineas"].append({
+                "id": row.linea_id, "combo_id": row.combo_id, "producto": row.producto,
+                "cantidad": row.cantidad, "precio_unitario": row.precio_unitario,
+                "subtotal": round(row.cantidad * row.precio_unitario, 2),
+            })
+    total_ = round(sum(p["total_pedido"] for p in cuenta), 2)
+    pagado = round(sum(p["pagado"] for p in cuenta), 2)
+    return {"pedidos": cuenta, "total": total_, "pagado": pagado, "saldo": round(total_ - pagado, 2)}
+
+
+async def cuenta_pedidos(db: AsyncSession, pedido_ids):
+    return _armar(await db.execute(_cuenta_stmt(pedidos.c.id.in_(pedido_ids))))
+
+
+async def cuenta_mesa(db: AsyncSession, mesa_id: int, desde: datetime = None):
+    # Pedidos de la mesa con saldo pendiente de las últimas CUENTA_HORAS
+    desde = desde or datetime.utcnow() - timedelta(hours=CUENTA_HORAS)
+    stmt = _cuenta_stmt(
+        pedidos.c.mesa_id == mesa_id,
+        pedidos.c.fecha_pedido >= desde,
+        func.coalesce(pedidos.c.total_pedido, 0) > _pagado(),
+    )
+    return {"mesa_id": mesa_id, **_armar(await db.execute(stmt))}
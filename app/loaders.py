@@ -0,0 +1,66 @@
+from sqlalchemy.orm import selectinload, joinedload
+from app import models
+
+# Política de carga por vista: cada endpoint declara qué relaciones va a
+# recorrer y se cargan con selectin/joined en lugar de una consulta por fila (N+1).
+# selectinload para colecciones (una consulta IN por relación), joinedload para many-to-one.
+
+#==================================== C L I E N T E S ========================================
+CLIENTE_LISTA = ()  # read_clientes.html sólo muestra columnas propias
+
+CLIENTE_DETALLE = (
+    selectinload(models.Cliente.reservas).joinedload(models.Reserva.mesa),
+    selectinload(models.Cliente.pedidos).joinedload(models.Pedido.combo),
+)
+
+#===================================== M E S A S ========================================
+MESA_LISTA = ()
+
+MESA_DETALLE = (
+    selectinload(models.Mesa.reservas).joinedload(models.Reserva.cliente),
+    selectinload(models.Mesa.pedidos).joinedload(models.Pedido.combo),
+)
+
+#===================================== R E S E R V A S ========================================
+RESERVA_DETALLE = (
+    joinedload(models.Reserva.cliente),
+    joinedload(models.Reserva.mesa),
+)
+
+#================================== P E D I D O S ========================================
+PEDIDO_LISTA = (
+    joinedload(models.Pedido.mesa),
+    joinedload(models.Pedido.combo),
+)
+
+# Pantalla de cocina: mesa_id (como el feed) y los ítems de los pedidos de varias líneas
+PEDIDO_COCINA = (
+    selectinload(models.Pedido.lineas),
+)
+
+PEDIDO_DETALLE = PEDIDO_LISTA + (
+    joinedload(models.Pedido.cliente),
+    selectinload(models.Pedido.lineas),
+    selectinload(models.Pedido.pagos).joinedload(models.Pago.metodo_pago),
+)
+
+
+LOAD_POLICIES = {
+    "clientes.lista": CLIENTE_LISTA,
+    "clientes.detalle": CLIENTE_DETALLE,
+    "mesas.lista": MESA_LISTA,
+    "mesas.detalle": MESA_DETALLE,
+    "reservas.detalle": RESERVA_DETALLE,
+    "pedidos.lista": PEDIDO_LISTA,
+    "pedidos.cocina": PEDIDO_COCINA,
+    "pedidos.detalle": PEDIDO_DETALLE,
+}
+
+
+def load_options(policy: str = None) -> tuple:
+    if policy is None:
+        return ()
+    try:
+        return LOAD_POLICIES[policy]
+    except KeyError:
+        raise ValueError(f"Política de carga desconocida: {policy}")
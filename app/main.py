@@ -1,33 +1,40 @@
-from fastapi import FastAPI, Request, Form, Depends, HTTPException
-from fastapi.responses import HTMLResponse
-from fastapi.staticfiles import StaticFiles
+import asyncio
+import logging
+import os
+from contextlib import asynccontextmanager
+from fastapi import APIRouter, FastAPI, Request
+from fastapi.responses import HTMLResponse, Response
 from fastapi.templating import Jinja2Templates
 from sqlalchemy.orm import Session
-from .database import engine, SessionLocal
+from .database import engine, async_engine, SessionLocal
 from . import models, crud, schemas
 from datetime import date
 from fastapi.responses import FileResponse
-from fastapi.responses import JSONResponse
-from app.endpoints import router
+from app.endpoints import router, api_router
+from app.ingest import pedido_ingestor
+from app.inventario import compactador
+from app import assets, metrics, migrations
 
 
 #from app.endpoints import router as endpoints_router
 #from app.endpoints import clientes_router, mesas_router, pedidos_router
 
-# Iniciar el server:  uvicorn app.main:app --reload
+# Iniciar el server:  uvicorn app.main:app --reload   (o  uvicorn app.main:create_app --factory)
 
 # detener el server: CTRL+C
 
-# Crear todas las tablas
-models.Base.metadata.create_all(bind=engine)
+# Importar este módulo no toca la base: el esquema lo manejan las migraciones versionadas
+# (python -m app.migrations upgrade). Al arrancar, el lifespan aplica las pendientes si
+# DB_MIGRATE_ON_STARTUP=1 (con la base al día es una sola consulta); si la base no responde
+# el worker arranca igual y lo deja en el log, sin caerse.
+DB_MIGRATE_ON_STARTUP = os.getenv("DB_MIGRATE_ON_STARTUP", "1").lower() in ("1", "true", "yes")
 
-app = FastAPI()
+logger = logging.getLogger(__name__)
 
 # Configuración de Jinja2Templates para usar la carpeta 'templates'
 templates = Jinja2Templates(directory="app/templates")
-
-# Montar la carpeta static para servir archivos estáticos
-app.mount("/static", StaticFiles(directory="app/static"), name="static")
+metrics.instrument_templates(templates)
+assets.registrar(templates)
 
 # Dependencia para obtener la sesión de base de datos
 def get_db():
@@ -37,20 +44,68 @@ def get_db():
     finally:
         db.close()
 
-#app.include_router(endpoints_router)
-app.include_router(router)
 
+# Cola de pedidos y compactación de inventario: arrancan con el server; la cola se vacía (flush)
+# antes de apagarse y después se cierran las conexiones de los pools
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if DB_MIGRATE_ON_STARTUP:
+        try:
+            aplicadas = await asyncio.to_thread(migrations.upgrade, engine)
+            if aplicadas:
+                logger.info("Migraciones aplicadas al arrancar: %s", aplicadas)
+        except Exception:
+            logger.exception("No se pudieron aplicar las migraciones al arrancar")
+    await pedido_ingestor.start()
+    await compactador.start()
+    try:
+        yield
+    finally:
+        await compactador.stop()
+        await pedido_ingestor.stop()
+        await async_engine.dispose()
+        engine.dispose()
+
+
+def create_app() -> FastAPI:
+    app = FastAPI(lifespan=lifespan)
+
+    # Métricas por request (queries, tiempo en la base, espera del pool, render) -> /metrics
+    metrics.instrument_engine(engine)
+    metrics.instrument_engine(async_engine)
+    app.add_middleware(metrics.MetricsMiddleware)
+
+    # Montar la carpeta static para servir archivos estáticos (con hash / precomprimidos: app/assets.py)
+    app.mount("/static", assets.AssetFiles(directory="app/static"), name="static")
+
+    #app.include_router(endpoints_router)
+    app.include_router(router)
+    app.include_router(api_router)  # JSON: /api/v1
+    app.include_router(base_router)
+    return app
 
-@app.get("/", response_class=HTMLResponse)
+
+base_router = APIRouter()
+
+
+@base_router.get("/", response_class=HTMLResponse)
 async def read_root(request: Request):
     return templates.TemplateResponse("index.html", {"request": request})
 
 
-@app.get("/test")
+@base_router.get("/metrics", include_in_schema=False)
+async def read_metrics():
+    return Response(metrics.render_metrics(), media_type=metrics.PROMETHEUS_CONTENT_TYPE)
+
+
+@base_router.get("/test")
 def test_endpoint():
     return {"message": "Server is working"}
 
 #============================ I C O N ======================================== 
-@app.get("/favicon.ico", include_in_schema=False)
+@base_router.get("/favicon.ico", include_in_schema=False)
 async def favicon():
-    return FileResponse("app/static/assets/favicon.ico")
+    return FileResponse("app/static/assets/favicon.ico", headers={"Cache-Control": "public, max-age=86400"})
+
+
+app = create_app()
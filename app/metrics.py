@@ -0,0 +1,231 @@
+import contextvars
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+
+from jinja2 import Template
+from sqlalchemy import event
+
+# Métricas por request para diagnosticar páginas lentas:
+# cantidad de queries, tiempo en la base, espera por una conexión del pool y tiempo de
+# renderizado de plantillas. Se acumulan en un RequestStats (contextvar) que abre el
+# middleware; los hooks de SQLAlchemy / pool / Jinja le suman lo suyo.
+# - /metrics expone histogramas en formato Prometheus (por proceso / worker).
+# - METRICS_SLOW_MS > 0 activa el log de requests lentos, con sus consultas SQL más lentas.
+
+logger = logging.getLogger("app.slow")
+
+METRICS_SLOW_MS = float(os.getenv("METRICS_SLOW_MS", "0"))      # 0 = log de lentos apagado
+METRICS_SLOW_SQL_MAX = int(os.getenv("METRICS_SLOW_SQL_MAX", "5"))  # consultas incluidas en el log
+SQL_MAX_LEN = 500
+
+BUCKETS_SEGUNDOS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BUCKETS_QUERIES = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250)
+
+
+class RequestStats:
+    __slots__ = ("queries", "db_time", "pool_wait", "render_time", "statements")
+
+    def __init__(self, capture_sql: bool = False):
+        self.queries = 0
+        self.db_time = 0.0
+        self.pool_wait = 0.0
+        self.render_time = 0.0
+        self.statements = [] if capture_sql else None
+
+
+_current = contextvars.ContextVar("request_stats", default=None)
+
+
+def current_stats():
+    return _current.get()
+
+
+#=================================== H I S T O G R A M A S ========================================
+class Histogram:
+    def __init__(self, name: str, help: str, buckets, labels=("method", "ruta")):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets)
+        self.labels = labels
+        self._lock = threading.Lock()
+        self._series = {}  # valores de labels -> [conteos por bucket..., suma, cantidad]
+
+    def observe(self, label_values, value: float):
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            serie = self._series.get(label_values)
+            if serie is None:
+                serie = self._series[label_values] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+            serie[i] += 1
+            serie[-2] += value
+            serie[-1] += 1
+
+    def expose(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted((k, list(v)) for k, v in self._series.items())
+        for label_values, serie in series:
+            labels = ",".join(f'{k}="{_escape(v)}"' for k, v in zip(self.labels, label_values))
+            acumulado = 0
+            for le, count in zip((*self.buckets, "+Inf"), serie):
+                acumulado += count
+                lines.append(f'{self.name}_bucket{{{labels},le="{le}"}} {acumulado}')
+            lines.append(f"{self.name}_sum{{{labels}}} {serie[-2]}")
+            lines.append(f"{self.name}_count{{{labels}}} {serie[-1]}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels=("method", "ruta", "status")):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def inc(self, label_values, amount: float = 1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def expose(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = sorted(self._values.items())
+        for label_values, value in values:
+            labels = ",".join(f'{k}="{_escape(v)}"' for k, v in zip(self.labels, label_values))
+            lines.append(f"{self.name}{{{labels}}} {value}")
+        return lines
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+REQUESTS = Counter("bodegon_requests_total", "Requests atendidos")
+DURACION = Histogram("bodegon_request_duration_seconds", "Duración total del request", BUCKETS_SEGUNDOS)
+QUERIES = Histogram("bodegon_request_queries", "Consultas SQL por request", BUCKETS_QUERIES)
+DB_TIEMPO = Histogram("bodegon_request_db_seconds", "Tiempo en la base por request", BUCKETS_SEGUNDOS)
+POOL_ESPERA = Histogram("bodegon_request_pool_wait_seconds", "Espera por conexiones del pool por request", BUCKETS_SEGUNDOS)
+RENDER = Histogram("bodegon_request_render_seconds", "Tiempo de renderizado de plantillas por request", BUCKETS_SEGUNDOS)
+METRICAS = (REQUESTS, DURACION, QUERIES, DB_TIEMPO, POOL_ESPERA, RENDER)
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def render_metrics() -> str:
+    return "\n".join(line for metrica in METRICAS for line in metrica.expose()) + "\n"
+
+
+#==================================== M I D D L E W A R E ========================================
+class MetricsMiddleware:
+    # ASGI puro (no BaseHTTPMiddleware): el request termina con el último chunk del body,
+    # así las respuestas en streaming cuentan las queries y el render hechos mientras se envían.
+    def __init__(self, app, slow_ms: float = METRICS_SLOW_MS):
+        self.app = app
+        self.slow_ms = slow_ms
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        stats = RequestStats(capture_sql=self.slow_ms > 0)
+        token = _current.set(stats)
+        inicio = time.perf_counter()
+        status = 500
+        terminado = False
+
+        def finalizar():
+            nonlocal terminado
+            if not terminado:
+                terminado = True
+                self.record(scope, status, time.perf_counter() - inicio, stats)
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                finalizar()
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            finalizar()
+            _current.reset(token)
+
+    def record(self, scope, status, duracion, stats):
+        route = scope.get("route")
+        ruta = getattr(route, "path", None) or "sin_ruta"  # plantilla de la ruta: no explota la cardinalidad
+        labels = (scope["method"], ruta)
+        REQUESTS.inc((*labels, str(status)))
+        DURACION.observe(labels, duracion)
+        QUERIES.observe(labels, stats.queries)
+        DB_TIEMPO.observe(labels, stats.db_time)
+        POOL_ESPERA.observe(labels, stats.pool_wait)
+        RENDER.observe(labels, stats.render_time)
+        if self.slow_ms > 0 and duracion * 1000 >= self.slow_ms:
+            lentas = sorted(stats.statements, reverse=True)[:METRICS_SLOW_SQL_MAX]
+            logger.warning(
+                "Request lento %s %s -> %s: %.1f ms (queries=%d, db=%.1f ms, pool=%.1f ms, render=%.1f ms)%s",
+                scope["method"], scope.get("path"), status, duracion * 1000, stats.queries,
+                stats.db_time * 1000, stats.pool_wait * 1000, stats.render_time * 1000,
+                "".join(f"\n    {t * 1000:.1f} ms  {sql}" for t, sql in lentas),
+            )
+
+
+#====================================== H O O K S ========================================
+def instrument_engine(engine):
+    # Acepta Engine o AsyncEngine (los eventos van sobre su sync_engine). Idempotente:
+    # create_app() se puede llamar más de una vez sobre los mismos engines.
+    engine = getattr(engine, "sync_engine", engine)
+    stats = getattr(engine.pool, "stats", None)  # pools Timed* de app/database.py
+    if stats is not None and record_pool_wait not in stats.listeners:
+        stats.listeners.append(record_pool_wait)
+    if not event.contains(engine, "before_cursor_execute", _antes):
+        event.listen(engine, "before_cursor_execute", _antes)
+        event.listen(engine, "after_cursor_execute", _despues)
+
+
+def _antes(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def _despues(conn, cursor, statement, parameters, context, executemany):
+    duracion = time.perf_counter() - conn.info["query_start"].pop()
+    stats = _current.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.db_time += duracion
+        if stats.statements is not None:
+            stats.statements.append((duracion, " ".join(statement.split())[:SQL_MAX_LEN]))
+
+
+def record_pool_wait(seconds: float):
+    stats = _current.get()
+    if stats is not None:
+        stats.pool_wait += seconds
+
+
+class TimedTemplate(Template):
+    # Template de Jinja que suma su tiempo de render al request en curso
+    def render(self, *args, **kwargs):
+        inicio = time.perf_counter()
+        try:
+            return super().render(*args, **kwargs)
+        finally:
+            add_render_time(time.perf_counter() - inicio)
+
+
+def add_render_time(seconds: float):
+    stats = _current.get()
+    if stats is not None:
+        stats.render_time += seconds
+
+
+def instrument_templates(templates):
+    # Jinja2Templates o Environment; hay que llamarlo antes de cargar plantillas
+    env = getattr(templates, "env", templates)
+    env.template_class = TimedTemplate
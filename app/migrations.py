@@ -0,0 +1,325 @@
+import argparse
+import logging
+import sys
+from datetime import datetime
+
+from sqlalchemy import (
+    VARCHAR, Boolean, Column, Date, DateTime, Float, ForeignKey, Index, Integer, MetaData, String, Table,
+    inspect, select, text,
+)
+from sqlalchemy.schema import CreateColumn
+
+from app.database import engine
+
+# Migraciones versionadas del esquema (reemplazan al create_all que corría al importar main).
+# La tabla schema_version registra las aplicadas; `upgrade` aplica en orden las pendientes,
+# cada una en su propia transacción (en MySQL el DDL confirma solo: por eso los pasos usan
+# helpers idempotentes y una migración cortada a la mitad se puede volver a correr).
+#
+#   python -m app.migrations status
+#   python -m app.migrations upgrade [--hasta N]
+#
+# Con varios workers conviene correr `upgrade` en el deploy y arrancar con DB_MIGRATE_ON_STARTUP=0.
+# Nueva migración: agregar una función al final de MIGRACIONES (no modificar las ya publicadas)
+# con sus tablas / columnas escritas en la migración, no tomadas de app.models.
+
+logger = logging.getLogger(__name__)
+
+_metadata = MetaData()
+schema_version = Table(
+    "schema_version", _metadata,
+    Column("version", Integer, primary_key=True, autoincrement=False),
+    Column("descripcion", String(250), nullable=False),
+    Column("aplicada", DateTime, nullable=False),
+)
+
+
+#==================================== H E L P E R S ========================================
+# Cada migración define sus tablas, columnas e índices tal como eran al publicarla (en una
+# MetaData propia), no desde app.models: si el modelo cambia, reaplicarla en una base nueva
+# sigue dando el mismo esquema y el cambio va en una migración nueva.
+def agregar_columna(conn, tabla: str, columna: Column):
+    # ALTER TABLE ... ADD COLUMN, si todavía no existe
+    if columna.name in {c["name"] for c in inspect(conn).get_columns(tabla)}:
+        return
+    Table(tabla, MetaData(), columna)
+    ddl = CreateColumn(columna).compile(dialect=conn.dialect)
+    conn.execute(text(f"ALTER TABLE {tabla} ADD COLUMN {ddl}"))
+
+
+def crear_indice(conn, indice: Index):
+    if indice.name in {i["name"] for i in inspect(conn).get_indexes(indice.table.name)}:
+        return
+    indice.create(conn)
+
+
+def crear_tablas(conn, *tablas: Table):
+    tablas[0].metadata.create_all(conn, tables=tablas, checkfirst=True)
+
+
+def referencia(metadata: MetaData, *tablas):
+    # Tablas de otras migraciones a las que apuntan las claves foráneas (no se crean acá)
+    return [Table(t, metadata, Column("id", Integer, primary_key=True)) for t in tablas]
+
+
+#================================== M I G R A C I O N E S ========================================
+def m001_tablas_iniciales(conn):
+    # Bases nuevas o creadas por el create_all anterior (el esquema de ese momento)
+    md = MetaData()
+    Table(
+        "clientes", md,
+        Column("id", Integer, primary_key=True, index=True),
+        Column("nombre", String(250), index=True),
+        # Era String sin largo; MySQL no crea un VARCHAR así (las bases viejas las arregla m002)
+        Column("apellido", String(250), index=True),
+        Column("email", String(250), unique=True, index=True),
+        Column("telefono", String(15), index=True),
+    )
+    Table(
+        "mesas", md,
+        Column("id", Integer, primary_key=True, index=True),
+        Column("numero_mesa", Integer, unique=True, index=True),
+        Column("capacidad", Integer),
+        Column("disponible", Boolean),
+        Column("ubicacion", String(250)),
+    )
+    Table(
+        "reservas", md,
+        Column("id", Integer, primary_key=True, index=True),
+        Column("cliente_id", Integer, ForeignKey("clientes.id")),
+        Column("mesa_id", Integer, ForeignKey("mesas.id")),
+        Column("fecha_reserva", DateTime),
+        Column("hora_reserva", String(10)),
+        Column("estado", String(50)),
+    )
+    Table(
+        "combos", md,
+        Column("id", Integer, primary_key=True, index=True),
+        Column("nombre_combo", String(250), index=True),
+        Column("descripcion", String(500)),
+        Column("precio", Float),
+    )
+    Table(
+        "pedidos", md,
+        Column("id", Integer, primary_key=True, index=True),
+        Column("cliente_id", Integer, ForeignKey("clientes.id")),
+        Column("mesa_id", Integer, ForeignKey("mesas.id")),
+        Column("combo_id", Integer, ForeignKey("combos.id")),
+        Column("fecha_pedido", DateTime),
+        Column("total_pedido", Float),
+    )
+    Table(
+        "metodos_pago", md,
+        Column("id", Integer, primary_key=True, index=True),
+        Column("tipo_metodo", String(50), index=True),
+    )
+    Table(
+        "pagos", md,
+        Column("id", Integer, primary_key=True, index=True),
+        Column("pedido_id", Integer, ForeignKey("pedidos.id")),
+        Column("metodo_pago_id", Integer, ForeignKey("metodos_pago.id")),
+        Column("monto", Float),
+        Column("fecha_pago", DateTime),
+    )
+    Table(
+        "empleados", md,
+        Column("id", Integer, primary_key=True, index=True),
+        Column("nombre", String(250), index=True),
+        Column("puesto", String(100)),
+        Column("email", String(250), unique=True, index=True),
+        Column("telefono", String(15), index=True),
+    )
+    Table(
+        "proveedores", md,
+        Column("id", Integer, primary_key=True, index=True),
+        Column("nombre", String(250), index=True),
+        Column("contacto", String(250)),
+        Column("telefono", String(15)),
+        Column("email", String(250), unique=True, index=True),
+        Column("direccion", String(500)),
+    )
+    Table(
+        "inventario", md,
+        Column("id", Integer, primary_key=True, index=True),
+        Column("producto", String(250)),
+        Column("cantidad", Integer),
+        Column("proveedor_id", Integer, ForeignKey("proveedores.id")),
+    )
+    crear_tablas(conn, *md.sorted_tables)
+
+
+def m002_columnas_nuevas(conn):
+    for tabla, columna in (
+        ("clientes", Column("version", Integer, nullable=False, server_default="1")),
+        ("mesas", Column("version", Integer, nullable=False, server_default="1")),
+        ("pedidos", Column("version", Integer, nullable=False, server_default="1")),
+        ("pedidos", Column("producto", String(250))),
+        ("pedidos", Column("cantidad", Integer)),
+        ("reservas", Column("inicio", DateTime)),
+        ("reservas", Column("fin", DateTime)),
+        ("inventario", Column("stock_minimo", Integer, nullable=False, server_default="0")),
+    ):
+        agregar_columna(conn, tabla, columna)
+    if conn.dialect.name == "mysql":
+        # apellido era VARCHAR sin largo (o TEXT): MySQL no lo puede indexar
+        apellido = next(c for c in inspect(conn).get_columns("clientes") if c["name"] == "apellido")
+        if not (isinstance(apellido["type"], VARCHAR) and apellido["type"].length == 250):
+            conn.execute(text("ALTER TABLE clientes MODIFY apellido VARCHAR(250)"))
+    md = MetaData()
+    clientes = Table("clientes", md, Column("apellido", String(250)))
+    pedidos = Table("pedidos", md, Column("id", Integer), Column("fecha_pedido", DateTime))
+    reservas = Table("reservas", md, Column("mesa_id", Integer), Column("inicio", DateTime))
+    inventario = Table("inventario", md, Column("producto", String(250)))
+    for indice in (
+        Index("ix_clientes_apellido", clientes.c.apellido),
+        Index("ix_pedidos_fecha_pedido_id", pedidos.c.fecha_pedido, pedidos.c.id),
+        Index("ix_reservas_mesa_id_inicio", reservas.c.mesa_id, reservas.c.inicio),
+        Index("ix_inventario_producto", inventario.c.producto),
+    ):
+        crear_indice(conn, indice)
+
+
+def m003_tablas_derivadas(conn):
+    # Se llenan con: python -m app.rollups rebuild / python -m app.busqueda reindexar
+    md = MetaData()
+    referencia(md, "inventario", "pedidos")
+    resumen = Table(
+        "ventas_resumen", md,
+        Column("fecha", Date, primary_key=True),
+        Column("hora", Integer, primary_key=True, autoincrement=False),
+        Column("mesa_id", Integer, primary_key=True, autoincrement=False),
+        Column("combo_id", Integer, primary_key=True, autoincrement=False),
+        Column("pedidos", Integer, nullable=False),
+        Column("total_pedidos", Float, nullable=False),
+        Column("pagos", Integer, nullable=False),
+        Column("total_pagos", Float, nullable=False),
+    )
+    movimientos = Table(
+        "movimientos_inventario", md,
+        Column("id", Integer, primary_key=True),
+        Column("inventario_id", Integer, ForeignKey("inventario.id"), nullable=False),
+        Column("cantidad", Integer, nullable=False),
+        Column("motivo", String(50), nullable=False),
+        Column("pedido_id", Integer, ForeignKey("pedidos.id")),
+        Column("fecha", DateTime),
+    )
+    Index("ix_movimientos_inventario_item_id", movimientos.c.inventario_id, movimientos.c.id)
+    busqueda = Table(
+        "clientes_busqueda", md,
+        Column("token", String(100), primary_key=True),
+        Column("cliente_id", Integer, primary_key=True, autoincrement=False),
+    )
+    Index("ix_clientes_busqueda_cliente_id", busqueda.c.cliente_id)
+    crear_tablas(conn, resumen, movimientos, busqueda)
+
+
+def m004_intervalos_reservas(conn):
+    from app.availability import reserva_interval
+
+    tabla = Table(
+        "reservas", MetaData(),
+        Column("id", Integer, primary_key=True),
+        Column("fecha_reserva", DateTime),
+        Column("hora_reserva", String(10)),
+        Column("inicio", DateTime),
+        Column("fin", DateTime),
+    )
+    rows = conn.execute(
+        select(tabla.c.id, tabla.c.fecha_reserva, tabla.c.hora_reserva)
+        .where(tabla.c.inicio.is_(None), tabla.c.fecha_reserva.is_not(None))
+    ).all()
+    for reserva_id, fecha_reserva, hora_reserva in rows:
+        inicio, fin = reserva_interval(fecha_reserva, hora_reserva)
+        conn.execute(tabla.update().where(tabla.c.id == reserva_id).values(inicio=inicio, fin=fin))
+
+
+def m005_lineas_pedido(conn):
+    md = MetaData()
+    referencia(md, "pedidos", "combos")
+    lineas = Table(
+        "pedido_lineas", md,
+        Column("id", Integer, primary_key=True),
+        Column("pedido_id", Integer, ForeignKey("pedidos.id"), nullable=False),
+        Column("combo_id", Integer, ForeignKey("combos.id")),
+        Column("producto", String(250)),
+        Column("cantidad", Integer, nullable=False),
+        Column("precio_unitario", Float, nullable=False),
+    )
+    Index("ix_pedido_lineas_pedido_id", lineas.c.pedido_id, lineas.c.id)
+    crear_tablas(conn, lineas)
+
+
+def m006_indices_pagos(conn):
+    pagos = Table("pagos", MetaData(), Column("pedido_id", Integer), Column("fecha_pago", DateTime))
+    for indice in (Index("ix_pagos_pedido_id", pagos.c.pedido_id), Index("ix_pagos_fecha_pago", pagos.c.fecha_pago)):
+        crear_indice(conn, indice)
+
+
+MIGRACIONES = [
+    (1, "Tablas iniciales", m001_tablas_iniciales),
+    (2, "Columnas de versión, pedidos, reservas e inventario", m002_columnas_nuevas),
+    (3, "Resumen de ventas, movimientos de inventario e índice de búsqueda", m003_tablas_derivadas),
+    (4, "Inicio / fin de reservas existentes", m004_intervalos_reservas),
+    (5, "Líneas de pedido", m005_lineas_pedido),
+    (6, "Índices de pagos por pedido y fecha", m006_indices_pagos),
+]
+VERSION_ACTUAL = MIGRACIONES[-1][0]
+
+
+#====================================== R U N N E R ========================================
+def aplicadas(conn) -> set:
+    if not inspect(conn).has_table("schema_version"):
+        return set()
+    return set(conn.execute(select(schema_version.c.version)).scalars())
+
+
+def upgrade(bind=engine, hasta: int = None):
+    # Devuelve las versiones aplicadas en esta llamada (lista vacía si ya estaba al día)
+    with bind.connect() as conn:
+        if conn.dialect.name == "mysql":
+            # Un solo worker migra a la vez; los demás esperan y después no encuentran pendientes
+            conn.execute(text("SELECT GET_LOCK('bodegon_migraciones', 60)"))
+        try:
+            hechas = aplicadas(conn)
+            conn.commit()
+            pendientes = [m for m in MIGRACIONES if m[0] not in hechas and (hasta is None or m[0] <= hasta)]
+            if pendientes:
+                _metadata.create_all(conn)
+                conn.commit()
+            for version, descripcion, migracion in pendientes:
+                logger.info("Aplicando migración %d: %s", version, descripcion)
+                with conn.begin():
+                    migracion(conn)
+                    conn.execute(schema_version.insert().values(
+                        version=version, descripcion=descripcion, aplicada=datetime.utcnow()))
+            return [m[0] for m in pendientes]
+        finally:
+            if conn.dialect.name == "mysql":
+                conn.execute(text("SELECT RELEASE_LOCK('bodegon_migraciones')"))
+
+
+def status(bind=engine):
+    with bind.connect() as conn:
+        hechas = aplicadas(conn)
+    return [(version, descripcion, version in hechas) for version, descripcion, _ in MIGRACIONES]
+
+
+#==================================== C O N S O L A ========================================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Migraciones del esquema")
+    parser.add_argument("accion", choices=["upgrade", "status"])
+    parser.add_argument("--hasta", type=int, help="versión máxima a aplicar")
+    args = parser.parse_args(argv)
+
+    if args.accion == "status":
+        for version, descripcion, hecha in status():
+            print(f"{version:>4}  {'aplicada ' if hecha else 'pendiente'}  {descripcion}")
+        return 0
+    logging.basicConfig(level=logging.INFO)
+    aplicadas_ahora = upgrade(hasta=args.hasta)
+    print(f"{len(aplicadas_ahora)} migraciones aplicadas" if aplicadas_ahora else "El esquema está al día")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
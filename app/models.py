@@ -1,245 +1,182 @@
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, DateTime, Float
+from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, Date, DateTime, Float, Index, select
 from sqlalchemy.orm import relationship, declarative_base, Session
 from datetime import datetime
-from .database import Base
+from .database import Base, unit_of_work, on_commit
+from .pagination import keyset_select, build_page
+from .cache import combos_cache, touch, read_through, snapshot
 
 
+#==================================== P A G I N A C I O N ========================================
+class PaginacionMixin:
+    # Columnas (indexadas) que definen el orden de la paginación por cursor
+    __keyset__ = ("id",)
+
+    @classmethod
+    def keyset_columns(cls):
+        return [getattr(cls, name) for name in cls.__keyset__]
 
-#==================================== C L I E N T E S ========================================
-class Cliente(Base):
-    __tablename__ = 'clientes'
-    id = Column(Integer, primary_key=True, index=True)
-    nombre = Column(String(250), index=True)
-    apellido = Column(String, index=True)
-    email = Column(String(250), unique=True, index=True)
-    telefono = Column(String(15), index=True)
-    reservas = relationship("Reserva", back_populates="cliente")
-    pedidos = relationship("Pedido", back_populates="cliente")
-    
-    # Métodos CRUD
+    @classmethod
+    def read_page(cls, session: Session, cursor: str = None, limit: int = 10, options=()):
+        columns = cls.keyset_columns()
+        stmt, direction = keyset_select(cls, columns, cursor, limit, stmt=select(cls).options(*options))
+        rows = session.execute(stmt).scalars().all()
+        return build_page(rows, columns, cursor, direction, limit)
+
+
+#==================================== C R U D ========================================
+class CRUDMixin(PaginacionMixin):
+    # Métodos CRUD compartidos. Cada llamada es una unidad de trabajo propia
+    # (un solo commit, sin refresh); dentro de `with unit_of_work(session):`
+    # se suman a la transacción del bloque y se confirman todas juntas al salir.
     @classmethod
     def create(cls, session: Session, **kwargs):
-        new_cliente = cls(**kwargs)
-        session.add(new_cliente)
-        session.commit()
-        session.refresh(new_cliente)
-        return new_cliente
+        new_obj = cls(**kwargs)
+        with unit_of_work(session):
+            session.add(new_obj)
+            on_commit(session, cls.mark_changed)
+        return new_obj
 
     @classmethod
-    def read(cls, session: Session, cliente_id: int):
-        return session.query(cls).filter(cls.id == cliente_id).first()
+    def read(cls, session: Session, obj_id: int):
+        return session.get(cls, obj_id)
 
     @classmethod
     def read_all(cls, session: Session, skip: int = 0, limit: int = 10):
         return session.query(cls).offset(skip).limit(limit).all()
 
     def update(self, session: Session, **kwargs):
-        for attr, value in kwargs.items():
-            setattr(self, attr, value)
-        session.commit()
-        session.refresh(self)
+        with unit_of_work(session):
+            for attr, value in kwargs.items():
+                setattr(self, attr, value)
+            on_commit(session, self.mark_changed)
         return self
 
     def delete(self, session: Session):
-        session.delete(self)
-        session.commit() 
+        with unit_of_work(session):
+            session.delete(self)
+            on_commit(session, self.mark_changed)
+
+    @classmethod
+    def mark_changed(cls):
+        # Versión de datos de la tabla (y caché asociada, si tiene)
+        touch(cls.__tablename__)
+
+
+#==================================== C L I E N T E S ========================================
+class Cliente(CRUDMixin, Base):
+    __tablename__ = 'clientes'
+    id = Column(Integer, primary_key=True, index=True)
+    nombre = Column(String(250), index=True)
+    apellido = Column(String(250), index=True)
+    email = Column(String(250), unique=True, index=True)
+    telefono = Column(String(15), index=True)
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+    reservas = relationship("Reserva", back_populates="cliente")
+    pedidos = relationship("Pedido", back_populates="cliente")
+    __mapper_args__ = {"version_id_col": version}
+
+class ClienteBusqueda(Base):
+    # Índice de búsqueda por prefijo (lo mantiene app/busqueda.py): una fila por palabra
+    # normalizada (minúsculas, sin acentos) de nombre, apellido, email y teléfono.
+    __tablename__ = 'clientes_busqueda'
+    __table_args__ = (Index("ix_clientes_busqueda_cliente_id", "cliente_id"),)
+    token = Column(String(100), primary_key=True)
+    cliente_id = Column(Integer, primary_key=True, autoincrement=False)
 
 #===================================== M E S A S ========================================
-class Mesa(Base):
+class Mesa(CRUDMixin, Base):
     __tablename__ = 'mesas'
     id = Column(Integer, primary_key=True, index=True)
     numero_mesa = Column(Integer, unique=True, index=True)
     capacidad = Column(Integer)
     disponible = Column(Boolean, default=True)
     ubicacion = Column(String(250))
+    version = Column(Integer, nullable=False, default=1, server_default="1")
     reservas = relationship("Reserva", back_populates="mesa")
     pedidos = relationship("Pedido", back_populates="mesa")
-    
-    # Métodos CRUD
-    @classmethod
-    def create(cls, session: Session, **kwargs):
-        new_mesa = cls(**kwargs)
-        session.add(new_mesa)
-        session.commit()
-        session.refresh(new_mesa)
-        return new_mesa
-
-    @classmethod
-    def read(cls, session: Session, mesa_id: int):
-        return session.query(cls).filter(cls.id == mesa_id).first()
-
-    @classmethod
-    def read_all(cls, session: Session, skip: int = 0, limit: int = 10):
-        return session.query(cls).offset(skip).limit(limit).all()
-
-    def update(self, session: Session, **kwargs):
-        for attr, value in kwargs.items():
-            setattr(self, attr, value)
-        session.commit()
-        session.refresh(self)
-        return self
-
-    def delete(self, session: Session):
-        session.delete(self)
-        session.commit()
+    __mapper_args__ = {"version_id_col": version}
 
 #===================================== R E S E R V A S ========================================
-class Reserva(Base):
+class Reserva(CRUDMixin, Base):
     __tablename__ = 'reservas'
+    # Control de superposición: "mesa_id = :m AND inicio < :fin AND fin > :inicio" por índice
+    __table_args__ = (Index("ix_reservas_mesa_id_inicio", "mesa_id", "inicio"),)
     id = Column(Integer, primary_key=True, index=True)
     cliente_id = Column(Integer, ForeignKey('clientes.id'))
     mesa_id = Column(Integer, ForeignKey('mesas.id'))
     fecha_reserva = Column(DateTime, default=datetime.utcnow)
     hora_reserva = Column(String(10))
+    # Intervalo ocupado; si no se indica se calcula de fecha_reserva / hora_reserva (app/reservas.py)
+    inicio = Column(DateTime)
+    fin = Column(DateTime)
     estado = Column(String(50), default="pendiente")
     cliente = relationship("Cliente", back_populates="reservas")
     mesa = relationship("Mesa", back_populates="reservas")
-    
-    # Métodos CRUD
-    @classmethod
-    def create(cls, session: Session, **kwargs):
-        new_reserva = cls(**kwargs)
-        session.add(new_reserva)
-        session.commit()
-        session.refresh(new_reserva)
-        return new_reserva
-
-    @classmethod
-    def read(cls, session: Session, reserva_id: int):
-        return session.query(cls).filter(cls.id == reserva_id).first()
-
-    @classmethod
-    def read_all(cls, session: Session, skip: int = 0, limit: int = 10):
-        return session.query(cls).offset(skip).limit(limit).all()
-
-    def update(self, session: Session, **kwargs):
-        for attr, value in kwargs.items():
-            setattr(self, attr, value)
-        session.commit()
-        session.refresh(self)
-        return self
-
-    def delete(self, session: Session):
-        session.delete(self)
-        session.commit()
 
 #====================================== C O M B O S ========================================
-class Combo(Base):
+class Combo(CRUDMixin, Base):
     __tablename__ = 'combos'
     id = Column(Integer, primary_key=True, index=True)
     nombre_combo = Column(String(250), index=True)
     descripcion = Column(String(500))
     precio = Column(Float)
     pedidos = relationship("Pedido", back_populates="combo")
-    
-    # Métodos CRUD
-    @classmethod
-    def create(cls, session: Session, **kwargs):
-        new_combo = cls(**kwargs)
-        session.add(new_combo)
-        session.commit()
-        session.refresh(new_combo)
-        return new_combo
-
-    @classmethod
-    def read(cls, session: Session, obj_id: int):
-        return session.query(cls).filter(cls.id == obj_id).first()
 
+    # El menú se lee desde la caché: devuelve copias de sólo lectura (fuera de la sesión)
     @classmethod
     def read_all(cls, session: Session, skip: int = 0, limit: int = 10):
-        return session.query(cls).offset(skip).limit(limit).all()
-
-    def update(self, session: Session, **kwargs):
-        for attr, value in kwargs.items():
-            setattr(self, attr, value)
-        session.commit()
-        session.refresh(self)
-        return self
-
-    def delete(self, session: Session):
-        session.delete(self)
-        session.commit()
+        return read_through(
+            combos_cache, ("all", skip, limit),
+            lambda: [snapshot(c) for c in session.query(cls).offset(skip).limit(limit).all()],
+        )
 
 #================================== P E D I D O S ========================================
-class Pedido(Base):
+class Pedido(CRUDMixin, Base):
     __tablename__ = 'pedidos'
+    __table_args__ = (Index("ix_pedidos_fecha_pedido_id", "fecha_pedido", "id"),)
+    __keyset__ = ("fecha_pedido", "id")
     id = Column(Integer, primary_key=True, index=True)
     cliente_id = Column(Integer, ForeignKey('clientes.id'))
     mesa_id = Column(Integer, ForeignKey('mesas.id'))
     combo_id = Column(Integer, ForeignKey('combos.id'))
+    producto = Column(String(250))
+    cantidad = Column(Integer, default=1)
     fecha_pedido = Column(DateTime, default=datetime.utcnow)
     total_pedido = Column(Float)
+    version = Column(Integer, nullable=False, default=1, server_default="1")
     cliente = relationship("Cliente", back_populates="pedidos")
     mesa = relationship("Mesa", back_populates="pedidos")
     combo = relationship("Combo", back_populates="pedidos")
     pagos = relationship("Pago", back_populates="pedido")
-    
-    # Métodos CRUD
-    @classmethod
-    def create(cls, session: Session, **kwargs):
-        new_pedido = cls(**kwargs)
-        session.add(new_pedido)
-        session.commit()
-        session.refresh(new_pedido)
-        return new_pedido
-
-    @classmethod
-    def read(cls, session: Session, pedido_id: int):
-        return session.query(cls).filter(cls.id == pedido_id).first()
-
-    @classmethod
-    def read_all(cls, session: Session, skip: int = 0, limit: int = 10):
-        return session.query(cls).offset(skip).limit(limit).all()
-
-    def update(self, session: Session, **kwargs):
-        for attr, value in kwargs.items():
-            setattr(self, attr, value)
-        session.commit()
-        session.refresh(self)
-        return self
-
-    def delete(self, session: Session):
-        session.delete(self)
-        session.commit()
+    lineas = relationship("PedidoLinea", back_populates="pedido", order_by="PedidoLinea.id")
+    __mapper_args__ = {"version_id_col": version}
+
+class PedidoLinea(Base):
+    # Ítems de un pedido con varias líneas (los escribe app/lineas.py). precio_unitario es
+    # una copia de Combo.precio al momento de pedir: cambiar el menú no cambia lo ya pedido.
+    # Pedido.total_pedido es la suma de cantidad * precio_unitario de sus líneas.
+    __tablename__ = 'pedido_lineas'
+    __table_args__ = (Index("ix_pedido_lineas_pedido_id", "pedido_id", "id"),)
+    id = Column(Integer, primary_key=True)
+    pedido_id = Column(Integer, ForeignKey('pedidos.id'), nullable=False)
+    combo_id = Column(Integer, ForeignKey('combos.id'))
+    producto = Column(String(250))
+    cantidad = Column(Integer, nullable=False, default=1)
+    precio_unitario = Column(Float, nullable=False, default=0)
+    pedido = relationship("Pedido", back_populates="lineas")
 
 #============================== METODOS PAGO ========================================
-class MetodoPago(Base):
+class MetodoPago(CRUDMixin, Base):
     __tablename__ = 'metodos_pago'
     id = Column(Integer, primary_key=True, index=True)
     tipo_metodo = Column(String(50), index=True)
     pagos = relationship("Pago", back_populates="metodo_pago")
-    
-    # Métodos CRUD
-    @classmethod
-    def create(cls, session: Session, **kwargs):
-        new_metodo_pago = cls(**kwargs)
-        session.add(new_metodo_pago)
-        session.commit()
-        session.refresh(new_metodo_pago)
-        return new_metodo_pago
-
-    @classmethod
-    def read(cls, session: Session, obj_id: int):
-        return session.query(cls).filter(cls.id == obj_id).first()
-
-    @classmethod
-    def read_all(cls, session: Session, skip: int = 0, limit: int = 10):
-        return session.query(cls).offset(skip).limit(limit).all()
-
-    def update(self, session: Session, **kwargs):
-        for attr, value in kwargs.items():
-            setattr(self, attr, value)
-        session.commit()
-        session.refresh(self)
-        return self
-
-    def delete(self, session: Session):
-        session.delete(self)
-        session.commit()
 
 #=================================== P A G O S ========================================
-class Pago(Base):
+class Pago(CRUDMixin, Base):
     __tablename__ = 'pagos'
+    # La conciliación agrupa pagos por pedido y por fecha (app/conciliacion.py)
+    __table_args__ = (Index("ix_pagos_pedido_id", "pedido_id"), Index("ix_pagos_fecha_pago", "fecha_pago"))
     id = Column(Integer, primary_key=True, index=True)
     pedido_id = Column(Integer, ForeignKey('pedidos.id'))
     metodo_pago_id = Column(Integer, ForeignKey('metodos_pago.id'))
@@ -247,74 +184,32 @@ class Pago(Base):
     fecha_pago = Column(DateTime, default=datetime.utcnow)
     pedido = relationship("Pedido", back_populates="pagos")
     metodo_pago = relationship("MetodoPago", back_populates="pagos")
-    
-    # Métodos CRUD
-    @classmethod
-    def create(cls, session: Session, **kwargs):
-        new_pago = cls(**kwargs)
-        session.add(new_pago)
-        session.commit()
-        session.refresh(new_pago)
-        return new_pago
-
-    @classmethod
-    def read(cls, session: Session, obj_id: int):
-        return session.query(cls).filter(cls.id == obj_id).first()
-
-    @classmethod
-    def read_all(cls, session: Session, skip: int = 0, limit: int = 10):
-        return session.query(cls).offset(skip).limit(limit).all()
 
-    def update(self, session: Session, **kwargs):
-        for attr, value in kwargs.items():
-            setattr(self, attr, value)
-        session.commit()
-        session.refresh(self)
-        return self
-
-    def delete(self, session: Session):
-        session.delete(self)
-        session.commit()
+#========================= R E S U M E N   D E   V E N T A S ====================================
+class VentaResumen(Base):
+    # Acumulado por hora, mesa y combo (lo mantiene app/rollups.py). Los reportes leen
+    # sólo esta tabla. Sin mesa / sin combo se guarda 0 (NULL no sirve en la clave).
+    __tablename__ = 'ventas_resumen'
+    fecha = Column(Date, primary_key=True)
+    hora = Column(Integer, primary_key=True, autoincrement=False)
+    mesa_id = Column(Integer, primary_key=True, autoincrement=False)
+    combo_id = Column(Integer, primary_key=True, autoincrement=False)
+    pedidos = Column(Integer, nullable=False, default=0)
+    total_pedidos = Column(Float, nullable=False, default=0)
+    pagos = Column(Integer, nullable=False, default=0)
+    total_pagos = Column(Float, nullable=False, default=0)
 
 #=========================== E M P L E A D O S ========================================
-class Empleado(Base):
+class Empleado(CRUDMixin, Base):
     __tablename__ = 'empleados'
     id = Column(Integer, primary_key=True, index=True)
     nombre = Column(String(250), index=True)
     puesto = Column(String(100))
     email = Column(String(250), unique=True, index=True)
     telefono = Column(String(15), index=True)
-    
-    # Métodos CRUD
-    @classmethod
-    def create(cls, session: Session, **kwargs):
-        new_empleado = cls(**kwargs)
-        session.add(new_empleado)
-        session.commit()
-        session.refresh(new_empleado)
-        return new_empleado
-
-    @classmethod
-    def read(cls, session: Session, obj_id: int):
-        return session.query(cls).filter(cls.id == obj_id).first()
-
-    @classmethod
-    def read_all(cls, session: Session, skip: int = 0, limit: int = 10):
-        return session.query(cls).offset(skip).limit(limit).all()
-
-    def update(self, session: Session, **kwargs):
-        for attr, value in kwargs.items():
-            setattr(self, attr, value)
-        session.commit()
-        session.refresh(self)
-        return self
-
-    def delete(self, session: Session):
-        session.delete(self)
-        session.commit()
 
 #============================= P R O V E E D O R E S ========================================
-class Proveedor(Base):
+class Proveedor(CRUDMixin, Base):
     __tablename__ = 'proveedores'
     id = Column(Integer, primary_key=True, index=True)
     nombre = Column(String(250), index=True)
@@ -323,70 +218,35 @@ class Proveedor(Base):
     email = Column(String(250), unique=True, index=True)
     direccion = Column(String(500))
     inventario = relationship("Inventario", back_populates="proveedor")
-    
-    # Métodos CRUD
-    @classmethod
-    def create(cls, session: Session, **kwargs):
-        new_proveedor = cls(**kwargs)
-        session.add(new_proveedor)
-        session.commit()
-        session.refresh(new_proveedor)
-        return new_proveedor
-
-    @classmethod
-    def read(cls, session: Session, proveedor_id: int):
-        return session.query(cls).filter(cls.id == proveedor_id).first()
-
-    @classmethod
-    def read_all(cls, session: Session, skip: int = 0, limit: int = 10):
-        return session.query(cls).offset(skip).limit(limit).all()
-
-    def update(self, session: Session, **kwargs):
-        for attr, value in kwargs.items():
-            setattr(self, attr, value)
-        session.commit()
-        session.refresh(self)
-        return self
-
-    def delete(self, session: Session):
-        session.delete(self)
-        session.commit()
 
 #=================================== I N V E N T A R I O ========================================
-class Inventario(Base):
+class Inventario(CRUDMixin, Base):
     __tablename__ = 'inventario'
     id = Column(Integer, primary_key=True, index=True)
-    producto = Column(String(250))
+    producto = Column(String(250), index=True)
     cantidad = Column(Integer)
+    stock_minimo = Column(Integer, nullable=False, default=0, server_default="0")
     proveedor_id = Column(Integer, ForeignKey('proveedores.id'))
     proveedor = relationship("Proveedor", back_populates="inventario")
-    
-    # Métodos CRUD
-    @classmethod
-    def create(cls, session: Session, **kwargs):
-        new_inventario = cls(**kwargs)
-        session.add(new_inventario)
-        session.commit()
-        session.refresh(new_inventario)
-        return new_inventario
-
-    @classmethod
-    def read(cls, session: Session, inventario_id: int):
-        return session.query(cls).filter(cls.id == inventario_id).first()
-
-    @classmethod
-    def read_all(cls, session: Session, skip: int = 0, limit: int = 10):
-        return session.query(cls).offset(skip).limit(limit).all()
+    movimientos = relationship("MovimientoInventario", back_populates="inventario")
+
+class MovimientoInventario(Base):
+    # Libro de movimientos de stock (lo escribe app/inventario.py). Inventario.cantidad es
+    # el saldo; los movimientos viejos de un producto se compactan en una sola fila.
+    __tablename__ = 'movimientos_inventario'
+    __table_args__ = (Index("ix_movimientos_inventario_item_id", "inventario_id", "id"),)
+    id = Column(Integer, primary_key=True)
+    inventario_id = Column(Integer, ForeignKey('inventario.id'), nullable=False)
+    cantidad = Column(Integer, nullable=False)  # negativo = salida
+    motivo = Column(String(50), nullable=False)
+    pedido_id = Column(Integer, ForeignKey('pedidos.id'))
+    fecha = Column(DateTime, default=datetime.utcnow)
+    inventario = relationship("Inventario", back_populates="movimientos")
 
-    def update(self, session: Session, **kwargs):
-        for attr, value in kwargs.items():
-            setattr(self, attr, value)
-        session.commit()
-        session.refresh(self)
-        return self
+#========================= S I N C R O N I Z A C I O N ========================================
+# Stock, resumen de ventas e índice de búsqueda se mantienen con eventos de Session: se
+# registran junto con los modelos, así cualquier escritura por el ORM (crud, crud_async,
+# Model.create, scripts) los actualiza aunque no se haya importado la API.
+from app import busqueda, inventario, rollups  # noqa: E402,F401
 
-    def delete(self, session: Session):
-        session.delete(self)
-        session.commit()
-        
 #---------------------- U S U A R I O ----------------------------------------------
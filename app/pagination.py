@@ -0,0 +1,90 @@
+import base64
+import json
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, List, Optional
+
+from sqlalchemy import select, tuple_
+
+# Paginación por cursor (keyset): en lugar de OFFSET, cada página arranca
+# a partir de la clave de la última fila vista, usando el índice.
+
+@dataclass
+class Page:
+    items: List[Any] = field(default_factory=list)
+    next_cursor: Optional[str] = None
+    prev_cursor: Optional[str] = None
+
+
+def encode_cursor(values: list, direction: str = "next") -> str:
+    payload = [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    raw = json.dumps({"k": payload, "d": direction}, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _key_value(value, col):
+    # Las fechas viajan como ISO; el resto tiene que ser del tipo de la columna
+    # (un cursor armado a mano no puede mandar listas u objetos a la consulta)
+    python_type = col.type.python_type
+    if value is None:
+        return None
+    if python_type is datetime:
+        return datetime.fromisoformat(value)
+    if not isinstance(value, python_type) or (isinstance(value, bool) and python_type is not bool):
+        raise TypeError(value)
+    return value
+
+
+def decode_cursor(cursor: str, key_columns) -> tuple:
+    # Cualquier cursor mal formado lanza ValueError (los endpoints responden 400)
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        data = json.loads(raw)
+        values = data["k"]
+        direction = data.get("d", "next")
+        if not isinstance(values, list) or len(values) != len(key_columns) or direction not in ("next", "prev"):
+            raise ValueError(values)
+        values = [_key_value(v, col) for v, col in zip(values, key_columns)]
+    except (ValueError, KeyError, TypeError, AttributeError):
+        raise ValueError("Cursor inválido")
+    return values, direction
+
+
+def keyset_select(model, key_columns, cursor: Optional[str] = None, limit: int = 10, stmt=None):
+    # Devuelve (sentencia, dirección). Se pide limit + 1 filas para saber si hay otra página.
+    stmt = stmt if stmt is not None else select(model)
+    direction = "next"
+    if cursor:
+        values, direction = decode_cursor(cursor, key_columns)
+        key, bound = tuple_(*key_columns), tuple_(*values)
+        stmt = stmt.where(key > bound if direction == "next" else key < bound)
+    if direction == "next":
+        stmt = stmt.order_by(*[col.asc() for col in key_columns])
+    else:
+        stmt = stmt.order_by(*[col.desc() for col in key_columns])
+    return stmt.limit(limit + 1), direction
+
+
+def build_page(rows, key_columns, cursor: Optional[str], direction: str, limit: int) -> Page:
+    rows = list(rows)
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if direction == "prev":
+        rows.reverse()
+    if not rows:
+        return Page()
+
+    def key_of(row):
+        return [getattr(row, col.key) for col in key_columns]
+
+    page = Page(items=rows)
+    if direction == "next":
+        if has_more:
+            page.next_cursor = encode_cursor(key_of(rows[-1]), "next")
+        if cursor:
+            page.prev_cursor = encode_cursor(key_of(rows[0]), "prev")
+    else:
+        page.next_cursor = encode_cursor(key_of(rows[-1]), "next")
+        if has_more:
+            page.prev_cursor = encode_cursor(key_of(rows[0]), "prev")
+    return page
@@ -0,0 +1,73 @@
+import os
+import time
+
+from fastapi.responses import StreamingResponse
+from jinja2 import Environment, FileSystemLoader, select_autoescape
+
+from app.cache import data_versions, fragment_cache
+from app.database import AsyncSessionLocal
+from app.metrics import add_render_time
+from app.assets import registrar
+
+# Renderizado en streaming para listados grandes.
+# Las plantillas de listado se dividen en tres bloques:
+#   cabecera -> estructura fija de la página (se cachea por plantilla + versión de datos)
+#   fila     -> una fila de la tabla (bloque "scoped" dentro del for)
+#   pie      -> cierre de la tabla, formularios y scripts (también cacheado)
+# Renderizadas de forma normal (Jinja2Templates) producen la página completa; en modo
+# streaming se envía la cabecera enseguida y las filas a medida que llegan del cursor.
+
+TEMPLATES_DIR = "app/templates"
+STREAM_YIELD_PER = int(os.getenv("STREAM_YIELD_PER", "500"))   # filas por fetch del cursor
+STREAM_FLUSH_ROWS = int(os.getenv("STREAM_FLUSH_ROWS", "50"))  # filas por chunk enviado
+
+streaming_env = Environment(
+    loader=FileSystemLoader(TEMPLATES_DIR),
+    autoescape=select_autoescape(["html", "xml"]),
+    enable_async=True,
+)
+registrar(streaming_env)
+
+
+async def render_block(template, block: str, context: dict) -> str:
+    inicio = time.perf_counter()
+    html = "".join([chunk async for chunk in template.blocks[block](template.new_context(context))])
+    add_render_time(time.perf_counter() - inicio)
+    return html
+
+
+async def render_fragment(template, block: str, table: str, context: dict) -> str:
+    # Fragmento estático: se cachea por (plantilla, bloque, versión de la tabla)
+    key = (template.name, block, data_versions.get(table))
+    html = fragment_cache.get(key, None)
+    if html is None:
+        html = await render_block(template, block, context)
+        fragment_cache.set(key, html)
+    return html
+
+
+async def stream_rows(template_name: str, table: str, row_name: str, stmt, context: dict = None):
+    template = streaming_env.get_template(template_name)
+    context = dict(context or {})
+    yield await render_fragment(template, "cabecera", table, context)
+
+    # Sesión propia: tiene que seguir abierta mientras se envía la respuesta
+    async with AsyncSessionLocal() as db:
+        result = await db.stream(stmt.execution_options(yield_per=STREAM_YIELD_PER))
+        chunk = []
+        async for row in result.scalars():
+            chunk.append(await render_block(template, "fila", {**context, row_name: row}))
+            if len(chunk) >= STREAM_FLUSH_ROWS:
+                yield "".join(chunk)
+                chunk = []
+        if chunk:
+            yield "".join(chunk)
+
+    yield await render_fragment(template, "pie", table, context)
+
+
+def stream_template_response(template_name: str, table: str, row_name: str, stmt, context: dict = None):
+    return StreamingResponse(
+        stream_rows(template_name, table, row_name, stmt, context),
+        media_type="text/html; charset=utf-8",
+    )
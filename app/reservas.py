@@ -0,0 +1,188 @@
+import argparse
+import asyncio
+import sys
+from bisect import bisect_left
+from datetime import datetime, timedelta
+
+from sqlalchemy import bindparam, event, inspect, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import models, schemas
+from app.database import AsyncSessionLocal
+from app.availability import ESTADOS_CANCELADOS, RESERVA_DURACION, RESERVA_DURACION_MAX, reserva_interval
+
+# Reservas como intervalos [inicio, fin) con índice (mesa_id, inicio).
+# Dos reservas de la misma mesa se superponen si  a.inicio < b.fin AND a.fin > b.inicio.
+# Como ninguna reserva dura más de RESERVA_DURACION_MAX, la búsqueda en el índice se acota
+# a  inicio BETWEEN (:inicio - max, :fin): un rango chico aunque haya años de reservas.
+#
+# Reservas viejas (sólo fecha_reserva + hora_reserva):  python -m app.reservas rellenar
+
+class ReservaSuperpuesta(Exception):
+    def __init__(self, reserva_ids):
+        super().__init__("La mesa ya está reservada en ese horario")
+        self.reserva_ids = reserva_ids
+
+
+def intervalo(reserva: schemas.ReservaCreate):
+    inicio = datetime.combine(reserva.fecha, reserva.hora)
+    duracion = timedelta(minutes=reserva.duracion) if reserva.duracion is not None else RESERVA_DURACION
+    if duracion <= timedelta(0) or duracion > RESERVA_DURACION_MAX:
+        raise ValueError(f"La duración debe estar entre 1 y {int(RESERVA_DURACION_MAX.total_seconds() // 60)} minutos")
+    return inicio, inicio + duracion
+
+
+def _activas():
+    return or_(models.Reserva.estado.is_(None), models.Reserva.estado.not_in(ESTADOS_CANCELADOS))
+
+
+def superpuestas_stmt(mesa_ids, desde: datetime, hasta: datetime):
+    # Reservas activas de las mesas que ocupan algún momento de [desde, hasta)
+    return select(models.Reserva.id, models.Reserva.mesa_id, models.Reserva.inicio, models.Reserva.fin).where(
+        models.Reserva.mesa_id.in_(mesa_ids),
+        models.Reserva.inicio > desde - RESERVA_DURACION_MAX,
+        models.Reserva.inicio < hasta,
+        models.Reserva.fin > desde,
+        _activas(),
+    )
+
+
+async def conflictos(db: AsyncSession, mesa_id: int, inicio: datetime, fin: datetime, excluir_id: int = None):
+    stmt = superpuestas_stmt([mesa_id], inicio, fin)
+    if excluir_id is not None:
+        stmt = stmt.where(models.Reserva.id != excluir_id)
+    result = await db.execute(stmt.with_only_columns(models.Reserva.id))
+    return result.scalars().all()
+
+
+async def crear_reserva(db: AsyncSession, reserva: schemas.ReservaCreate):
+    # Devuelve la reserva, None si la mesa no existe o lanza ReservaSuperpuesta
+    inicio, fin = intervalo(reserva)
+    # Se bloquea la fila de la mesa: dos altas simultáneas para la misma mesa no pueden
+    # pasar las dos el control (las de otras mesas no se esperan entre sí).
+    mesa = await db.execute(select(models.Mesa.id).where(models.Mesa.id == reserva.mesa_id).with_for_update())
+    if mesa.scalar() is None:
+        return None
+    ids = await conflictos(db, reserva.mesa_id, inicio, fin)
+    if ids:
+        await db.rollback()
+        raise ReservaSuperpuesta(ids)
+    db_reserva = models.Reserva(
+        cliente_id=reserva.cliente_id, mesa_id=reserva.mesa_id,
+        fecha_reserva=inicio, hora_reserva=inicio.strftime("%H:%M"), inicio=inicio, fin=fin,
+    )
+    db.add(db_reserva)
+    await db.commit()
+    return db_reserva
+
+
+def _superpuestos(slots, inicio, fin):
+    # slots: lista ordenada de (inicio, fin, clave) de una mesa
+    j = bisect_left(slots, (fin,)) - 1
+    encontrados = []
+    while j >= 0 and slots[j][0] + RESERVA_DURACION_MAX > inicio:
+        if slots[j][1] > inicio:
+            encontrados.append(slots[j][2])
+        j -= 1
+    return encontrados
+
+
+async def validar_lote(db: AsyncSession, reservas):
+    # Valida N reservas con una sola consulta: contra las reservas guardadas y entre sí
+    resultado, pedidas = [], []
+    for i, reserva in enumerate(reservas):
+        item = {"indice": i, "valida": True, "conflictos": [], "conflictos_lote": []}
+        try:
+            pedidas.append((reserva.mesa_id, *intervalo(reserva), i))
+        except ValueError as e:
+            item.update(valida=False, error=str(e))
+        resultado.append(item)
+    if not pedidas:
+        return resultado
+
+    guardadas, lote = {}, {}
+    stmt = superpuestas_stmt({m for m, _, _, _ in pedidas}, min(p[1] for p in pedidas), max(p[2] for p in pedidas))
+    for reserva_id, mesa_id, inicio, fin in (await db.execute(stmt)).all():
+        guardadas.setdefault(mesa_id, []).append((inicio, fin, reserva_id))
+    for mesa_id, inicio, fin, i in pedidas:
+        lote.setdefault(mesa_id, []).append((inicio, fin, i))
+    for slots in (*guardadas.values(), *lote.values()):
+        slots.sort()
+
+    for mesa_id, inicio, fin, i in pedidas:
+        item = resultado[i]
+        item["conflictos"] = sorted(_superpuestos(guardadas.get(mesa_id, []), inicio, fin))
+        item["conflictos_lote"] = sorted(j for j in _superpuestos(lote[mesa_id], inicio, fin) if j != i)
+        item["valida"] = not item["conflictos"] and not item["conflictos_lote"]
+    return resultado
+
+
+#========================= S I N C R O N I Z A C I O N ========================================
+# Altas / cambios con el ORM que sólo traen fecha_reserva + hora_reserva: se completa el
+# intervalo; y al revés, las que sólo traen inicio completan las columnas viejas.
+
+def _completar(reserva, recalcular=False):
+    if reserva.inicio is None or recalcular:
+        interval = reserva_interval(reserva.fecha_reserva, reserva.hora_reserva)
+        if interval is not None:
+            reserva.inicio, reserva.fin = interval
+    elif reserva.fin is None:
+        reserva.fin = reserva.inicio + RESERVA_DURACION
+    if reserva.inicio is not None and reserva.fecha_reserva is None:
+        reserva.fecha_reserva = reserva.inicio
+        reserva.hora_reserva = reserva.inicio.strftime("%H:%M")
+
+
+@event.listens_for(models.Reserva, "before_insert")
+def _antes_de_insertar(mapper, connection, target):
+    _completar(target)
+
+
+@event.listens_for(models.Reserva, "before_update")
+def _antes_de_actualizar(mapper, connection, target):
+    attrs = inspect(target).attrs
+    viejas = attrs.fecha_reserva.history.has_changes() or attrs.hora_reserva.history.has_changes()
+    _completar(target, recalcular=viejas and not attrs.inicio.history.has_changes())
+
+
+async def rellenar(db: AsyncSession, chunk: int = 1000):
+    # Completa inicio / fin de las reservas guardadas antes de existir esas columnas
+    total = 0
+    while True:
+        result = await db.execute(
+            select(models.Reserva.id, models.Reserva.fecha_reserva, models.Reserva.hora_reserva)
+            .where(models.Reserva.inicio.is_(None), models.Reserva.fecha_reserva.is_not(None))
+            .limit(chunk)
+        )
+        rows = result.all()
+        if not rows:
+            return total
+        values = []
+        for reserva_id, fecha_reserva, hora_reserva in rows:
+            inicio, fin = reserva_interval(fecha_reserva, hora_reserva)
+            values.append({"b_id": reserva_id, "b_inicio": inicio, "b_fin": fin})
+        tabla = models.Reserva.__table__
+        await db.execute(
+            update(tabla).where(tabla.c.id == bindparam("b_id")).values(inicio=bindparam("b_inicio"), fin=bindparam("b_fin")),
+            values,
+        )
+        await db.commit()
+        total += len(values)
+
+
+#==================================== C O N S O L A ========================================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Reservas")
+    parser.add_argument("accion", choices=["rellenar"])
+    args = parser.parse_args(argv)
+
+    async def run():
+        async with AsyncSessionLocal() as db:
+            return await rellenar(db)
+
+    print(f"{asyncio.run(run())} reservas actualizadas")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,350 @@
+import argparse
+import asyncio
+import sys
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import delete, event, func, insert, inspect, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app import models
+from app.database import AsyncSessionLocal
+
+# Resúmenes de ventas para los reportes diarios / por hora.
+# La tabla ventas_resumen acumula, por (fecha, hora, mesa, combo), cantidad y total de
+# pedidos y de pagos. Se actualiza con deltas dentro de la misma transacción que escribe
+# el pedido o el pago (un solo INSERT ... ON DUPLICATE KEY / ON CONFLICT por flush),
+# así los reportes nunca recorren pedidos ni pagos.
+# - Escrituras con el ORM: eventos de sesión (abajo).
+# - Escrituras por Core (cola de ingreso, PATCH): llaman a las funciones apply_* .
+# - Backfill o corrección: python -m app.rollups rebuild [--desde AAAA-MM-DD] [--hasta AAAA-MM-DD]
+# - Pedidos con líneas (app/lineas.py): el importe de cada línea (cantidad * precio_unitario)
+#   va a la clave del combo de la línea; en la clave del pedido queda la cuenta del pedido
+#   y sólo lo que total_pedido tenga de más sobre sus líneas (normalmente 0).
+
+CLAVE = ("fecha", "hora", "mesa_id", "combo_id")
+MEDIDAS = ("pedidos", "total_pedidos", "pagos", "total_pagos")
+CAMPOS_PEDIDO = ("fecha_pedido", "mesa_id", "combo_id", "total_pedido")
+CAMPOS_PAGO = ("fecha_pago", "monto", "pedido_id")
+AGRUPACIONES = {"dia": "fecha", "hora": "hora", "mesa": "mesa_id", "combo": "combo_id"}
+
+tabla = models.VentaResumen.__table__
+lineas = models.PedidoLinea.__table__
+importe_linea = lineas.c.cantidad * lineas.c.precio_unitario
+
+
+def rollup_key(fecha: datetime, mesa_id, combo_id):
+    return (fecha.date(), fecha.hour, mesa_id or 0, combo_id or 0)
+
+
+class Deltas:
+    def __init__(self):
+        self._data = defaultdict(lambda: [0, 0.0, 0, 0.0])
+
+    def pedido(self, fecha, mesa_id, combo_id, total, signo: int = 1):
+        if fecha is None:
+            return
+        acc = self._data[rollup_key(fecha, mesa_id, combo_id)]
+        acc[0] += signo
+        acc[1] += signo * (total or 0)
+
+    def linea(self, fecha, mesa_id, combo_id, importe, signo: int = 1):
+        # Importe de una línea de pedido: suma al total sin contar otro pedido
+        if fecha is None:
+            return
+        self._data[rollup_key(fecha, mesa_id, combo_id)][1] += signo * (importe or 0)
+
+    def pago(self, fecha, mesa_id, combo_id, monto, signo: int = 1):
+        if fecha is None:
+            return
+        acc = self._data[rollup_key(fecha, mesa_id, combo_id)]
+        acc[2] += signo
+        acc[3] += signo * (monto or 0)
+
+    def rows(self):
+        # Ordenadas por clave: dos transacciones concurrentes bloquean filas en el mismo orden
+        return [
+            {**dict(zip(CLAVE, key)), **dict(zip(MEDIDAS, acc))}
+            for key, acc in sorted(self._data.items()) if any(acc)
+        ]
+
+
+def _upsert(conn, rows):
+    dialect = conn.dialect.name
+    if dialect == "mysql":
+        from sqlalchemy.dialects.mysql import insert as mysql_insert
+        stmt = mysql_insert(tabla).values(rows)
+        return stmt.on_duplicate_key_update({m: tabla.c[m] + stmt.inserted[m] for m in MEDIDAS})
+    if dialect in ("sqlite", "postgresql"):
+        if dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        stmt = dialect_insert(tabla).values(rows)
+        return stmt.on_conflict_do_update(
+            index_elements=list(CLAVE), set_={m: tabla.c[m] + stmt.excluded[m] for m in MEDIDAS}
+        )
+    return None
+
+
+def apply_deltas(conn, deltas: Deltas):
+    # conn: Connection sync (session.connection() o dentro de AsyncSession.run_sync)
+    rows = deltas.rows()
+    if not rows:
+        return
+    stmt = _upsert(conn, rows)
+    if stmt is not None:
+        conn.execute(stmt)
+        return
+    # Otras bases: UPDATE y, si la fila no existía, INSERT
+    for row in rows:
+        result = conn.execute(
+            update(tabla)
+            .where(*(tabla.c[k] == row[k] for k in CLAVE))
+            .values({m: tabla.c[m] + row[m] for m in MEDIDAS})
+        )
+        if not result.rowcount:
+            conn.execute(insert(tabla).values(row))
+
+
+def _pedido_de(conn, pedido_id):
+    # (mesa_id, combo_id) del pedido al que pertenece un pago
+    if pedido_id is None:
+        return None, None
+    row = conn.execute(
+        select(models.Pedido.mesa_id, models.Pedido.combo_id).where(models.Pedido.id == pedido_id)
+    ).first()
+    return tuple(row) if row else (None, None)
+
+
+def _mover_pagos(conn, deltas: Deltas, pedido_id, antes, despues, excluir=()):
+    # Cambió la mesa o el combo de un pedido: sus pagos pasan a la nueva clave
+    stmt = select(models.Pago.fecha_pago, models.Pago.monto).where(models.Pago.pedido_id == pedido_id)
+    if excluir:
+        stmt = stmt.where(models.Pago.id.not_in(excluir))
+    for fecha_pago, monto in conn.execute(stmt):
+        deltas.pago(fecha_pago, *antes, monto, -1)
+        deltas.pago(fecha_pago, *despues, monto)
+
+
+def _partes_pedido(conn, pedido_id, valores):
+    # valores: CAMPOS_PEDIDO. Reparte el total entre las líneas del pedido (por combo) y el
+    # resto, que queda en la clave del pedido junto con la cuenta: [(tipo de delta, valores)]
+    fecha, mesa_id, combo_id, total = valores
+    partes, resto = [], total or 0
+    if pedido_id is not None:
+        stmt = (
+            select(lineas.c.combo_id, func.sum(importe_linea))
+            .where(lineas.c.pedido_id == pedido_id)
+            .group_by(lineas.c.combo_id)
+        )
+        for linea_combo, importe in conn.execute(stmt):
+            partes.append(("linea", [fecha, mesa_id, linea_combo, importe]))
+            resto -= importe or 0
+    partes.append(("pedido", [fecha, mesa_id, combo_id, resto]))
+    return partes
+
+
+def _sumar_pedido(conn, deltas: Deltas, pedido_id, valores, signo: int = 1):
+    for tipo, v in _partes_pedido(conn, pedido_id, valores):
+        getattr(deltas, tipo)(*v, signo)
+
+
+def apply_pedidos_insertados(conn, values):
+    # Cola de ingreso: lista de dicts insertados con un executemany
+    deltas = Deltas()
+    for row in values:
+        deltas.pedido(row.get("fecha_pedido"), row.get("mesa_id"), row.get("combo_id"), row.get("total_pedido"))
+    apply_deltas(conn, deltas)
+
+
+def apply_pedido_actualizado(conn, pedido_id, antes: dict, despues: dict):
+    # PATCH por Core: `antes` es la fila leída antes del UPDATE, `despues` la fila resultante
+    deltas = Deltas()
+    _sumar_pedido(conn, deltas, pedido_id, [antes[c] for c in CAMPOS_PEDIDO], -1)
+    _sumar_pedido(conn, deltas, pedido_id, [despues[c] for c in CAMPOS_PEDIDO])
+    claves = lambda d: (d["mesa_id"], d["combo_id"])
+    if claves(antes) != claves(despues):
+        _mover_pagos(conn, deltas, pedido_id, claves(antes), claves(despues))
+    apply_deltas(conn, deltas)
+
+
+def apply_lineas_insertadas(conn, pedido: dict, filas, pedido_nuevo: bool = False):
+    # Líneas nuevas de `pedido` (dict con CAMPOS_PEDIDO); pedido_nuevo: también cuenta el pedido
+    deltas = Deltas()
+    resto = pedido.get("total_pedido") or 0
+    for f in filas:
+        importe = f["cantidad"] * f["precio_unitario"]
+        deltas.linea(pedido["fecha_pedido"], pedido["mesa_id"], f["combo_id"], importe)
+        resto -= importe
+    if pedido_nuevo:
+        deltas.pedido(pedido["fecha_pedido"], pedido["mesa_id"], pedido["combo_id"], resto)
+    apply_deltas(conn, deltas)
+
+
+#=============================== R E C O N S T R U C C I O N ========================================
+def _rango(columna, desde: date = None, hasta: date = None):
+    condiciones = []
+    if desde is not None:
+        condiciones.append(columna >= datetime.combine(desde, datetime.min.time()))
+    if hasta is not None:
+        condiciones.append(columna < datetime.combine(hasta + timedelta(days=1), datetime.min.time()))
+    return condiciones
+
+
+async def rebuild(db: AsyncSession, desde: date = None, hasta: date = None, yield_per: int = 1000):
+    # Recalcula el resumen del rango desde pedidos y pagos, en una sola transacción.
+    # Se recorren las filas con un cursor (yield_per): en memoria sólo quedan las claves.
+    deltas = Deltas()
+    # En la clave del pedido, el total menos lo que ya cuentan sus líneas
+    en_lineas = select(func.sum(importe_linea)).where(lineas.c.pedido_id == models.Pedido.id).scalar_subquery()
+    pedidos = select(
+        models.Pedido.fecha_pedido, models.Pedido.mesa_id, models.Pedido.combo_id,
+        func.coalesce(models.Pedido.total_pedido, 0) - func.coalesce(en_lineas, 0),
+    ).where(*_rango(models.Pedido.fecha_pedido, desde, hasta))
+    async for fecha, mesa_id, combo_id, total in await db.stream(pedidos.execution_options(yield_per=yield_per)):
+        deltas.pedido(fecha, mesa_id, combo_id, total)
+    por_linea = (
+        select(models.Pedido.fecha_pedido, models.Pedido.mesa_id, lineas.c.combo_id, importe_linea)
+        .join(models.Pedido, lineas.c.pedido_id == models.Pedido.id)
+        .where(*_rango(models.Pedido.fecha_pedido, desde, hasta))
+    )
+    async for fecha, mesa_id, combo_id, importe in await db.stream(por_linea.execution_options(yield_per=yield_per)):
+        deltas.linea(fecha, mesa_id, combo_id, importe)
+    pagos = (
+        select(models.Pago.fecha_pago, models.Pedido.mesa_id, models.Pedido.combo_id, models.Pago.monto)
+        .outerjoin(models.Pedido, models.Pago.pedido_id == models.Pedido.id)
+        .where(*_rango(models.Pago.fecha_pago, desde, hasta))
+    )
+    async for fecha, mesa_id, combo_id, monto in await db.stream(pagos.execution_options(yield_per=yield_per)):
+        deltas.pago(fecha, mesa_id, combo_id, monto)
+
+    borrar = delete(tabla)
+    if desde is not None:
+        borrar = borrar.where(tabla.c.fecha >= desde)
+    if hasta is not None:
+        borrar = borrar.where(tabla.c.fecha <= hasta)
+    await db.execute(borrar)
+    rows = deltas.rows()
+    if rows:
+        await db.execute(insert(tabla), rows)
+    await db.commit()
+    return len(rows)
+
+
+#=================================== R E P O R T E S ========================================
+async def reporte_ventas(db: AsyncSession, agrupar: str = "dia", desde: date = None, hasta: date = None):
+    columna = tabla.c[AGRUPACIONES[agrupar]]
+    stmt = (
+        select(columna, *(func.sum(tabla.c[m]).label(m) for m in MEDIDAS))
+        .group_by(columna)
+        # Claves que quedaron en cero (pedidos movidos de mesa/combo o borrados). Los combos de
+        # las líneas de un pedido tienen importe sin cuenta de pedidos.
+        .having(
+            (func.sum(tabla.c.pedidos) != 0) | (func.sum(tabla.c.pagos) != 0)
+            | (func.abs(func.sum(tabla.c.total_pedidos)) > 0.005)
+        )
+        .order_by(columna)
+    )
+    if desde is not None:
+        stmt = stmt.where(tabla.c.fecha >= desde)
+    if hasta is not None:
+        stmt = stmt.where(tabla.c.fecha <= hasta)
+    result = await db.execute(stmt)
+    return [dict(row) for row in result.mappings()]
+
+
+#========================= S I N C R O N I Z A C I O N ========================================
+# Altas/cambios/bajas hechos con el ORM: los deltas se calculan en cada flush y se
+# escriben en la misma transacción (un rollback también deshace el resumen).
+
+_BORRADOS_KEY = "rollup_borrados"
+
+
+def _anterior(obj, campo):
+    history = inspect(obj).attrs[campo].history
+    if history.deleted:
+        return history.deleted[0]
+    return history.unchanged[0] if history.unchanged else getattr(obj, campo)
+
+
+def _cargar_anterior(target, value, oldvalue, initiator):
+    pass
+
+
+# Un objeto expirado (p. ej. después de un commit) no tiene cargado el valor anterior: sin
+# active_history el set no lo lee, la historia queda vacía y el cambio no restaría nada.
+for _modelo, _campos in ((models.Pedido, CAMPOS_PEDIDO), (models.Pago, CAMPOS_PAGO)):
+    for _campo in _campos:
+        event.listen(getattr(_modelo, _campo), "set", _cargar_anterior, active_history=True)
+
+
+@event.listens_for(Session, "before_flush")
+def _capturar_borrados(session, flush_context, instances):
+    # Antes del DELETE: se leen los valores que hay que restar (después ya no existen)
+    borrados = session.info.setdefault(_BORRADOS_KEY, [])
+    for obj in session.deleted:
+        if isinstance(obj, models.Pedido):
+            borrados.extend(_partes_pedido(session.connection(), obj.id, [getattr(obj, c) for c in CAMPOS_PEDIDO]))
+        elif isinstance(obj, models.Pago):
+            mesa_combo = _pedido_de(session.connection(), obj.pedido_id)
+            borrados.append(("pago", [obj.fecha_pago, *mesa_combo, obj.monto]))
+
+
+@event.listens_for(Session, "after_flush")
+def _actualizar_resumen(session, flush_context):
+    deltas = Deltas()
+    for tipo, valores in session.info.pop(_BORRADOS_KEY, []):
+        getattr(deltas, tipo)(*valores, -1)
+
+    conn = session.connection()
+    pagos_nuevos = [obj.id for obj in session.new if isinstance(obj, models.Pago)]
+    for obj in session.new:
+        if isinstance(obj, models.Pedido):
+            # Los pedidos con líneas se crean por Core (app/lineas.py), no por acá
+            deltas.pedido(obj.fecha_pedido, obj.mesa_id, obj.combo_id, obj.total_pedido)
+        elif isinstance(obj, models.Pago):
+            deltas.pago(obj.fecha_pago, *_pedido_de(conn, obj.pedido_id), obj.monto)
+    for obj in session.dirty:
+        if isinstance(obj, models.Pedido) and session.is_modified(obj, include_collections=False):
+            antes = [_anterior(obj, c) for c in CAMPOS_PEDIDO]
+            despues = [getattr(obj, c) for c in CAMPOS_PEDIDO]
+            if antes != despues:
+                _sumar_pedido(conn, deltas, obj.id, antes, -1)
+                _sumar_pedido(conn, deltas, obj.id, despues)
+            if antes[1:3] != despues[1:3]:
+                _mover_pagos(conn, deltas, obj.id, antes[1:3], despues[1:3], excluir=pagos_nuevos)
+        elif isinstance(obj, models.Pago) and session.is_modified(obj, include_collections=False):
+            fecha, monto, pedido_id = (_anterior(obj, c) for c in CAMPOS_PAGO)
+            if (fecha, monto, pedido_id) != (obj.fecha_pago, obj.monto, obj.pedido_id):
+                deltas.pago(fecha, *_pedido_de(conn, pedido_id), monto, -1)
+                deltas.pago(obj.fecha_pago, *_pedido_de(conn, obj.pedido_id), obj.monto)
+    apply_deltas(conn, deltas)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _descartar_borrados(session, previous_transaction):
+    if not previous_transaction.nested:
+        session.info.pop(_BORRADOS_KEY, None)
+
+
+#==================================== C O N S O L A ========================================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Resúmenes de ventas")
+    parser.add_argument("accion", choices=["rebuild"])
+    parser.add_argument("--desde", type=date.fromisoformat, help="AAAA-MM-DD (por defecto, todo)")
+    parser.add_argument("--hasta", type=date.fromisoformat, help="AAAA-MM-DD (inclusive)")
+    args = parser.parse_args(argv)
+
+    async def run():
+        async with AsyncSessionLocal() as db:
+            return await rebuild(db, args.desde, args.hasta)
+
+    filas = asyncio.run(run())
+    print(f"{filas} filas de resumen reconstruidas")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
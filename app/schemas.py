@@ -1,6 +1,6 @@
-from pydantic import BaseModel
+from pydantic import AliasChoices, BaseModel, Field
 from typing import List, Optional
-from datetime import date, time
+from datetime import date, datetime, time
 
 #===================================== S C H E M A S ========================================
 
@@ -19,8 +19,18 @@ class ClienteCreate(ClienteBase):
 class ClienteUpdate(ClienteBase):
     pass
 
+# PATCH: sólo se actualizan los campos enviados. Ningún campo es Optional: un null
+# explícito da 422 (omitidos no se tocan, pero no se pueden borrar).
+class ClientePatch(BaseModel):
+    nombre: str = None
+    apellido: str = None
+    email: str = None
+    telefono: str = None
+
 class Cliente(ClienteBase):
     id: int
+    telefono: Optional[str] = None
+    version: int = 1  # para If-Match en PATCH
     reservas: List['Reserva'] = []
     pedidos: List['Pedido'] = []
     class Config:
@@ -38,8 +48,16 @@ class MesaCreate(MesaBase):
 class MesaUpdate(MesaBase):
     pass
 
+class MesaPatch(BaseModel):
+    numero_mesa: int = None
+    capacidad: int = None
+    disponible: bool = None
+    ubicacion: str = None
+
 class Mesa(MesaBase):
     id: int
+    ubicacion: Optional[str] = None
+    version: int = 1
     reservas: List["Reserva"] = []
     pedidos: List["Pedido"] = []
     class Config:
@@ -53,13 +71,20 @@ class ReservaBase(BaseModel):
     mesa_id: int
 
 class ReservaCreate(ReservaBase):
-    pass
+    duracion: Optional[int] = None  # minutos; por defecto RESERVA_DURACION_MIN
 
 class ReservaUpdate(ReservaBase):
     pass
 
+# Los schemas de respuesta leen también del ORM (from_attributes): los alias apuntan a la
+# columna del modelo cuando se llama distinto (fecha <- fecha_reserva)
 class Reserva(ReservaBase):
     id: int
+    fecha: date = Field(validation_alias=AliasChoices("fecha", "fecha_reserva"))
+    hora: time = Field(validation_alias=AliasChoices("hora", "hora_reserva"))
+    inicio: Optional[datetime] = None
+    fin: Optional[datetime] = None
+    estado: Optional[str] = None
     cliente: Cliente
     mesa: 'Mesa'
     class Config:
@@ -79,6 +104,7 @@ class ComboUpdate(ComboBase):
 
 class Combo(ComboBase):
     id: int
+    nombre: str = Field(validation_alias=AliasChoices("nombre", "nombre_combo"))
     class Config:
         from_attributes = True
 
@@ -94,11 +120,48 @@ class PedidoCreate(PedidoBase):
 class PedidoUpdate(PedidoBase):
     pass
 
+class PedidoPatch(BaseModel):
+    cliente_id: int = None
+    mesa_id: int = None
+    combo_id: int = None
+    producto: str = None
+    cantidad: int = Field(None, ge=1)
+    total_pedido: float = Field(None, ge=0)
+
+# Pedido con varias líneas: el precio sale de Combo.precio y el total lo calcula el server
+class PedidoLineaCreate(BaseModel):
+    combo_id: int
+    cantidad: int = Field(1, ge=1)
+    producto: Optional[str] = None  # por defecto el nombre del combo (descuenta ese stock)
+
+class PedidoLineasCreate(BaseModel):
+    mesa_id: Optional[int] = None
+    cliente_id: Optional[int] = None
+    lineas: List[PedidoLineaCreate] = Field(..., min_length=1)
+
+class PedidoLineasAgregar(BaseModel):
+    lineas: List[PedidoLineaCreate] = Field(..., min_length=1)
+
+class PedidoLinea(BaseModel):
+    id: int
+    pedido_id: int
+    combo_id: Optional[int] = None
+    producto: Optional[str] = None
+    cantidad: int
+    precio_unitario: float
+    class Config:
+        from_attributes = True
+
 class Pedido(PedidoBase):
     id: int
     # Relaciones, si es necesario
-    cliente_id: int  # si está relacionado con cliente, por ejemplo
+    cliente_id: Optional[int] = None  # si está relacionado con cliente, por ejemplo
+    mesa_id: Optional[int] = None
     combo_id: Optional[int] = None  # si aplica
+    fecha_pedido: Optional[datetime] = None
+    total_pedido: Optional[float] = None
+    version: int = 1
+    lineas: List['PedidoLinea'] = []
     class Config:
         from_attributes = True
 
@@ -114,6 +177,7 @@ class MetodoPagoUpdate(MetodoPagoBase):
 
 class MetodoPago(MetodoPagoBase):
     id: int
+    nombre: str = Field(validation_alias=AliasChoices("nombre", "tipo_metodo"))
     class Config:
         from_attributes = True
 
@@ -131,6 +195,8 @@ class PagoUpdate(PagoBase):
 
 class Pago(PagoBase):
     id: int
+    pedido_id: Optional[int] = None
+    fecha: date = Field(validation_alias=AliasChoices("fecha", "fecha_pago"))
     class Config:
         from_attributes = True
 
@@ -177,6 +243,7 @@ class Proveedor(ProveedorBase):
 class InventarioBase(BaseModel):
     producto: str
     cantidad: int
+    stock_minimo: int = 0
     proveedor_id: int
 
 class InventarioCreate(InventarioBase):
@@ -190,6 +257,10 @@ class Inventario(InventarioBase):
     proveedor: Proveedor
     class Config:
         from_attributes = True
+
+class MovimientoCreate(BaseModel):
+    cantidad: int  # positivo = ingreso, negativo = salida
+    motivo: str = "ajuste"
         
 #---------------------- U S U A R I O ----------------------------------------------
 
@@ -0,0 +1,155 @@
+import json
+import typing
+from datetime import date, datetime, time
+from functools import lru_cache
+
+from pydantic import AliasChoices, BaseModel
+from sqlalchemy import inspect
+
+try:
+    import orjson
+except ImportError:  # sin orjson se usa el json de la stdlib (más lento)
+    orjson = None
+
+# Serialización de objetos ORM a JSON usando los schemas de app/schemas.py como contrato.
+# En vez de validar cada objeto con Pydantic (lento en listas largas), por cada par
+# (schema, modelo) se arma una sola vez el plan de campos: atributo del modelo de donde
+# sale, schema anidado y si es lista. Después serializar es recorrer el plan sobre __dict__.
+# - depth: cuántos niveles de relaciones se expanden (Cliente -> Reserva -> Cliente corta ahí).
+# - Sólo se expanden relaciones ya cargadas: nunca se dispara un lazy load (las políticas de
+#   app/loaders.py deciden qué se trae con cada consulta).
+# - fields: fieldset parcial, ej. "id,nombre,reservas.fecha" (ver parse_fields).
+
+DEPTH_MAX = 3
+
+
+class Plan:
+    __slots__ = ("columnas", "fechas", "relaciones")
+
+    def __init__(self, columnas, fechas, relaciones):
+        self.columnas = columnas        # [(nombre, atributo)]
+        self.fechas = fechas            # [(nombre, atributo)] campos `date` guardados como DateTime
+        self.relaciones = relaciones    # [(nombre, atributo, schema anidado, es lista)]
+
+    def filtrar(self, fields):
+        if fields is None:
+            return self
+        return Plan(
+            [c for c in self.columnas if c[0] in fields],
+            [c for c in self.fechas if c[0] in fields],
+            [r for r in self.relaciones if r[0] in fields],
+        )
+
+
+def _nested_schema(annotation):
+    # List['Reserva'] -> (Reserva, True); Optional[Mesa] -> (Mesa, False); int -> (None, False)
+    lista = False
+    origen = typing.get_origin(annotation)
+    if origen in (list, typing.List):
+        annotation, lista = typing.get_args(annotation)[0], True
+    elif origen is typing.Union:
+        args = [a for a in typing.get_args(annotation) if a is not type(None)]
+        if len(args) == 1:
+            return _nested_schema(args[0])
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return annotation, lista
+    return None, False
+
+
+@lru_cache(maxsize=None)
+def plan(schema, cls) -> Plan:
+    mapper_attrs = set(inspect(cls).attrs.keys())
+    columnas, fechas, relaciones = [], [], []
+    for nombre, info in schema.model_fields.items():
+        # El nombre del schema o alguno de sus alias (Combo.nombre <- nombre_combo)
+        candidatos = [nombre]
+        if isinstance(info.validation_alias, AliasChoices):
+            candidatos += [c for c in info.validation_alias.choices if isinstance(c, str)]
+        elif isinstance(info.validation_alias, str):
+            candidatos.append(info.validation_alias)
+        attr = next((c for c in candidatos if c in mapper_attrs), None)
+        if attr is None:
+            continue
+        anidado, lista = _nested_schema(info.annotation)
+        if anidado is not None:
+            relaciones.append((nombre, attr, anidado, lista))
+        elif info.annotation is date:
+            fechas.append((nombre, attr))
+        else:
+            columnas.append((nombre, attr))
+    return Plan(columnas, fechas, relaciones)
+
+
+def parse_fields(fields: str, schema, depth: int):
+    # "id,nombre,reservas.fecha" -> {"id": None, "nombre": None, "reservas": {"fecha": None}}
+    # None = todos los campos. Lanza ValueError con campos desconocidos.
+    if not fields:
+        return None
+    arbol = {}
+    for ruta in fields.split(","):
+        partes = [p for p in ruta.strip().split(".") if p]
+        if not partes:
+            continue
+        if len(partes) - 1 > depth:
+            raise ValueError(f"'{ruta.strip()}' es más profundo que depth={depth}")
+        nodo, actual = arbol, schema
+        for i, parte in enumerate(partes):
+            info = actual.model_fields.get(parte) if actual is not None else None
+            if info is None:
+                raise ValueError(f"Campo desconocido: {'.'.join(partes[:i + 1])}")
+            actual = _nested_schema(info.annotation)[0]
+            if i == len(partes) - 1:
+                nodo[parte] = None  # el objeto completo pisa un fieldset parcial anterior
+            else:
+                if nodo.get(parte, {}) is None:
+                    break  # ya se pidió el objeto completo
+                nodo = nodo.setdefault(parte, {})
+    return arbol
+
+
+def serializar(obj, schema, depth: int = 0, fields=None):
+    if obj is None:
+        return None
+    return _serializar(obj, plan(schema, type(obj)).filtrar(fields), depth, fields)
+
+
+def serializar_lista(objs, schema, depth: int = 0, fields=None):
+    objs = list(objs)
+    if not objs:
+        return []
+    p = plan(schema, type(objs[0])).filtrar(fields)
+    return [_serializar(obj, p, depth, fields) for obj in objs]
+
+
+def _serializar(obj, p: Plan, depth, fields):
+    # Lo cargado está en __dict__: leerlo de ahí no dispara lazy loads ni refresh
+    estado = obj.__dict__
+    salida = {nombre: estado[attr] for nombre, attr in p.columnas if attr in estado}
+    for nombre, attr in p.fechas:
+        if attr in estado:
+            valor = estado[attr]
+            salida[nombre] = valor.date() if isinstance(valor, datetime) else valor
+    if depth > 0:
+        for nombre, attr, anidado, lista in p.relaciones:
+            if attr not in estado:
+                continue
+            sub = fields.get(nombre) if fields is not None else None
+            valor = estado[attr]
+            if lista:
+                salida[nombre] = serializar_lista(valor, anidado, depth - 1, sub)
+            else:
+                salida[nombre] = serializar(valor, anidado, depth - 1, sub)
+    return salida
+
+
+#======================================= J S O N ========================================
+def _default(valor):
+    if isinstance(valor, (datetime, date, time)):
+        return valor.isoformat()
+    raise TypeError(f"{type(valor).__name__} no es serializable a JSON")
+
+
+def dumps(contenido) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(contenido)
+    return json.dumps(contenido, default=_default, ensure_ascii=False, separators=(",", ":")).encode()
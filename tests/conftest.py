@@ -0,0 +1,7 @@
+import os
+import sys
+import tempfile
+
+# Antes de importar app: la base por defecto es MySQL; los tests usan SQLite en un temporal
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bodegon_test.db")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
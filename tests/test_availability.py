@@ -0,0 +1,100 @@
+from datetime import date, datetime, time, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+from app import availability
+from app.availability import AvailabilityEngine
+
+# Índice de disponibilidad: mesa libre más chica que alcanza, superposición de intervalos
+# (incluso cruzando la medianoche), cancelaciones y límite de días en memoria.
+
+MANANA = date.today() + timedelta(days=1)
+
+
+def _a(day, hora, minutos=0):
+    return datetime.combine(day, time(hora, minutos))
+
+
+def _mesa(id, capacidad, ubicacion="salon"):
+    return SimpleNamespace(id=id, numero_mesa=id, capacidad=capacidad, ubicacion=ubicacion, disponible=True)
+
+
+def _reserva(id, mesa_id, inicio, horas=2):
+    return SimpleNamespace(id=id, mesa_id=mesa_id, inicio=inicio, fin=inicio + timedelta(hours=horas))
+
+
+@pytest.fixture
+def motor():
+    motor = AvailabilityEngine()
+    motor.load_mesas([_mesa(1, 2), _mesa(2, 4), _mesa(3, 4, "patio"), _mesa(4, 8)])
+    return motor
+
+
+def _mesa_libre(motor, personas, inicio, **kwargs):
+    libre = motor.find_table(personas, inicio, **kwargs)
+    return libre and libre["mesa_id"]
+
+
+def test_mesa_mas_chica_que_alcanza(motor):
+    motor.load_day(MANANA, [])
+    assert _mesa_libre(motor, 2, _a(MANANA, 20)) == 1
+    assert _mesa_libre(motor, 3, _a(MANANA, 20)) == 2
+    assert _mesa_libre(motor, 3, _a(MANANA, 20), ubicacion="patio") == 3
+    assert _mesa_libre(motor, 9, _a(MANANA, 20)) is None
+
+
+def test_superposicion_y_horarios_contiguos(motor):
+    motor.load_day(MANANA, [_reserva(10, 2, _a(MANANA, 20))])  # 20:00 a 22:00
+    assert _mesa_libre(motor, 3, _a(MANANA, 21)) == 3
+    assert _mesa_libre(motor, 3, _a(MANANA, 18, 30)) == 3
+    # Termina justo cuando empieza la otra: no se superponen
+    assert _mesa_libre(motor, 3, _a(MANANA, 22)) == 2
+    assert _mesa_libre(motor, 3, _a(MANANA, 18)) == 2
+
+
+def test_reserva_que_cruza_la_medianoche(motor):
+    pasado = MANANA + timedelta(days=1)
+    reserva = _reserva(10, 1, _a(MANANA, 23))  # hasta la 1:00 del día siguiente
+    motor.load_day(MANANA, [reserva])
+    motor.load_day(pasado, [reserva])
+    assert _mesa_libre(motor, 2, _a(pasado, 0, 30)) == 2
+    assert _mesa_libre(motor, 2, _a(pasado, 1)) == 1
+
+
+def test_cancelar_libera_la_mesa(motor):
+    motor.load_day(MANANA, [])
+    motor.upsert_reserva(10, 1, _a(MANANA, 20), _a(MANANA, 22), "confirmada")
+    assert _mesa_libre(motor, 2, _a(MANANA, 20)) == 2
+    motor.upsert_reserva(10, 1, _a(MANANA, 20), _a(MANANA, 22), "cancelada")
+    assert _mesa_libre(motor, 2, _a(MANANA, 20)) == 1
+    assert motor.stats()["reservas"] == 0
+
+
+def test_reserva_de_un_dia_no_indexado_no_se_guarda(motor):
+    otro = MANANA + timedelta(days=10)
+    motor.upsert_reserva(10, 1, _a(otro, 20), _a(otro, 22), None)
+    assert motor.stats()["reservas"] == 0
+    assert motor.needs_day(otro)
+
+
+def test_limite_de_dias_por_lru(motor, monkeypatch):
+    monkeypatch.setattr(availability, "AVAILABILITY_DIAS_MAX", 3)
+    dias = [MANANA + timedelta(days=i) for i in range(5)]
+    for i, day in enumerate(dias[:3]):
+        motor.load_day(day, [_reserva(i, 1, _a(day, 20))])
+    motor.find_table(2, _a(dias[0], 12))  # el primero pasa a ser el más reciente
+    for i, day in enumerate(dias[3:], start=3):
+        motor.load_day(day, [_reserva(i, 1, _a(day, 20))])
+    assert motor.stats()["dias"] == 3
+    assert motor.stats()["reservas"] == 3
+    assert not motor.needs_day(dias[0])
+    assert motor.needs_day(dias[1]) and motor.needs_day(dias[2])
+
+
+def test_dias_pasados_se_descartan(motor):
+    viejo = date.today() - timedelta(days=5)
+    motor.load_day(viejo, [_reserva(1, 1, _a(viejo, 20))])
+    motor.load_day(MANANA, [])
+    assert motor.needs_day(viejo)
+    assert motor.stats() == {"dias": 1, "reservas": 0, "mesas": 4}
@@ -0,0 +1,89 @@
+import asyncio
+
+import pytest
+from sqlalchemy import create_engine, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session
+
+from app import busqueda, models
+from app.database import Base
+
+# Índice de búsqueda de clientes: tokens normalizados al dar de alta, cambiar y borrar con
+# el ORM, y consultas por prefijo / varios términos / teléfono.
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path}/busqueda.db")
+    Base.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+def _tokens(engine, cliente_id):
+    with engine.connect() as conn:
+        return set(conn.execute(
+            select(busqueda.busqueda.c.token).where(busqueda.busqueda.c.cliente_id == cliente_id)
+        ).scalars())
+
+
+def _buscar(engine, q, limit=10):
+    async def run():
+        async_engine = create_async_engine(str(engine.url).replace("sqlite://", "sqlite+aiosqlite://"))
+        try:
+            async with async_sessionmaker(async_engine, expire_on_commit=False)() as db:
+                return [c["id"] for c in await busqueda.buscar_clientes(db, q, limit)]
+        finally:
+            await async_engine.dispose()
+
+    return asyncio.run(run())
+
+
+def _alta(db, **campos):
+    cliente = models.Cliente(**campos)
+    db.add(cliente)
+    db.commit()
+    return cliente
+
+
+def test_alta_indexa_tokens_normalizados(engine):
+    with Session(engine) as db:
+        cliente = _alta(db, nombre="José María", apellido="Muñoz", email="JM.Munoz@Mail.com", telefono="(11) 4567-8900")
+        cliente_id = cliente.id
+    assert _tokens(engine, cliente_id) == {
+        "jose", "maria", "munoz", "jm.munoz@mail.com", "jm", "mail", "com", "1145678900",
+    }
+
+
+def test_cambio_y_baja_actualizan_el_indice(engine):
+    with Session(engine) as db:
+        cliente = _alta(db, nombre="Ana", apellido="Gómez", email="ana@x.com")
+        cliente_id = cliente.id
+        cliente.apellido = "Pérez"
+        db.commit()
+        assert "gomez" not in _tokens(engine, cliente_id)
+        assert "perez" in _tokens(engine, cliente_id)
+        db.delete(cliente)
+        db.commit()
+    assert _tokens(engine, cliente_id) == set()
+
+
+def test_rollback_no_deja_tokens(engine):
+    with Session(engine) as db:
+        db.add(models.Cliente(nombre="Ana", email="ana@x.com"))
+        db.flush()
+        db.rollback()
+    with engine.connect() as conn:
+        assert conn.execute(select(busqueda.busqueda.c.token)).first() is None
+
+
+def test_buscar_por_prefijo_terminos_y_telefono(engine):
+    with Session(engine) as db:
+        ana = _alta(db, nombre="Ana", apellido="Gómez", email="ana@x.com", telefono="1145678900").id
+        anibal = _alta(db, nombre="Aníbal", apellido="Pérez", email="anibal@x.com").id
+        _alta(db, nombre="Bruno", apellido="Gomila", email="bruno@x.com")
+    assert _buscar(engine, "AN") == [ana, anibal]
+    assert _buscar(engine, "an go") == [ana]
+    assert _buscar(engine, "11 4567-89") == [ana]
+    assert _buscar(engine, "an", limit=1) == [ana]
+    assert _buscar(engine, "zz") == []
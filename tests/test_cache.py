@@ -0,0 +1,31 @@
+import asyncio
+
+from app.cache import TTLCache, read_through, read_through_async, touch
+
+
+def test_touch_durante_la_carga_no_se_guarda():
+    cache = TTLCache("prueba", table="prueba_tabla")
+
+    def loader():
+        touch("prueba_tabla")  # escritura confirmada mientras se leía
+        return "viejo"
+
+    assert read_through(cache, "k", loader) == "viejo"
+    assert read_through(cache, "k", lambda: "nuevo") == "nuevo"
+    assert read_through(cache, "k", lambda: "otro") == "nuevo"
+
+
+def test_touch_durante_la_carga_async():
+    cache = TTLCache("prueba_async", table="prueba_async_tabla")
+
+    async def loader():
+        await asyncio.sleep(0)
+        touch("prueba_async_tabla")
+        return "viejo"
+
+    async def nuevo():
+        return "nuevo"
+
+    assert asyncio.run(read_through_async(cache, "k", loader)) == "viejo"
+    assert asyncio.run(read_through_async(cache, "k", nuevo)) == "nuevo"
+    assert cache.get("k") == "nuevo"
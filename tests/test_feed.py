@@ -0,0 +1,46 @@
+import asyncio
+
+import pytest
+
+from app.feed import PedidoFeed
+
+# Reconexión al feed de cocina: Last-Event-ID de esta época reenvía lo perdido; de otra
+# época (reinicio del server), inválido o ya fuera del buffer, manda "reset".
+
+
+def _backlog(feed, last_event_id):
+    async def run():
+        sub, backlog = feed.subscribe(last_event_id=last_event_id)
+        feed.unsubscribe(sub)
+        return backlog
+
+    return asyncio.run(run())
+
+
+def _feed(eventos=3, size=10, epoch="a1"):
+    feed = PedidoFeed(size=size, epoch=epoch)
+    for i in range(eventos):
+        feed.publish("nuevo", {"id": i + 1, "mesa_id": 1})
+    return feed
+
+
+def test_reenvia_lo_perdido_de_la_misma_epoca():
+    feed = _feed()
+    assert feed.last_id == "a1-3"
+    assert [ev["id"] for ev in _backlog(feed, "a1-1")] == ["a1-2", "a1-3"]
+    assert _backlog(feed, "a1-3") == []
+
+
+@pytest.mark.parametrize("last_event_id", ["b2-1", "3", "a1-x", "a1-9"])
+def test_id_de_otra_epoca_o_invalido_manda_reset(last_event_id):
+    # Tras un reinicio el contador vuelve a empezar: "b2-1" parecería válido si sólo se mirara n
+    assert [ev["tipo"] for ev in _backlog(_feed(), last_event_id)] == ["reset"]
+
+
+def test_id_fuera_del_buffer_manda_reset():
+    feed = _feed(eventos=20, size=5)
+    assert [ev["tipo"] for ev in _backlog(feed, "a1-2")] == ["reset"]
+
+
+def test_epocas_distintas_por_instancia():
+    assert PedidoFeed().epoch != PedidoFeed().epoch
@@ -0,0 +1,117 @@
+import asyncio
+
+import pytest
+from sqlalchemy import create_engine, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app import ingest, inventario, models
+from app.database import Base
+
+# Cola de ingreso: lotes, aislamiento de pedidos inválidos, trabajo posterior al commit y
+# apagado con límite de tiempo.
+
+
+@pytest.fixture
+def url(tmp_path):
+    url = f"sqlite:///{tmp_path}/ingest.db"
+    engine = create_engine(url)
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(models.Mesa.__table__.insert().values(id=1, numero_mesa=7, capacidad=4, disponible=True))
+    engine.dispose()
+    return url
+
+
+def _pedidos(url):
+    engine = create_engine(url)
+    with engine.connect() as conn:
+        rows = conn.execute(select(models.Pedido.producto, models.Pedido.mesa_id).order_by(models.Pedido.id)).all()
+    engine.dispose()
+    return rows
+
+
+def _correr(url, prueba, **opciones):
+    async def run():
+        engine = create_async_engine(url.replace("sqlite://", "sqlite+aiosqlite://"))
+        ingestor = ingest.PedidoIngestor(session_factory=async_sessionmaker(engine, expire_on_commit=False), **opciones)
+        await ingestor.start()
+        try:
+            return await prueba(ingestor)
+        finally:
+            await ingestor.stop(timeout=1)
+            await engine.dispose()
+
+    return asyncio.run(run())
+
+
+@pytest.mark.parametrize("batch_size,lotes", [(100, 1), (4, 3)])
+def test_pedidos_simultaneos_van_en_lotes(url, batch_size, lotes):
+    async def prueba(ingestor):
+        await asyncio.gather(*(
+            ingestor.submit({"numero_mesa": 7, "producto": f"p{i}", "cantidad": 1}, wait=True) for i in range(10)
+        ))
+        return ingestor.stats()
+
+    stats = _correr(url, prueba, batch_size=batch_size, flush_ms=50)
+    assert stats["lotes"] == lotes and stats["escritos"] == 10
+    assert _pedidos(url) == [(f"p{i}", 1) for i in range(10)]
+
+
+def test_mesa_inexistente_falla_solo_ese_pedido(url):
+    async def prueba(ingestor):
+        return await asyncio.gather(
+            ingestor.submit({"numero_mesa": 7, "producto": "flan", "cantidad": 1}, wait=True),
+            ingestor.submit({"numero_mesa": 99, "producto": "vino", "cantidad": 1}, wait=True),
+            return_exceptions=True,
+        )
+
+    ok, error = _correr(url, prueba, flush_ms=50)
+    assert ok is None
+    assert isinstance(error, ingest.MesaInexistente)
+    assert isinstance(error, ingest.ERRORES_PERMANENTES)
+    assert _pedidos(url) == [("flan", 1)]
+
+
+def test_lote_con_un_pedido_invalido_guarda_el_resto(url):
+    async def prueba(ingestor):
+        return await asyncio.gather(*(
+            ingestor.submit({"producto": f"p{i}", "cantidad": 0 if i == 3 else 1}, wait=True) for i in range(6)
+        ), return_exceptions=True)
+
+    resultados = _correr(url, prueba, flush_ms=50)
+    assert [type(r) for r in resultados].count(inventario.CantidadInvalida) == 1
+    assert isinstance(resultados[3], inventario.CantidadInvalida)
+    assert [p for p, _ in _pedidos(url)] == ["p0", "p1", "p2", "p4", "p5"]
+
+
+def test_error_del_feed_no_reinserta_el_lote(url, monkeypatch):
+    def publish(*args, **kwargs):
+        raise RuntimeError("feed caído")
+
+    monkeypatch.setattr(ingest.pedido_feed, "publish", publish)
+
+    async def prueba(ingestor):
+        await ingestor.submit({"producto": "flan", "cantidad": 1}, wait=True)
+        return ingestor.stats()
+
+    stats = _correr(url, prueba)
+    assert len(_pedidos(url)) == 1
+    assert stats["lotes"] == 1 and stats["escritos"] == 1
+
+
+def test_apagado_no_espera_un_lote_que_reintenta(url):
+    def base_caida():
+        raise ConnectionError("base caída")
+
+    async def run():
+        ingestor = ingest.PedidoIngestor(session_factory=base_caida)
+        await ingestor.start()
+        pendiente = asyncio.create_task(ingestor.submit({"producto": "flan"}, wait=True))
+        await asyncio.sleep(0.05)
+        inicio = asyncio.get_running_loop().time()
+        await ingestor.stop(timeout=0.2)
+        with pytest.raises(ingest.IngestStopped):
+            await pendiente
+        return asyncio.get_running_loop().time() - inicio
+
+    assert asyncio.run(run()) < 1
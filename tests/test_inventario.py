@@ -0,0 +1,78 @@
+import threading
+
+import pytest
+from sqlalchemy import create_engine, select
+
+from app import inventario
+from app.database import Base
+
+# Descuento de stock concurrente: varias conexiones descontando el mismo producto a la
+# vez nunca lo dejan por debajo del mínimo (el UPDATE condicional es el que decide).
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path}/inventario.db", connect_args={"timeout": 30})
+    Base.metadata.create_all(engine, tables=[inventario.inventario, inventario.movimientos])
+    yield engine
+    engine.dispose()
+
+
+def _stock(engine, producto, cantidad, minimo=0):
+    with engine.begin() as conn:
+        conn.execute(inventario.inventario.insert().values(producto=producto, cantidad=cantidad, stock_minimo=minimo))
+
+
+def _cantidad(engine, producto):
+    with engine.connect() as conn:
+        return conn.execute(
+            select(inventario.inventario.c.cantidad).where(inventario.inventario.c.producto == producto)
+        ).scalar()
+
+
+def test_descuentos_en_paralelo_no_sobrevenden(engine):
+    _stock(engine, "flan", 30, minimo=2)
+    aceptados, errores = [], []
+
+    def tablet(n):
+        try:
+            for _ in range(n):
+                with engine.begin() as conn:
+                    rechazados, items = inventario.descontar_pedidos(conn, [{"producto": "flan", "cantidad": 1}])
+                    inventario.registrar_pedidos(conn, [{"producto": "flan", "cantidad": 1}], items)
+                if not rechazados:
+                    aceptados.append(1)
+        except Exception as e:  # pragma: no cover - se reporta abajo
+            errores.append(e)
+
+    hilos = [threading.Thread(target=tablet, args=(10,)) for _ in range(8)]
+    for h in hilos:
+        h.start()
+    for h in hilos:
+        h.join()
+
+    assert errores == []
+    assert len(aceptados) == 28
+    assert _cantidad(engine, "flan") == 2
+    with engine.connect() as conn:
+        movimientos = conn.execute(select(inventario.movimientos.c.cantidad)).scalars().all()
+    assert sum(movimientos) == -28
+
+
+def test_lote_parcial_acepta_en_orden_de_llegada(engine):
+    _stock(engine, "flan", 5)
+    pedidos = [{"producto": "flan", "cantidad": c} for c in (2, 4, 3)]
+    with engine.begin() as conn:
+        rechazados, items = inventario.descontar_pedidos(conn, pedidos)
+    assert rechazados == {1}
+    assert set(items) == {0, 2}
+    assert _cantidad(engine, "flan") == 0
+
+
+@pytest.mark.parametrize("cantidad", [0, -1000])
+def test_cantidad_no_positiva_se_rechaza(engine, cantidad):
+    _stock(engine, "flan", 10)
+    with pytest.raises(inventario.CantidadInvalida):
+        with engine.begin() as conn:
+            inventario.descontar_pedidos(conn, [{"producto": "flan", "cantidad": cantidad}])
+    assert _cantidad(engine, "flan") == 10
@@ -0,0 +1,78 @@
+import asyncio
+
+import pytest
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app import crud_async, lineas, models, schemas
+from app.database import Base
+
+# Pedidos de varias líneas: referencias inexistentes, evento de cocina con los ítems y
+# total calculado por el server (no se pisa por PATCH).
+
+
+@pytest.fixture
+def url(tmp_path):
+    url = f"sqlite:///{tmp_path}/lineas.db"
+    engine = create_engine(url)
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(models.Combo.__table__.insert(), [
+            {"id": 1, "nombre_combo": "pizza", "precio": 10.0},
+            {"id": 2, "nombre_combo": "flan", "precio": 3.0},
+        ])
+        conn.execute(models.Mesa.__table__.insert().values(id=1, numero_mesa=4, capacidad=2, disponible=True))
+    engine.dispose()
+    return url
+
+
+def _correr(url, prueba):
+    async def run():
+        engine = create_async_engine(url.replace("sqlite://", "sqlite+aiosqlite://"))
+        try:
+            async with async_sessionmaker(engine, expire_on_commit=False)() as db:
+                return await prueba(db)
+        finally:
+            await engine.dispose()
+
+    return asyncio.run(run())
+
+
+@pytest.mark.parametrize("campos", [{"mesa_id": 99}, {"cliente_id": 5}])
+def test_referencia_inexistente(url, campos):
+    datos = schemas.PedidoLineasCreate(lineas=[{"combo_id": 1}], **campos)
+    with pytest.raises(lineas.ReferenciaInexistente):
+        _correr(url, lambda db: lineas.crear_pedido(db, datos))
+    engine = create_engine(url)
+    with engine.connect() as conn:
+        assert conn.execute(select(func.count()).select_from(models.Pedido)).scalar() == 0
+    engine.dispose()
+
+
+def test_evento_de_cocina_con_las_lineas(url, monkeypatch):
+    eventos = []
+    monkeypatch.setattr(lineas.pedido_feed, "publish", lambda tipo, data: eventos.append((tipo, data)))
+
+    async def prueba(db):
+        datos = schemas.PedidoLineasCreate(mesa_id=1, lineas=[{"combo_id": 1, "cantidad": 2}])
+        cuenta = await lineas.crear_pedido(db, datos)
+        pedido_id = cuenta["pedidos"][0]["id"]
+        await lineas.agregar_lineas(db, pedido_id, schemas.PedidoLineasAgregar(lineas=[{"combo_id": 2}]))
+
+    _correr(url, prueba)
+    (nuevo, creado), (actualizado, agregado) = eventos
+    assert (nuevo, actualizado) == ("nuevo", "actualizado")
+    assert [(l["producto"], l["cantidad"]) for l in creado["lineas"]] == [("pizza", 2)]
+    assert [(l["producto"], l["cantidad"]) for l in agregado["lineas"]] == [("pizza", 2), ("flan", 1)]
+    assert agregado["total_pedido"] == 23.0
+
+
+def test_patch_no_pisa_el_total_de_un_pedido_con_lineas(url):
+    async def prueba(db):
+        cuenta = await lineas.crear_pedido(db, schemas.PedidoLineasCreate(lineas=[{"combo_id": 1}]))
+        pedido_id = cuenta["pedidos"][0]["id"]
+        with pytest.raises(crud_async.TotalCalculado):
+            await crud_async.patch_pedido(db, pedido_id, schemas.PedidoPatch(total_pedido=1))
+        return (await db.execute(select(models.Pedido.total_pedido))).scalar()
+
+    assert _correr(url, prueba) == 10.0
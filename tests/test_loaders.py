@@ -0,0 +1,95 @@
+import pytest
+from sqlalchemy import create_engine, event, select
+from sqlalchemy.orm import Session
+
+from app import models
+from app.database import Base
+from app.loaders import LOAD_POLICIES, load_options
+
+# Cada política de carga trae todo lo que recorre su vista en una cantidad fija de
+# consultas: la misma con 1 fila padre que con N (sin N+1 por lazy loads).
+
+N = 25
+
+# Política -> (modelo padre, relaciones que recorre la vista)
+VISTAS = {
+    "clientes.lista": (models.Cliente, []),
+    "clientes.detalle": (models.Cliente, [("reservas", "mesa"), ("pedidos", "combo")]),
+    "mesas.lista": (models.Mesa, []),
+    "mesas.detalle": (models.Mesa, [("reservas", "cliente"), ("pedidos", "combo")]),
+    "reservas.detalle": (models.Reserva, [("cliente",), ("mesa",)]),
+    "pedidos.lista": (models.Pedido, [("mesa",), ("combo",)]),
+    "pedidos.cocina": (models.Pedido, [("lineas",)]),
+    "pedidos.detalle": (models.Pedido, [("mesa",), ("combo",), ("cliente",), ("lineas",), ("pagos", "metodo_pago")]),
+}
+
+
+def _cargar(engine, n):
+    with Session(engine) as s:
+        metodo = models.MetodoPago(tipo_metodo="efectivo")
+        s.add(metodo)
+        for i in range(n):
+            cliente = models.Cliente(nombre=f"n{i}", apellido=f"a{i}", email=f"c{i}@x")
+            mesa = models.Mesa(numero_mesa=i + 1, capacidad=4)
+            combo = models.Combo(nombre_combo=f"combo {i}", precio=10.0)
+            s.add_all([cliente, mesa, combo])
+            for _ in range(2):
+                s.add(models.Reserva(cliente=cliente, mesa=mesa))
+                pedido = models.Pedido(cliente=cliente, mesa=mesa, combo=combo, cantidad=1, total_pedido=10.0)
+                pedido.lineas.append(models.PedidoLinea(producto="x", cantidad=1, precio_unitario=10.0))
+                s.add_all([pedido, models.Pago(pedido=pedido, metodo_pago=metodo, monto=10.0)])
+        s.commit()
+
+
+def _recorrer(objs, ruta):
+    for obj in objs:
+        valor = getattr(obj, ruta[0])
+        hijos = valor if isinstance(valor, list) else [valor] if valor is not None else []
+        if len(ruta) > 1:
+            _recorrer(hijos, ruta[1:])
+
+
+def _consultas(engine, politica):
+    modelo, rutas = VISTAS[politica]
+    contador = []
+    listener = lambda *args: contador.append(1)
+    event.listen(engine, "before_cursor_execute", listener)
+    try:
+        with Session(engine) as s:
+            objs = s.execute(select(modelo).options(*load_options(politica))).unique().scalars().all()
+            for ruta in rutas:
+                _recorrer(objs, ruta)
+    finally:
+        event.remove(engine, "before_cursor_execute", listener)
+    return len(objs), len(contador)
+
+
+def test_todas_las_politicas_tienen_vista():
+    assert set(VISTAS) == set(LOAD_POLICIES)
+
+
+@pytest.mark.parametrize("politica", sorted(VISTAS))
+def test_consultas_constantes(tmp_path, politica):
+    resultados = []
+    for n in (1, N):
+        engine = create_engine(f"sqlite:///{tmp_path}/loaders_{n}.db")
+        Base.metadata.create_all(engine)
+        _cargar(engine, n)
+        filas, consultas = _consultas(engine, politica)
+        engine.dispose()
+        assert filas >= n
+        resultados.append(consultas)
+    assert resultados[0] == resultados[1], f"{politica}: {resultados[0]} consultas con 1 fila, {resultados[1]} con {N}"
+
+
+def test_sin_politica_hay_n_mas_1(tmp_path):
+    # Control: sin opciones de carga la misma vista dispara una consulta por fila
+    engine = create_engine(f"sqlite:///{tmp_path}/loaders_lazy.db")
+    Base.metadata.create_all(engine)
+    _cargar(engine, N)
+    contador = []
+    event.listen(engine, "before_cursor_execute", lambda *args: contador.append(1))
+    with Session(engine) as s:
+        _recorrer(s.execute(select(models.Pedido)).scalars().all(), ("mesa",))
+    engine.dispose()
+    assert len(contador) > N
@@ -0,0 +1,46 @@
+import base64
+import json
+from datetime import datetime
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import models
+from app.main import app
+from app.pagination import decode_cursor, encode_cursor
+
+# Cursores de paginación: ida y vuelta, y cualquier cursor armado a mano da ValueError
+# (400 en los endpoints), nunca otra excepción (500).
+
+COLUMNAS = models.Pedido.keyset_columns()  # fecha_pedido, id
+
+
+def _cursor(data) -> str:
+    return base64.urlsafe_b64encode(json.dumps(data).encode()).decode().rstrip("=")
+
+
+def test_ida_y_vuelta():
+    fecha = datetime(2024, 5, 1, 21, 30)
+    assert decode_cursor(encode_cursor([fecha, 7], "prev"), COLUMNAS) == ([fecha, 7], "prev")
+
+
+@pytest.mark.parametrize("cursor", [
+    "no-es-base64!",
+    _cursor([1, 2]),
+    _cursor({"k": 5}),
+    _cursor({"k": [123, 1]}),
+    _cursor({"k": [["2024-05-01"], 1]}),
+    _cursor({"k": ["2024-05-01T00:00:00", {"id": 1}]}),
+    _cursor({"k": ["2024-05-01T00:00:00", True]}),
+    _cursor({"k": ["ayer", 1]}),
+    _cursor({"k": ["2024-05-01T00:00:00", 1], "d": "arriba"}),
+])
+def test_cursor_invalido(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor, COLUMNAS)
+
+
+def test_api_responde_400():
+    with TestClient(app) as client:
+        respuesta = client.get("/api/v1/pedidos", params={"cursor": _cursor({"k": [123, 1]})})
+    assert respuesta.status_code == 400
@@ -0,0 +1,34 @@
+import pytest
+from fastapi.testclient import TestClient
+from pydantic import ValidationError
+
+from app import schemas
+from app.main import app
+
+# PATCH: un campo omitido no se toca; un null explícito se rechaza (422) en lugar de
+# guardarse como NULL.
+
+CAMPOS = [
+    (schemas.ClientePatch, campo) for campo in ("nombre", "apellido", "email", "telefono")
+] + [
+    (schemas.MesaPatch, campo) for campo in ("numero_mesa", "capacidad", "disponible", "ubicacion")
+] + [
+    (schemas.PedidoPatch, campo) for campo in ("cliente_id", "mesa_id", "combo_id", "producto", "cantidad", "total_pedido")
+]
+
+
+@pytest.mark.parametrize("schema,campo", CAMPOS)
+def test_null_explicito_se_rechaza(schema, campo):
+    with pytest.raises(ValidationError):
+        schema.model_validate({campo: None})
+
+
+@pytest.mark.parametrize("schema,campo", CAMPOS)
+def test_campo_omitido_no_se_envia(schema, campo):
+    assert campo not in schema.model_validate({}).model_dump(exclude_unset=True)
+
+
+def test_patch_cliente_nombre_null_da_422():
+    with TestClient(app) as client:
+        respuesta = client.patch("/clientes/1", json={"nombre": None})
+    assert respuesta.status_code == 422
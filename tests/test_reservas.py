@@ -0,0 +1,101 @@
+import asyncio
+from datetime import date, datetime, time
+
+import pytest
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app import models, reservas, schemas
+from app.database import Base
+
+# Reservas como intervalos [inicio, fin): superposición contra las guardadas, turnos
+# seguidos, canceladas que no ocupan y validación de lotes.
+
+DIA = date(2030, 5, 10)
+
+
+@pytest.fixture
+def url(tmp_path):
+    url = f"sqlite:///{tmp_path}/reservas.db"
+    engine = create_engine(url)
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(models.Mesa.__table__.insert(), [
+            {"id": 1, "numero_mesa": 1, "capacidad": 4, "disponible": True},
+            {"id": 2, "numero_mesa": 2, "capacidad": 2, "disponible": True},
+        ])
+        conn.execute(models.Cliente.__table__.insert().values(id=1, nombre="Ana", email="ana@x.com"))
+        conn.execute(models.Reserva.__table__.insert(), [
+            {"id": 10, "cliente_id": 1, "mesa_id": 1, "estado": "pendiente",
+             "inicio": datetime(2030, 5, 10, 20, 0), "fin": datetime(2030, 5, 10, 22, 0)},
+            {"id": 11, "cliente_id": 1, "mesa_id": 2, "estado": "cancelada",
+             "inicio": datetime(2030, 5, 10, 20, 0), "fin": datetime(2030, 5, 10, 22, 0)},
+        ])
+    engine.dispose()
+    return url
+
+
+def _correr(url, prueba):
+    async def run():
+        engine = create_async_engine(url.replace("sqlite://", "sqlite+aiosqlite://"))
+        try:
+            async with async_sessionmaker(engine, expire_on_commit=False)() as db:
+                return await prueba(db)
+        finally:
+            await engine.dispose()
+
+    return asyncio.run(run())
+
+
+def _reserva(mesa_id, hora, duracion=None):
+    return schemas.ReservaCreate(fecha=DIA, hora=hora, cliente_id=1, mesa_id=mesa_id, duracion=duracion)
+
+
+def _cantidad(url):
+    engine = create_engine(url)
+    with engine.connect() as conn:
+        total = conn.execute(select(func.count()).select_from(models.Reserva)).scalar()
+    engine.dispose()
+    return total
+
+
+@pytest.mark.parametrize("hora,duracion", [(time(21, 0), None), (time(19, 0), 61), (time(19, 0), 300)])
+def test_superposicion_rechazada(url, hora, duracion):
+    with pytest.raises(reservas.ReservaSuperpuesta) as error:
+        _correr(url, lambda db: reservas.crear_reserva(db, _reserva(1, hora, duracion)))
+    assert error.value.reserva_ids == [10]
+    assert _cantidad(url) == 2
+
+
+@pytest.mark.parametrize("hora,duracion", [(time(22, 0), None), (time(18, 0), 120)])
+def test_turnos_seguidos_no_se_superponen(url, hora, duracion):
+    creada = _correr(url, lambda db: reservas.crear_reserva(db, _reserva(1, hora, duracion)))
+    assert creada.mesa_id == 1 and creada.inicio == datetime.combine(DIA, hora)
+    assert _cantidad(url) == 3
+
+
+def test_reserva_cancelada_no_ocupa_la_mesa(url):
+    creada = _correr(url, lambda db: reservas.crear_reserva(db, _reserva(2, time(21, 0))))
+    assert creada.inicio == datetime(2030, 5, 10, 21, 0)
+    assert creada.fin == datetime(2030, 5, 10, 23, 0)
+
+
+def test_mesa_inexistente(url):
+    assert _correr(url, lambda db: reservas.crear_reserva(db, _reserva(99, time(21, 0)))) is None
+    assert _cantidad(url) == 2
+
+
+def test_validar_lote(url):
+    lote = [
+        _reserva(1, time(21, 30)),          # choca con la guardada 10
+        _reserva(2, time(20, 0), 90),       # sólo hay una cancelada: choca con la siguiente del lote
+        _reserva(2, time(21, 0)),
+        _reserva(2, time(23, 0)),           # empieza cuando termina la anterior
+        _reserva(1, time(12, 0), 0),        # duración inválida
+    ]
+    resultado = _correr(url, lambda db: reservas.validar_lote(db, lote))
+    assert [r["valida"] for r in resultado] == [False, False, False, True, False]
+    assert resultado[0]["conflictos"] == [10] and resultado[0]["conflictos_lote"] == []
+    assert resultado[1]["conflictos"] == [] and resultado[1]["conflictos_lote"] == [2]
+    assert resultado[2]["conflictos_lote"] == [1]
+    assert "error" in resultado[4] and "error" not in resultado[3]
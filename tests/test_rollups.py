@@ -0,0 +1,103 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session
+
+from app import models, rollups
+from app.database import Base
+
+# Resumen de ventas por deltas: altas, cambios de mesa / total (los pagos acompañan al
+# pedido) y bajas con el ORM; el acumulado tiene que coincidir con rebuild().
+
+FECHA = datetime(2030, 5, 10, 21, 15)
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path}/rollups.db")
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(models.Mesa.__table__.insert(), [
+            {"id": 1, "numero_mesa": 1, "capacidad": 4, "disponible": True},
+            {"id": 2, "numero_mesa": 2, "capacidad": 2, "disponible": True},
+        ])
+        conn.execute(models.Combo.__table__.insert().values(id=1, nombre_combo="pizza", precio=10.0))
+    yield engine
+    engine.dispose()
+
+
+def _resumen(engine):
+    # {(mesa_id, combo_id): (pedidos, total_pedidos, pagos, total_pagos)} sin las claves en cero
+    t = rollups.tabla
+    with engine.connect() as conn:
+        rows = conn.execute(select(t.c.fecha, t.c.hora, t.c.mesa_id, t.c.combo_id, *(t.c[m] for m in rollups.MEDIDAS)))
+        resumen = {}
+        for fecha, hora, mesa_id, combo_id, *medidas in rows:
+            assert (fecha, hora) == (FECHA.date(), FECHA.hour)
+            if any(medidas):
+                resumen[(mesa_id, combo_id)] = tuple(medidas)
+    return resumen
+
+
+def _rebuild(engine):
+    async def run():
+        async_engine = create_async_engine(str(engine.url).replace("sqlite://", "sqlite+aiosqlite://"))
+        try:
+            async with async_sessionmaker(async_engine, expire_on_commit=False)() as db:
+                await rollups.rebuild(db)
+        finally:
+            await async_engine.dispose()
+
+    asyncio.run(run())
+    return _resumen(engine)
+
+
+def _pedido_con_pago(db, **campos):
+    pedido = models.Pedido(fecha_pedido=FECHA, **campos)
+    db.add(pedido)
+    db.flush()
+    db.add(models.Pago(pedido_id=pedido.id, monto=campos.get("total_pedido"), fecha_pago=FECHA))
+    db.commit()
+    return pedido
+
+
+def test_alta_suma_pedidos_y_pagos(engine):
+    with Session(engine) as db:
+        _pedido_con_pago(db, mesa_id=1, combo_id=1, total_pedido=10.0)
+        _pedido_con_pago(db, mesa_id=1, combo_id=1, total_pedido=5.0)
+        db.add(models.Pedido(fecha_pedido=FECHA, total_pedido=2.0))
+        db.commit()
+    assert _resumen(engine) == {(1, 1): (2, 15.0, 2, 15.0), (0, 0): (1, 2.0, 0, 0.0)}
+    assert _rebuild(engine) == {(1, 1): (2, 15.0, 2, 15.0), (0, 0): (1, 2.0, 0, 0.0)}
+
+
+def test_cambio_de_mesa_mueve_pedido_y_pagos(engine):
+    with Session(engine) as db:
+        pedido = _pedido_con_pago(db, mesa_id=1, combo_id=1, total_pedido=10.0)
+        pedido.mesa_id, pedido.total_pedido = 2, 12.0
+        db.commit()
+    assert _resumen(engine) == {(2, 1): (1, 12.0, 1, 10.0)}
+    assert _rebuild(engine) == {(2, 1): (1, 12.0, 1, 10.0)}
+
+
+def test_baja_resta_pedido_y_pagos(engine):
+    with Session(engine) as db:
+        pedido = _pedido_con_pago(db, mesa_id=1, combo_id=1, total_pedido=10.0)
+        _pedido_con_pago(db, mesa_id=2, combo_id=1, total_pedido=4.0)
+        for pago in pedido.pagos:
+            db.delete(pago)
+        db.delete(pedido)
+        db.commit()
+    assert _resumen(engine) == {(2, 1): (1, 4.0, 1, 4.0)}
+
+
+def test_rollback_no_deja_deltas(engine):
+    with Session(engine) as db:
+        _pedido_con_pago(db, mesa_id=1, combo_id=1, total_pedido=10.0)
+        db.add(models.Pedido(fecha_pedido=FECHA, mesa_id=1, combo_id=1, total_pedido=99.0))
+        db.flush()
+        db.rollback()
+    assert _resumen(engine) == {(1, 1): (1, 10.0, 1, 10.0)}
@@ -0,0 +1,45 @@
+import json
+import os
+import subprocess
+import sys
+import textwrap
+
+# Stock, resumen de ventas e índice de búsqueda se mantienen con eventos de Session. Tienen
+# que funcionar importando sólo los modelos / crud (scripts): se corre en un proceso aparte
+# porque en este ya los importaron otros tests.
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCRIPT = textwrap.dedent("""
+    import json
+    from sqlalchemy import func, select
+    from app import crud, models, schemas
+    from app.database import Base, SessionLocal, engine
+
+    Base.metadata.create_all(engine)
+    with SessionLocal() as db:
+        db.add(models.Inventario(producto="flan", cantidad=5))
+        db.commit()
+        crud.create_cliente(db, schemas.ClienteCreate(nombre="Ana", apellido="Pérez", email="ana@x.com"))
+        crud.create_pedido(db, schemas.PedidoCreate(producto="flan", cantidad=2))
+        models.Pedido.create(db, producto="flan", cantidad=1, total_pedido=10.0)
+        cuenta = lambda m: db.scalar(select(func.count()).select_from(m))
+        print(json.dumps({
+            "stock": db.scalar(select(models.Inventario.cantidad)),
+            "movimientos": cuenta(models.MovimientoInventario),
+            "resumen": db.scalar(select(func.sum(models.VentaResumen.pedidos))),
+            "busqueda": cuenta(models.ClienteBusqueda),
+        }))
+""")
+
+
+def test_escrituras_sin_importar_la_api(tmp_path):
+    env = {**os.environ, "DATABASE_URL": f"sqlite:///{tmp_path}/sync.db", "PYTHONPATH": RAIZ}
+    salida = subprocess.run(
+        [sys.executable, "-c", SCRIPT], env=env, cwd=RAIZ, capture_output=True, text=True, check=True
+    ).stdout
+    r = json.loads(salida.strip().splitlines()[-1])
+    assert r["stock"] == 2
+    assert r["movimientos"] == 2
+    assert r["resumen"] == 2
+    assert r["busqueda"] > 0